@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from cache import ResultCache, profile_key
+from encoding import UNKNOWN, QuestionEncoder
+from gower_distance import gower_to_medoids
+from instrument import count, stage, timed
+from popularity import CoursePopularityIndex, lookup_rows
+from similarity import CourseSimilarityIndex, blended_top_n
+
+# Bump when the on-disk layout changes; load_artifact refuses other versions
+ARTIFACT_FORMAT = 3
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+
+
+# Write a fitted RecommenderEngine as a versioned artifact directory (store:
+# the feature_store.QuantifiedFeatureStore of engines fitted on y_k features):
+#   <path>/<model_version>/manifest.json  small metadata (columns, encoder vocabularies, ...)
+#   <path>/<model_version>/*.npy          arrays, memory-mappable with np.load(mmap_mode='r')
+#   <path>/CURRENT                        name of the version to serve, replaced atomically
+def build_artifact(engine, path, encoder=None, model_version=None, store=None):
+    if model_version is None:
+        model_version = time.strftime('%Y%m%d%H%M%S')
+    version_dir = os.path.join(path, model_version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    popularity = engine.popularity_
+    roll_numbers = np.array([-1 if r is None else int(r) for r in engine.roll_numbers_], dtype=np.int64)
+
+    arrays = {
+        'num_ranges': np.asarray(engine.num_ranges_, dtype=np.float64),
+        'medoid_num': np.asarray(engine.medoid_num_, dtype=np.float64),
+        'medoid_labels': np.asarray(engine.labels_[engine.medoid_indices_], dtype=np.int32),
+        'labels': np.asarray(engine.labels_, dtype=np.int32),
+        'roll_numbers': roll_numbers,
+        'cluster_ranked': popularity.ranked_,
+        'cluster_ranked_counts': popularity.ranked_counts_,
+        'taken_bits': popularity.taken_bits_,
+    }
+    # Optional item-item index (engines fitted with item_weight > 0)
+    if engine.similarity_ is not None:
+        arrays['similarity_neighbors'] = engine.similarity_.neighbors_
+        arrays['similarity_scores'] = engine.similarity_.scores_
+    for name, array in arrays.items():
+        np.save(os.path.join(version_dir, name + '.npy'), array)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT,
+        'model_version': model_version,
+        'created_at': time.time(),
+        'n_clusters': int(engine.n_clusters),
+        'columns': [str(c) for c in engine.columns_],
+        'cat_features': [bool(c) for c in engine.cat_features_],
+        'medoid_cat': [[None if v != v else getattr(v, 'item', lambda: v)() for v in row]
+                       for row in engine.medoid_cat_.tolist()],
+        'weights': [1.0] * len(engine.columns_),
+        'baseline_distance': float(engine.baseline_distance_),
+        'encoder': (encoder or QuestionEncoder()).to_dict(),
+        'courses': popularity.courses,
+        'item_weight': float(engine.item_weight) if engine.similarity_ is not None else 0.0,
+        'quantified': None if store is None else {
+            'questions': store.questions, 'tables': [[float(v) for v in table] for table in store.tables]},
+    }
+    with open(os.path.join(version_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    # Point CURRENT at the new version only once every file is in place
+    tmp = os.path.join(path, CURRENT + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(model_version)
+    os.replace(tmp, os.path.join(path, CURRENT))
+    return version_dir
+
+
+# Load the served (or a given) version of an artifact. Arrays are memory-mapped,
+# so start-up cost does not grow with the number of students.
+@timed('load_artifact')
+def load_artifact(path, model_version=None, mmap=True):
+    if model_version is None:
+        with open(os.path.join(path, CURRENT)) as f:
+            model_version = f.read().strip()
+    version_dir = os.path.join(path, model_version)
+    with open(os.path.join(version_dir, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format {manifest['format_version']} (expected {ARTIFACT_FORMAT})")
+
+    arrays = {}
+    for name in os.listdir(version_dir):
+        if name.endswith('.npy'):
+            arrays[name[:-4]] = np.load(os.path.join(version_dir, name), mmap_mode='r' if mmap else None)
+    return ServingModel(manifest, arrays)
+
+
+# Option letter of an answer as a y_k table index (a = 0 ... z = 25), 26 (the
+# NaN slot) when missing or not starting with a letter; as feature_store.option_codes
+def _option_index(answer):
+    letter = answer.strip().lower()[:1] if isinstance(answer, str) else ''
+    return ord(letter) - ord('a') if 'a' <= letter <= 'z' else 26
+
+
+# Read-only model for the serve path: needs numpy only (no pandas, sklearn_extra
+# or gower); scipy.sparse is loaded on first use for blended (item_weight > 0)
+# batch scoring
+class ServingModel:
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.model_version = manifest['model_version']
+        self.columns = manifest['columns']
+        cat_features = np.array(manifest['cat_features'], dtype=bool)
+        self.num_columns = [c for c, is_cat in zip(self.columns, cat_features) if not is_cat]
+        self.cat_columns = [c for c, is_cat in zip(self.columns, cat_features) if is_cat]
+        self.num_ranges = arrays['num_ranges']
+        self.medoid_num = arrays['medoid_num']
+        self.medoid_cat = np.array(manifest['medoid_cat'], dtype=object).reshape(len(self.medoid_num), len(self.cat_columns))
+        self.medoid_labels = arrays['medoid_labels']
+        self.labels = arrays['labels']
+        self.roll_numbers = arrays['roll_numbers']
+        self._roll_order = None
+        self.popularity = CoursePopularityIndex(manifest['courses'], arrays['cluster_ranked'],
+                                                arrays['cluster_ranked_counts'], arrays['taken_bits'])
+        self.encoder = QuestionEncoder.from_dict(manifest['encoder'])
+        # y_k per option letter (a..z, then the NaN slot) of every quantified question
+        quantified = manifest.get('quantified') or {'questions': [], 'tables': []}
+        self.quantified = {q: np.array(t, dtype=np.float64) for q, t in zip(quantified['questions'], quantified['tables'])}
+        self.item_weight = manifest.get('item_weight', 0.0)
+        self.similarity = None
+        if 'similarity_neighbors' in arrays:
+            self.similarity = CourseSimilarityIndex(manifest['courses'], arrays['similarity_neighbors'],
+                                                    arrays['similarity_scores'])
+            self.cluster_counts = self.popularity.cluster_counts()
+        # New-user results by encoded profile (see cache.py)
+        self.cache = ResultCache()
+
+    # Raw questionnaire answers (one dict per user) -> feature rows. Encoded
+    # questions are looked up a whole column at a time; unknown answers keep
+    # the UNKNOWN code on categorical columns (a mismatch against every
+    # medoid) and become NaN on numeric ones, as do absent plain fields.
+    # Quantified questions take the y_k of the answer's option letter.
+    def encode(self, responses):
+        codes = self.encoder.encode_records(responses)
+        X_num = np.full((len(responses), len(self.num_columns)), np.nan)
+        X_cat = np.full((len(responses), len(self.cat_columns)), None, dtype=object)
+        for j, col in enumerate(self.num_columns):
+            if col in self.quantified:
+                X_num[:, j] = self.quantified[col][[_option_index(response.get(col)) for response in responses]]
+                continue
+            if col in codes:
+                X_num[:, j] = np.where(codes[col] == UNKNOWN, np.nan, codes[col])
+                continue
+            for i, response in enumerate(responses):
+                try:
+                    X_num[i, j] = float(response[col])
+                except (KeyError, TypeError, ValueError):
+                    pass
+        for j, col in enumerate(self.cat_columns):
+            if col in codes:
+                X_cat[:, j] = codes[col].tolist()
+            else:
+                X_cat[:, j] = [response.get(col) for response in responses]
+        return X_num, X_cat
+
+    def assign(self, responses):
+        with stage('encode_responses'):
+            X_num, X_cat = self.encode(responses)
+        with stage('assign'):
+            distances = gower_to_medoids(X_num, X_cat, self.medoid_num, self.medoid_cat, self.num_ranges)
+        return self.medoid_labels[distances.argmin(axis=1)], distances
+
+    # Popularity blended with item-item scores, for models built with an item index
+    def _blended_ids(self, clusters, taken, top_n):
+        item_scores = self.similarity.score(taken[0])[None, :] if len(taken) == 1 else self.similarity.score_batch(taken)
+        return blended_top_n(self.cluster_counts[clusters], item_scores, taken, top_n, self.item_weight)
+
+    def _recommend(self, cluster, taken_mask, top_n):
+        if self.similarity is None:
+            return self.popularity.recommend(cluster, taken_mask, top_n)
+        ids = self._blended_ids(np.array([cluster]), taken_mask[None, :], top_n)[0]
+        return [self.popularity.courses[i] for i in ids if i >= 0]
+
+    def recommend_for_cluster(self, cluster, taken=(), top_n=3):
+        return self._recommend(cluster, self.popularity.mask_from_courses(taken), top_n)
+
+    # Cache key of one questionnaire, from its encoded answers
+    def profile_key(self, responses, taken=(), top_n=3):
+        X_num, X_cat = self.encode([responses])
+        return profile_key(self.model_version, X_num[0], X_cat[0], top_n, taken)
+
+    @timed('recommend_new_user')
+    def recommend_for_new_user(self, responses, taken=(), top_n=3):
+        key = self.profile_key(responses, taken, top_n)
+        cached = self.cache.get(key)
+        count('new_user_cache_misses' if cached is None else 'new_user_cache_hits')
+        if cached is None:
+            labels, _ = self.assign([responses])
+            cached = (int(labels[0]), tuple(self.recommend_for_cluster(labels[0], taken, top_n)))
+            self.cache.put(key, cached)
+        return list(cached[1])
+
+    @timed('recommend_student')
+    def recommend_for_student(self, student_id, top_n=3):
+        matches = np.flatnonzero(self.roll_numbers == int(student_id))
+        if len(matches) == 0:
+            return ["Student ID not found."]
+        row = matches[0]
+        return self._recommend(self.labels[row], self.popularity.taken_mask(row), top_n)
+
+    @timed('recommend_batch')
+    def recommend_batch(self, student_ids, top_n=3):
+        count('recommend_batch_students', len(student_ids))
+        if self._roll_order is None:
+            self._roll_order = np.argsort(self.roll_numbers, kind='stable')
+        rows = lookup_rows(self.roll_numbers, np.asarray(student_ids, dtype=np.int64), self._roll_order)
+        clusters = np.where(rows >= 0, self.labels[rows], 0)
+        if self.similarity is not None:
+            ids = np.full((len(rows), top_n), -1, dtype=np.int32)
+            for start in range(0, len(rows), 8192):
+                chunk = slice(start, start + 8192)
+                ids[chunk] = self._blended_ids(clusters[chunk], self.popularity.taken_masks(rows[chunk]), top_n)
+        else:
+            ids = self.popularity.top_n_ids_batch(rows, clusters, top_n)
+        ids[rows < 0] = -1
+        return self.popularity.course_names(ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or serve the course recommendation model.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Fit the model from the CSVs and write an artifact")
+    build.add_argument('--data-dir', default='.')
+    build.add_argument('--out', default='model')
+    build.add_argument('--clusters', type=int, default=3)
+    build.add_argument('--backend', default='pam', help="k-medoids backend: pam, clara or fasterpam")
+    build.add_argument('--item-weight', type=float, default=0.0,
+                       help="Blend weight of item-item co-enrollment scores (0: cluster popularity only)")
+    build.add_argument('--features', choices=['codes', 'yk'], default='codes',
+                       help="Cluster on answer codes (as categories) or on the quantified y_k matrix DEA uses")
+
+    serve = sub.add_parser('serve', help="Load an artifact and answer one query")
+    serve.add_argument('--model', default='model')
+    serve.add_argument('--student', type=int, help="Roll number of an existing student")
+    serve.add_argument('--answers', help="JSON file with a new user's questionnaire answers")
+    serve.add_argument('--top-n', type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from engine import RecommenderEngine
+        from pipeline import categorical_columns, prepare_training_data, quantified_training_data
+
+        if args.features == 'yk':
+            # All numeric: the engine clusters on a view of the y_k matrix
+            features, roll_numbers, incidence, store = quantified_training_data(args.data_dir)
+            encoder, cat_columns = None, ()
+        else:
+            features, roll_numbers, incidence, encoder = prepare_training_data(args.data_dir)
+            store, cat_columns = None, categorical_columns
+        engine = RecommenderEngine(n_clusters=args.clusters, random_state=42, cat_columns=cat_columns,
+                                   backend=args.backend, course_metric='hamming', item_weight=args.item_weight)
+        engine.fit(features, roll_numbers, incidence)
+        version_dir = build_artifact(engine, args.out, encoder, store=store)
+        print(f"Model artifact written to {version_dir}")
+        return
+
+    start = time.perf_counter()
+    model = load_artifact(args.model)
+    print(f"Loaded model {model.model_version} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if args.student is not None:
+        print(f"Recommended Courses for student {args.student}: {model.recommend_for_student(args.student, args.top_n)}")
+    if args.answers:
+        with open(args.answers, encoding='utf-8') as f:
+            responses = json.load(f)
+        taken = responses.get('courses_taken', [])
+        print(f"Recommended Courses for new user: {model.recommend_for_new_user(responses, taken, args.top_n)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
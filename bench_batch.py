@@ -0,0 +1,92 @@
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+from incidence import incidence_from_lists
+from popularity import CoursePopularityIndex, lookup_rows
+
+
+# Synthetic cohort shaped like the oldUser.py tables: roll numbers, cluster
+# labels and 3-10 courses per student
+def make_cohort(n_students, n_courses, n_clusters, seed=42):
+    rng = random.Random(seed)
+    courses = list(string.ascii_uppercase) if n_courses <= 26 else [f"C{i:04d}" for i in range(n_courses)]
+    courses = courses[:n_courses]
+    roll_numbers = np.arange(22100000, 22100000 + n_students)
+    labels = np.array([rng.randrange(n_clusters) for _ in range(n_students)])
+    course_lists = [rng.sample(courses, rng.randint(3, min(10, n_courses))) for _ in range(n_students)]
+    response_df = pd.DataFrame({'Roll No.(8 Digits)': roll_numbers, 'Cluster': labels})
+    course_matrix = pd.DataFrame({'course': course_lists}, index=pd.Index(roll_numbers, name='Roll No.(8 Digits)'))
+    return response_df, course_matrix
+
+
+# The per-student implementation oldUser.py used before the popularity index
+def recommend_loop_pandas(response_df, course_matrix, student_id, top_n=3):
+    if student_id not in response_df['Roll No.(8 Digits)'].values:
+        return ["Student ID not found."]
+    student_row = response_df[response_df['Roll No.(8 Digits)'] == student_id]
+    student_cluster = student_row['Cluster'].values[0]
+    cluster_students = response_df[response_df['Cluster'] == student_cluster]
+    cluster_ids = cluster_students['Roll No.(8 Digits)']
+    cluster_courses_series = course_matrix.loc[course_matrix.index.isin(cluster_ids), 'course'].explode()
+    common_courses = cluster_courses_series.value_counts().head(top_n).index.tolist()
+    student_courses = course_matrix.loc[student_id, 'course'] if student_id in course_matrix.index else []
+    recommended = [c for c in common_courses if c not in student_courses]
+    return recommended[:top_n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cohort recommendation: per-student loop vs. batch call.")
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--courses', type=int, default=26)
+    parser.add_argument('--clusters', type=int, default=3)
+    parser.add_argument('--top-n', type=int, default=3)
+    parser.add_argument('--sample', type=int, default=200, help="Students timed with the pandas loop (extrapolated)")
+    args = parser.parse_args()
+
+    response_df, course_matrix = make_cohort(args.students, args.courses, args.clusters)
+    roll_numbers = response_df['Roll No.(8 Digits)'].to_numpy()
+    labels = response_df['Cluster'].to_numpy()
+
+    start = time.perf_counter()
+    incidence = incidence_from_lists(course_matrix['course'].tolist())
+    index = CoursePopularityIndex.from_incidence(labels, incidence.matrix, incidence.courses, args.clusters)
+    build_time = time.perf_counter() - start
+
+    sample_ids = roll_numbers[:args.sample]
+    start = time.perf_counter()
+    for student_id in sample_ids:
+        recommend_loop_pandas(response_df, course_matrix, student_id, args.top_n)
+    pandas_per_student = (time.perf_counter() - start) / len(sample_ids)
+
+    student_rows = {roll_no: row for row, roll_no in enumerate(roll_numbers)}
+    start = time.perf_counter()
+    for student_id in roll_numbers:
+        row = student_rows[student_id]
+        index.recommend_for_row(row, labels[row], args.top_n)
+    index_loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = lookup_rows(roll_numbers, roll_numbers)
+    batch = index.course_names(index.top_n_ids_batch(rows, labels[rows], args.top_n))
+    batch_time = time.perf_counter() - start
+
+    # The batch result must match the per-student index path
+    for row in range(0, len(roll_numbers), max(1, len(roll_numbers) // 100)):
+        expected = index.recommend_for_row(row, labels[row], args.top_n)
+        assert [c for c in batch[row] if c is not None] == expected
+
+    print(f"Students: {args.students}, courses: {args.courses}, clusters: {args.clusters}, top_n: {args.top_n}")
+    print(f"Index build:                    {build_time * 1000:10.1f} ms")
+    print(f"Pandas per-student loop (est.): {pandas_per_student * args.students * 1000:10.1f} ms "
+          f"({pandas_per_student * 1e6:.0f} us/student over {len(sample_ids)} students)")
+    print(f"Index per-student loop:         {index_loop_time * 1000:10.1f} ms")
+    print(f"Batch call:                     {batch_time * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
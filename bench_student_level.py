@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import RecommenderEngine
+from incidence import load_course_incidence
+from loader import ROLL, build_student_table
+from pipeline import categorical_columns, feature_columns, student_level
+
+
+# The model newUser.py fitted before: every row of the merged table (one per
+# enrolled course), every numeric column (roll number included) as a
+# feature and the row's single course as its course set
+def exploded_model(frame, n_clusters):
+    features = frame.select_dtypes(include=[np.number])
+    features = features.fillna(features.mean())
+    course_lists = [[course] if isinstance(course, str) else [] for course in frame['course']]
+    engine = RecommenderEngine(n_clusters=n_clusters, random_state=42,
+                               cat_columns=[c for c in categorical_columns if c in features.columns])
+    engine.fit(features, frame[ROLL], course_lists)
+    return engine
+
+
+# One row per student on the declared feature columns, with the aggregated course set
+def student_model(frame, incidence, n_clusters):
+    features, roll_numbers, courses = student_level(frame, incidence)
+    engine = RecommenderEngine(n_clusters=n_clusters, random_state=42, cat_columns=categorical_columns)
+    engine.fit(features, roll_numbers, courses)
+    return engine
+
+
+def _measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine = fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {len(engine.labels_):>8} rows {len(engine.columns_):>4} features "
+          f"{seconds:9.3f} s  peak {peak / 2**20:8.1f} MiB")
+    return engine, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare clustering the exploded response x course rows with the student-level model.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--students', type=int, default=0,
+                        help="Benchmark a synthetic cohort of this size instead of --data-dir (see benchmark.py)")
+    parser.add_argument('--clusters', type=int, default=3)
+    args = parser.parse_args()
+
+    # Imported up front so the first timed fit does not pay for it
+    import sklearn_extra.cluster  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir
+        if args.students:
+            from benchmark import generate_dataset
+            data_dir = generate_dataset(args.students, tmp, template_dir=args.data_dir)
+        frame, _ = build_student_table(data_dir, normalize='letter')
+        incidence = load_course_incidence(os.path.join(data_dir, 'courses.csv'))
+
+        print(f"{frame[ROLL].nunique()} students, {len(frame)} merged rows; "
+              f"declared features: {len(feature_columns)}")
+        exploded, exploded_seconds = _measure('exploded', exploded_model, frame, args.clusters)
+        students, student_seconds = _measure('student-level', student_model, frame, incidence, args.clusters)
+
+    print(f"Rows: {len(exploded.labels_) / len(students.labels_):.1f}x fewer, "
+          f"fit: {exploded_seconds / student_seconds:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import string
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from clustering import fit_clara, fit_pam_precomputed, fit_profiles
+from gower_distance import gower_matrix_blocked, prepare_gower_features
+from incidence import incidence_from_pairs
+from instrument import peak_rss_bytes, proc_rss_bytes, reset_peak_rss
+from loader import ROLL, encode_sources, read_sources
+from pipeline import categorical_columns, training_features
+from popularity import CoursePopularityIndex
+from profiles import unique_profiles
+from similarity import CourseSimilarityIndex, blended_top_n
+
+
+# Synthetic response/marks/courses tables shaped like the real ones. Every
+# latent student group has its own peaked draw of option frequencies around
+# the template response.csv and a few archetype questionnaires: a
+# repeat_fraction of its students copy one of them verbatim (Zipf-weighted, so
+# a handful of profiles repeat very often, as in a real cohort) and the rest
+# answer question by question. Marks scatter around the group's mean and the
+# 3-10 courses follow the group's own Zipf-like course popularity, so the
+# groups are recoverable from answers, marks and courses alike.
+def generate_dataset(n_students, out_dir, template_dir='.', n_courses=26, n_groups=3, seed=42,
+                     chunk_size=100000, n_archetypes=8, repeat_fraction=0.95):
+    rng = np.random.default_rng(seed)
+    template = pd.read_csv(os.path.join(template_dir, 'response.csv'))
+    questions = list(template.columns[4:])
+    os.makedirs(out_dir, exist_ok=True)
+
+    groups = rng.integers(0, n_groups, n_students)
+    archetype_weights = 1.0 / np.arange(1, n_archetypes + 1)
+    archetypes = rng.choice(n_archetypes, n_students, p=archetype_weights / archetype_weights.sum())
+    copies = rng.random(n_students) < repeat_fraction
+    roll_numbers = 20000000 + np.arange(n_students, dtype=np.int64)
+    response = {
+        'Submission ID': [f'S{i}' for i in range(n_students)],
+        'Submission time': '2025-01-01 00:00:00',
+        'Name': [f'Student {i}' for i in range(n_students)],
+        ROLL: roll_numbers,
+    }
+    for question in questions:
+        counts = template[question].value_counts()
+        options = np.array(counts.index, dtype=object)
+        base = (counts.to_numpy() + 0.5) / (counts.sum() + 0.5 * len(counts))
+        cumulative = np.cumsum(rng.dirichlet(0.5 * len(options) * base, size=n_groups), axis=1)
+        picks = (rng.random(n_students)[:, None] > cumulative[groups]).sum(axis=1)
+        archetype_picks = (rng.random((n_groups, n_archetypes, 1)) > cumulative[:, None, :]).sum(axis=2)
+        picks = np.where(copies, archetype_picks[groups, archetypes], picks)
+        response[question] = options[np.minimum(picks, len(options) - 1)]
+    pd.DataFrame(response).to_csv(os.path.join(out_dir, 'response.csv'), index=False)
+
+    group_marks = rng.uniform(6.0, 9.0, n_groups)
+    marks = np.clip(group_marks[groups] + rng.normal(0, 0.8, n_students), 5.0, 10.0).round(2)
+    pd.DataFrame({'roll no': roll_numbers, 'marks': marks}).to_csv(os.path.join(out_dir, 'marks.csv'), index=False)
+
+    courses = np.array(list(string.ascii_uppercase) if n_courses <= 26 else [f'C{i:04d}' for i in range(n_courses)])
+    courses = courses[:n_courses]
+    zipf = 1.0 / np.arange(1, n_courses + 1)
+    # Each group prefers its own permutation of the Zipf popularity
+    log_popularity = np.log(np.stack([zipf[rng.permutation(n_courses)] for _ in range(n_groups)]))
+    with open(os.path.join(out_dir, 'courses.csv'), 'w', newline='') as f:
+        f.write('roll no,course\n')
+        for start in range(0, n_students, chunk_size):
+            stop = min(start + chunk_size, n_students)
+            # Sampling without replacement by Gumbel top-k
+            keys = log_popularity[groups[start:stop]] + rng.gumbel(size=(stop - start, n_courses))
+            order = np.argsort(-keys, axis=1)[:, :10]
+            take = np.arange(10)[None, :] < rng.integers(3, min(10, n_courses) + 1, stop - start)[:, None]
+            rows, positions = np.nonzero(take)
+            pd.DataFrame({'roll no': roll_numbers[start:stop][rows], 'course': courses[order[rows, positions]]}) \
+                .to_csv(f, header=False, index=False)
+
+    shutil.copy(os.path.join(template_dir, 'dispersion.csv'), out_dir)
+    return out_dir
+
+
+# Hide hide_fraction (at least one, never all) of the enrollments of
+# test_fraction of the students with two or more courses. Returns the visible
+# and hidden incidence matrices and the test rows.
+def split_enrollments(matrix, test_fraction=0.2, hide_fraction=0.3, random_state=42):
+    rng = np.random.default_rng(random_state)
+    n = matrix.shape[0]
+    counts = np.diff(matrix.indptr)
+    eligible = np.flatnonzero(counts >= 2)
+    rows = np.sort(rng.choice(eligible, int(round(len(eligible) * test_fraction)), replace=False))
+    limit = np.zeros(n, dtype=np.int64)
+    limit[rows] = np.clip(np.round(counts[rows] * hide_fraction), 1, counts[rows] - 1)
+
+    # Rank the enrollments of each row in a random order; hide the first limit
+    row_of = np.repeat(np.arange(n), counts)
+    order = np.lexsort((rng.random(matrix.nnz), row_of))
+    hide = np.zeros(matrix.nnz, dtype=bool)
+    hide[order] = np.arange(matrix.nnz) - matrix.indptr[row_of[order]] < limit[row_of[order]]
+
+    visible = matrix.copy()
+    visible.data = np.where(hide, 0, matrix.data).astype(matrix.dtype)
+    visible.eliminate_zeros()
+    hidden = matrix.copy()
+    hidden.data = hide.astype(matrix.dtype)
+    hidden.eliminate_zeros()
+    return visible, hidden, rows
+
+
+# Mean precision@N and recall@N of (rows x N) course ids (-1 padding)
+# against a (rows x courses) bool mask of the held-out enrollments
+def precision_recall_at_n(ids, hidden_mask):
+    hits = np.take_along_axis(hidden_mask, np.maximum(ids, 0), axis=1) & (ids >= 0)
+    n_hits = hits.sum(axis=1)
+    n_hidden = hidden_mask.sum(axis=1)
+    precision = float((n_hits / ids.shape[1]).mean()) if len(ids) else float('nan')
+    recall = float((n_hits / np.maximum(n_hidden, 1)).mean()) if len(ids) else float('nan')
+    return {'precision': precision, 'recall': recall}
+
+
+# Run fn once, recording under stages[name] its wall time and its own peak
+# RSS above the RSS it started from: the high-water mark is reset before every
+# stage, so earlier stages' peaks do not hide it. None where the mark cannot
+# be reset. No allocation tracing runs meanwhile, so timings are not inflated.
+def _stage(stages, name, fn):
+    measured = reset_peak_rss()
+    rss_before = proc_rss_bytes()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    increase = (proc_rss_bytes('VmHWM') - rss_before) / 2**20 if measured else None
+    stages[name] = {'seconds': seconds, 'peak_rss_increase_mib': increase}
+    return result
+
+
+# The generated groups are only recovered when clustering beats one global
+# ranking; returns the sizes where it did not
+def cluster_regressions(results):
+    return [r['students'] for r in results
+            if r['quality']['cluster_popularity']['precision'] <= r['quality']['global_popularity']['precision']]
+
+
+# Every pipeline stage on one generated dataset, then offline quality of the
+# global-popularity, cluster-popularity and blended item-item recommenders on
+# the held-out enrollments. backend='auto' runs PAM on the full Gower matrix
+# up to pam_limit students, then weighted k-medoids over unique profiles while
+# those stay under pam_limit, and CLARA beyond that.
+def run_size(data_dir, n_clusters=3, top_n=3, pam_limit=10000, item_weight=0.5, random_state=42, backend='auto'):
+    stages = {}
+    sources = _stage(stages, 'load', lambda: read_sources(data_dir))
+    frame, _ = _stage(stages, 'encode', lambda: encode_sources(*sources))
+    courses_df = sources[2]
+    del sources
+
+    def features():
+        incidence = incidence_from_pairs(courses_df['roll no'], courses_df['course'])
+        return training_features(frame, incidence)
+
+    features_df, _, incidence = _stage(stages, 'features', features)
+    del frame
+    visible, hidden, test_rows = split_enrollments(incidence.matrix, random_state=random_state)
+    prep = prepare_gower_features(features_df, categorical_columns, sets=visible)
+    n = len(features_df)
+    n_profiles = len(unique_profiles(prep).counts)
+
+    if backend == 'auto':
+        backend = 'pam' if n <= pam_limit else 'profiles' if n_profiles <= pam_limit else 'clara'
+    if backend == 'pam':
+        matrix = _stage(stages, 'gower', lambda: gower_matrix_blocked(prep))
+        result = _stage(stages, 'cluster', lambda: fit_pam_precomputed(matrix, n_clusters, random_state))
+        del matrix
+    elif backend == 'profiles':
+        # Profile table, lookup-table Gower and weighted k-medoids together
+        result = _stage(stages, 'cluster', lambda: fit_profiles(prep, n_clusters, random_state,
+                                                                 max_profiles=max(pam_limit, n_profiles)))
+    else:
+        # n x k distances to the medoids are computed inside CLARA
+        result = _stage(stages, 'cluster', lambda: fit_clara(prep, n_clusters, random_state))
+    labels = np.asarray(result.labels)
+
+    def recommend():
+        popularity = CoursePopularityIndex.from_incidence(labels, visible, incidence.courses, n_clusters)
+        return popularity, popularity.top_n_ids_batch(np.arange(n), labels, top_n)
+
+    popularity, _ = _stage(stages, 'recommend', recommend)
+
+    hidden_mask = hidden[test_rows].toarray().astype(bool)
+    test_labels = labels[test_rows]
+    overall = CoursePopularityIndex.from_incidence(np.zeros(n, dtype=np.int64), visible, incidence.courses, 1)
+    similarity = CourseSimilarityIndex.build(visible, incidence.courses)
+    cluster_counts = popularity.cluster_counts()
+    blend = np.full((len(test_rows), top_n), -1, dtype=np.int32)
+    for start in range(0, len(test_rows), 8192):
+        chunk = slice(start, start + 8192)
+        taken = popularity.taken_masks(test_rows[chunk])
+        blend[chunk] = blended_top_n(cluster_counts[test_labels[chunk]], similarity.score_batch(taken), taken,
+                                     top_n, item_weight)
+    quality = {
+        'global_popularity': precision_recall_at_n(
+            overall.top_n_ids_batch(test_rows, np.zeros(len(test_rows), dtype=np.int64), top_n), hidden_mask),
+        'cluster_popularity': precision_recall_at_n(popularity.top_n_ids_batch(test_rows, test_labels, top_n),
+                                                    hidden_mask),
+        f'blend_{item_weight:g}': precision_recall_at_n(blend, hidden_mask),
+    }
+    return {'students': n, 'unique_profiles': n_profiles, 'backend': backend, 'test_students': len(test_rows),
+            'held_out': int(hidden.nnz), 'stages': stages, 'quality': quality}
+
+
+def _git_version():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(text):
+    return [int(float(v)) for v in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pipeline and measure recommendation quality on synthetic cohorts.")
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help="Student counts, comma separated")
+    parser.add_argument('--template-dir', default='.', help="Directory with the real response.csv and dispersion.csv")
+    parser.add_argument('--data-root', help="Keep generated datasets here and reuse them (default: a temp dir)")
+    parser.add_argument('--clusters', type=int, default=3)
+    parser.add_argument('--top-n', type=int, default=3)
+    parser.add_argument('--pam-limit', type=int, default=10000,
+                        help="Largest cohort (or unique profile count) clustered with a full matrix")
+    parser.add_argument('--backend', choices=['auto', 'pam', 'profiles', 'clara'], default='auto')
+    parser.add_argument('--out', default='benchmark.json')
+    parser.add_argument('--baseline', help="Earlier benchmark JSON to compare stage times against")
+    args = parser.parse_args()
+
+    # Imported up front so the first timed stage does not pay for them
+    import sklearn_extra.cluster  # noqa: F401
+
+    data_root = args.data_root or tempfile.mkdtemp(prefix='bench-')
+    results = []
+    try:
+        for size in _int_list(args.sizes):
+            data_dir = os.path.join(data_root, str(size))
+            if not os.path.exists(os.path.join(data_dir, 'dispersion.csv')):
+                start = time.perf_counter()
+                generate_dataset(size, data_dir, args.template_dir)
+                print(f"Generated {size} students in {time.perf_counter() - start:.1f} s")
+            result = run_size(data_dir, args.clusters, args.top_n, args.pam_limit, backend=args.backend)
+            result['peak_rss_mib'] = peak_rss_bytes() / 2**20
+            results.append(result)
+
+            stages = '  '.join(f"{name} {s['seconds']:.3f}s" + (f"/+{s['peak_rss_increase_mib']:.0f}MiB"
+                                                               if s['peak_rss_increase_mib'] is not None else '')
+                               for name, s in result['stages'].items())
+            print(f"{size:>8} students ({result['unique_profiles']} profiles) [{result['backend']}]  {stages}")
+            for name, q in result['quality'].items():
+                print(f"{'':>10}{name:<20} precision@{args.top_n} {q['precision']:.3f}  "
+                      f"recall@{args.top_n} {q['recall']:.3f}")
+    finally:
+        if args.data_root is None:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+    report = {'version': _git_version(), 'created_at': time.time(), 'python': platform.python_version(),
+              'numpy': np.__version__, 'pandas': pd.__version__, 'cpu_count': os.cpu_count(),
+              'top_n': args.top_n, 'results': results}
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = {r['students']: r for r in json.load(f)['results']}
+        print(f"Stage time vs {args.baseline} (ratio > 1 is slower):")
+        for result in results:
+            before = baseline.get(result['students'])
+            if before is None:
+                continue
+            ratios = '  '.join(f"{name} {s['seconds'] / before['stages'][name]['seconds']:.2f}x"
+                               for name, s in result['stages'].items()
+                               if name in before['stages'] and before['stages'][name]['seconds'] > 0)
+            print(f"{result['students']:>8} students  {ratios}")
+
+    regressions = cluster_regressions(results)
+    if regressions:
+        raise SystemExit(f"Cluster popularity did not beat global popularity at {regressions} students")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# LRU cache with an optional time-to-live, for recommendation results keyed by
+# an encoded questionnaire profile. Entries past their TTL count as misses and
+# are dropped when read. Hit-rate counters survive clear(), so they describe
+# the cache over the whole run.
+class ResultCache:
+    def __init__(self, maxsize=4096, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, stored_at = entry
+        if self.ttl is not None and self.clock() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (value, self.clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Drop every entry, e.g. after a refit or a model swap
+    def clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate(), 'evictions': self.evictions,
+                'expirations': self.expirations, 'invalidations': self.invalidations}
+
+
+# Hashable key of one encoded profile: its numeric values (NaN as None) and
+# categorical codes, plus the model version, top_n and the courses already taken
+def profile_key(model_version, X_num, X_cat, top_n=3, taken=()):
+    num = tuple(None if v != v else float(v) for v in np.asarray(X_num, dtype=np.float64).ravel())
+    cat = tuple(v.item() if hasattr(v, 'item') else v for v in np.asarray(X_cat, dtype=object).ravel())
+    return model_version, num, cat, top_n, tuple(sorted(taken))
@@ -0,0 +1,271 @@
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from gower_distance import gower_between, gower_matrix_blocked, prepare_gower_features
+from instrument import stage
+
+# medoid_indices: row of each medoid; labels: cluster of each row;
+# medoid_distances: (rows x k) Gower distance of every row to every medoid
+KMedoidsResult = namedtuple('KMedoidsResult', ['medoid_indices', 'labels', 'medoid_distances'])
+
+
+# Distances from every row to the given medoid rows, n x k, in row blocks
+def distances_to(prep, medoids, block_rows=8192):
+    n = len(prep['num'])
+    medoids = np.asarray(medoids)
+    out = np.empty((n, len(medoids)), dtype=np.float32)
+    for r0 in range(0, n, block_rows):
+        out[r0:r0 + block_rows] = gower_between(prep, slice(r0, r0 + block_rows), medoids)
+    return out
+
+
+def _result(prep, medoids):
+    medoid_distances = distances_to(prep, medoids)
+    return KMedoidsResult(np.asarray(medoids), medoid_distances.argmin(axis=1), medoid_distances)
+
+
+def total_cost(result):
+    return float(result.medoid_distances[np.arange(len(result.labels)), result.labels].sum())
+
+
+# k-medoids on an already computed n x n distance matrix (an array or memmap).
+# init='heuristic' is deterministic; 'k-medoids++' makes random_state matter.
+def fit_pam_precomputed(matrix, n_clusters, random_state=42, method='alternate', init='heuristic'):
+    from sklearn_extra.cluster import KMedoids
+
+    kmedoids = KMedoids(n_clusters=n_clusters, metric="precomputed", method=method, init=init,
+                        random_state=random_state)
+    with stage('kmedoids_fit'):
+        kmedoids.fit(matrix)
+    medoids = kmedoids.medoid_indices_
+    return KMedoidsResult(medoids, kmedoids.labels_, np.asarray(matrix[:, medoids]))
+
+
+# Exact k-medoids over the full Gower matrix (the original pipeline: O(n^2) memory)
+def fit_pam(prep, n_clusters, random_state=42, method='alternate', init='heuristic', block_rows=2048, n_jobs=1,
+            out=None):
+    matrix = gower_matrix_blocked(prep, block_rows=block_rows, n_jobs=n_jobs, out=out)
+    return fit_pam_precomputed(matrix, n_clusters, random_state, method, init)
+
+
+# CLARA: PAM on n_samples random subsets of sample_size rows (each seeded with the
+# best medoids so far), keeping the medoids with the lowest cost over all rows.
+# Memory is O(sample_size^2 + n * k).
+def fit_clara(prep, n_clusters, random_state=42, n_samples=5, sample_size=None):
+    from sklearn_extra.cluster import KMedoids
+
+    rng = np.random.default_rng(random_state)
+    n = len(prep['num'])
+    sample_size = min(n, sample_size or 40 + 2 * n_clusters)
+    best, best_cost = None, np.inf
+    for _ in range(n_samples):
+        if best is None:
+            sample = rng.choice(n, sample_size, replace=False)
+        else:
+            others = np.setdiff1d(np.arange(n), best.medoid_indices)
+            extra = rng.choice(others, sample_size - len(best.medoid_indices), replace=False)
+            sample = np.concatenate([best.medoid_indices, extra])
+        sample = np.sort(sample)
+
+        sub_matrix = gower_between(prep, sample, sample)
+        np.fill_diagonal(sub_matrix, 0.0)
+        kmedoids = KMedoids(n_clusters=n_clusters, metric="precomputed", method='pam', init='build')
+        kmedoids.fit(sub_matrix)
+
+        result = _result(prep, sample[kmedoids.medoid_indices_])
+        cost = total_cost(result)
+        if cost < best_cost:
+            best, best_cost = result, cost
+    return best
+
+
+# Nearest / second-nearest medoid of every row from the (rows x k) distances
+def _nearest_two(medoid_distances):
+    n, k = medoid_distances.shape
+    if k == 1:
+        return np.zeros(n, dtype=np.int64), medoid_distances[:, 0], np.full(n, np.inf, dtype=np.float32)
+    order = np.argpartition(medoid_distances, 1, axis=1)[:, :2]
+    rows = np.arange(n)
+    return order[:, 0], medoid_distances[rows, order[:, 0]], medoid_distances[rows, order[:, 1]]
+
+
+# k-medoids++ seeding: O(n * k) distance evaluations
+def _kmedoids_plusplus(prep, n_clusters, rng):
+    n = len(prep['num'])
+    medoids = [int(rng.integers(n))]
+    nearest = gower_between(prep, slice(None), medoids)[:, 0].astype(np.float64)
+    for _ in range(1, n_clusters):
+        weights = nearest ** 2
+        total = weights.sum()
+        candidate = int(rng.choice(n, p=weights / total)) if total > 0 else int(rng.integers(n))
+        medoids.append(candidate)
+        nearest = np.minimum(nearest, gower_between(prep, slice(None), [candidate])[:, 0])
+    return medoids
+
+
+# FasterPAM-style eager swaps (Schubert & Rousseeuw): each candidate's best swap
+# against all k medoids is evaluated in O(n) from the nearest/second-nearest
+# distances, and applied as soon as it lowers the cost. Distances to candidates
+# are computed on the fly in batches, so memory stays O(n * k).
+def fit_fasterpam(prep, n_clusters, random_state=42, max_iter=100, candidate_batch=64, max_candidates=None):
+    rng = np.random.default_rng(random_state)
+    n = len(prep['num'])
+    medoids = _kmedoids_plusplus(prep, n_clusters, rng)
+    medoid_distances = distances_to(prep, medoids)
+    nearest, d_near, d_second = _nearest_two(medoid_distances)
+    tolerance = 1e-6 * max(float(d_near.sum()), 1.0)
+
+    for _ in range(max_iter):
+        swapped = False
+        candidates = rng.permutation(n)
+        if max_candidates is not None:
+            candidates = candidates[:max_candidates]
+        for b0 in range(0, len(candidates), candidate_batch):
+            batch = candidates[b0:b0 + candidate_batch]
+            batch_distances = gower_between(prep, slice(None), batch)
+            for j, candidate in enumerate(batch):
+                if candidate in medoids:
+                    continue
+                d_c = batch_distances[:, j]
+                # Cost of removing each medoid, then the effect of adding the candidate
+                delta = np.bincount(nearest, d_second - d_near, minlength=n_clusters)
+                closer = d_c < d_near
+                shared = float((d_c - d_near)[closer].sum())
+                delta += np.bincount(nearest[closer], (d_near - d_second)[closer], minlength=n_clusters)
+                between = ~closer & (d_c < d_second)
+                delta += np.bincount(nearest[between], (d_c - d_second)[between], minlength=n_clusters)
+
+                m = int(delta.argmin())
+                if shared + delta[m] < -tolerance:
+                    medoids[m] = int(candidate)
+                    medoid_distances[:, m] = d_c
+                    nearest, d_near, d_second = _nearest_two(medoid_distances)
+                    swapped = True
+        if not swapped:
+            break
+
+    return KMedoidsResult(np.asarray(medoids), medoid_distances.argmin(axis=1), medoid_distances)
+
+
+# Weighted k-medoids ('alternate' iteration with the 'heuristic' init of
+# sklearn_extra's KMedoids): row i stands for weights[i] identical points, so
+# the cost is sum(weights * distance to medoid). With unit weights it is the
+# unweighted algorithm.
+def fit_weighted_alternate(matrix, weights, n_clusters, max_iter=300):
+    # Same dtype as the matrix, so the products below do not upcast a copy of it
+    weights = np.asarray(weights, dtype=matrix.dtype)
+    medoids = np.argsort(matrix @ weights, kind='stable')[:n_clusters]
+    for _ in range(max_iter):
+        labels = matrix[:, medoids].argmin(axis=1)
+        previous = medoids.copy()
+        for c in range(n_clusters):
+            members = np.flatnonzero(labels == c)
+            if len(members) == 0:
+                continue
+            costs = weights[members] @ matrix[np.ix_(members, members)]
+            best = costs.argmin()
+            # The medoid itself may be labelled into another cluster (a tie
+            # with a duplicate medoid), so its cost is computed directly
+            if costs[best] < weights[members] @ matrix[members, medoids[c]]:
+                medoids[c] = members[best]
+        if np.array_equal(previous, medoids):
+            break
+    medoid_distances = np.asarray(matrix[:, medoids])
+    return KMedoidsResult(medoids, medoid_distances.argmin(axis=1), medoid_distances)
+
+
+# k-medoids over unique answer profiles (see profiles.py): students sharing
+# answers and numeric buckets are one weighted point (courses enter as the
+# profile's mean course set), so the matrix is (profiles x profiles) instead
+# of n x n. Medoids are the first student of each medoid profile; every
+# student is then labelled by its exact distance to them, own courses
+# included. Fails when the profiles are too many for a dense matrix (answers
+# too diverse): use 'clara' or 'fasterpam' there.
+def fit_profiles(prep, n_clusters, random_state=42, n_buckets=20, block_rows=256, max_iter=300,
+                 max_profiles=20000):
+    from profiles import profile_matrix, unique_profiles
+
+    profiles = unique_profiles(prep, n_buckets)
+    if len(profiles.counts) > max_profiles:
+        raise ValueError(f"{len(profiles.counts)} unique profiles exceed max_profiles={max_profiles}; "
+                         f"use fewer n_buckets or another backend")
+    matrix = profile_matrix(profiles, block_rows)
+    result = fit_weighted_alternate(matrix, profiles.counts, min(n_clusters, len(matrix)), max_iter)
+    return _result(prep, profiles.representatives[result.medoid_indices])
+
+
+BACKENDS = {
+    'pam': fit_pam,
+    'clara': fit_clara,
+    'fasterpam': fit_fasterpam,
+    'profiles': fit_profiles,
+}
+
+
+def fit_kmedoids(prep, n_clusters, backend='pam', random_state=42, **options):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    with stage('cluster'):
+        return BACKENDS[backend](prep, n_clusters, random_state=random_state, **options)
+
+
+# Silhouette on the full data, or on a random sample of rows for large n
+def silhouette(prep, labels, sample_size=2000, random_state=42):
+    from sklearn.metrics import silhouette_score
+
+    labels = np.asarray(labels)
+    n = len(labels)
+    rows = np.arange(n)
+    if n > sample_size:
+        rows = np.sort(np.random.default_rng(random_state).choice(n, sample_size, replace=False))
+    if len(np.unique(labels[rows])) < 2:
+        return float('nan')
+    matrix = gower_between(prep, rows, rows)
+    np.fill_diagonal(matrix, 0.0)
+    return float(silhouette_score(matrix, labels[rows], metric='precomputed'))
+
+
+# Fit every backend on the same prepared features and report run time, mean
+# distance to medoid, silhouette and label agreement (adjusted Rand) with PAM
+def compare_backends(prep, n_clusters, backends=('pam', 'clara', 'fasterpam', 'profiles'), random_state=42):
+    from sklearn.metrics import adjusted_rand_score
+
+    report = []
+    reference = None
+    for backend in backends:
+        start = time.perf_counter()
+        result = fit_kmedoids(prep, n_clusters, backend, random_state)
+        seconds = time.perf_counter() - start
+        if backend == 'pam':
+            reference = result.labels
+        report.append({
+            'backend': backend,
+            'seconds': seconds,
+            'cost': total_cost(result) / len(result.labels),
+            'silhouette': silhouette(prep, result.labels, random_state=random_state),
+            'ari_vs_pam': float(adjusted_rand_score(reference, result.labels)) if reference is not None else float('nan'),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare k-medoids backends on the student data.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--clusters', type=int, default=3)
+    args = parser.parse_args()
+
+    from pipeline import categorical_columns, prepare_training_data
+
+    features, _, incidence, _ = prepare_training_data(args.data_dir)
+    prep = prepare_gower_features(features, categorical_columns, sets=incidence.matrix)
+    print(f"{'backend':<10} {'seconds':>9} {'mean cost':>10} {'silhouette':>11} {'ARI vs PAM':>11}")
+    for row in compare_backends(prep, args.clusters):
+        print(f"{row['backend']:<10} {row['seconds']:>9.3f} {row['cost']:>10.4f} "
+              f"{row['silhouette']:>11.4f} {row['ari_vs_pam']:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_FILES = ('response.csv', 'marks.csv', 'courses.csv', 'dispersion.csv', 'quantified_results.csv')
+
+
+def _copy_sample(target):
+    for name in SAMPLE_FILES:
+        shutil.copy(os.path.join(HERE, name), target)
+    return target
+
+
+# The sample CSVs in a scratch directory (caches and artifacts are written
+# next to the data, never into the checkout)
+@pytest.fixture
+def data_dir(tmp_path):
+    return _copy_sample(tmp_path)
+
+
+# An artifact fitted on the sample data, shared by the serve-path tests
+@pytest.fixture(scope='session')
+def model_dir(tmp_path_factory):
+    from artifact import main
+
+    data = _copy_sample(tmp_path_factory.mktemp('sample'))
+    out = tmp_path_factory.mktemp('model')
+    main(['build', '--data-dir', str(data), '--out', str(out)])
+    return str(out)
+
+
+# Questionnaire answers of the first sample student, as a new user sends them
+@pytest.fixture(scope='session')
+def answers():
+    return {k: v for k, v in pd.read_csv(os.path.join(HERE, 'response.csv')).iloc[0].items()
+            if isinstance(v, str)}
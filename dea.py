@@ -0,0 +1,283 @@
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import highspy
+except ImportError:  # fall back to scipy's linprog (no warm start)
+    highspy = None
+
+# Infinitesimal weight on the slacks in the output-oriented objective
+EPSILON = 1e-6
+# Tolerance for theta == 1 and zero slacks when classifying efficient students
+TOLERANCE = 1e-6
+
+# Per evaluated student: theta (output expansion factor, 1 = efficient),
+# input/output slacks, and the reference peers (indices into the reference
+# set) with their lambda weights
+DEAResult = namedtuple('DEAResult', ['theta', 'slack_in', 'slack_out', 'peers', 'weights'])
+
+
+# Output-oriented DEA with slacks for one student o against a reference set:
+#   max  theta + eps * (sum s_in + sum s_out)
+#   s.t. sum_j lambda_j x_ij + s_in_i           = x_io
+#        sum_j lambda_j y_rj - s_out_r - theta y_ro = 0
+#        (sum_j lambda_j = 1 for variable returns to scale)
+# Column layout: [theta, lambda_1..n, s_in_1..m, s_out_1..s]. Only the theta
+# column and the input right-hand sides depend on o, so one LP is built per
+# reference set and patched in place for every student.
+class LPStructure:
+    def __init__(self, X_ref, Y_ref, returns='crs', epsilon=EPSILON):
+        self.n, self.m = X_ref.shape
+        self.s = Y_ref.shape[1]
+        self.vrs = returns == 'vrs'
+        self.n_cols = 1 + self.n + self.m + self.s
+        self.n_rows = self.m + self.s + (1 if self.vrs else 0)
+
+        self.cost = np.zeros(self.n_cols)
+        self.cost[0] = 1.0
+        self.cost[1 + self.n:] = epsilon
+
+        A = np.zeros((self.n_rows, self.n_cols))
+        A[:self.m, 1:1 + self.n] = X_ref.T
+        A[:self.m, 1 + self.n:1 + self.n + self.m] = np.eye(self.m)
+        A[self.m:self.m + self.s, 1:1 + self.n] = Y_ref.T
+        A[self.m:self.m + self.s, 1 + self.n + self.m:] = -np.eye(self.s)
+        if self.vrs:
+            A[-1, 1:1 + self.n] = 1.0
+        self.A = A
+
+    def rhs(self, x_o):
+        b = np.zeros(self.n_rows)
+        b[:self.m] = x_o
+        if self.vrs:
+            b[-1] = 1.0
+        return b
+
+    def unpack(self, solution):
+        theta = solution[0]
+        lambdas = solution[1:1 + self.n]
+        slack_in = solution[1 + self.n:1 + self.n + self.m]
+        slack_out = solution[1 + self.n + self.m:]
+        peers = np.flatnonzero(lambdas > TOLERANCE)
+        return theta, slack_in, slack_out, peers, lambdas[peers]
+
+
+# HiGHS model kept alive across students: patching the theta column and the
+# row bounds keeps the previous optimal basis, so each solve is warm-started
+class _HighsSolver:
+    def __init__(self, structure):
+        self.structure = structure
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        lp = highspy.HighsLp()
+        lp.num_col_ = structure.n_cols
+        lp.num_row_ = structure.n_rows
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = structure.cost
+        lp.col_lower_ = np.zeros(structure.n_cols)
+        lp.col_upper_ = np.full(structure.n_cols, highspy.kHighsInf)
+        b = structure.rhs(np.zeros(structure.m))
+        lp.row_lower_ = b
+        lp.row_upper_ = b
+        # Column-wise sparse matrix; the theta column gets explicit entries in
+        # the output rows so they can be patched with changeCoeff
+        A = structure.A.copy()
+        A[structure.m:structure.m + structure.s, 0] = -1.0
+        starts, indices, values = [0], [], []
+        for j in range(structure.n_cols):
+            rows = np.flatnonzero(A[:, j])
+            indices.extend(rows)
+            values.extend(A[rows, j])
+            starts.append(len(indices))
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = np.array(starts, dtype=np.int32)
+        lp.a_matrix_.index_ = np.array(indices, dtype=np.int32)
+        lp.a_matrix_.value_ = np.array(values, dtype=np.float64)
+        h.passModel(lp)
+        self.h = h
+
+    def solve(self, x_o, y_o):
+        st = self.structure
+        for r in range(st.s):
+            self.h.changeCoeff(st.m + r, 0, -float(y_o[r]))
+        b = st.rhs(x_o)
+        for i in range(st.m):
+            self.h.changeRowBounds(i, float(b[i]), float(b[i]))
+        self.h.run()
+        if self.h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            raise RuntimeError(f"DEA LP not solved: {self.h.modelStatusToString(self.h.getModelStatus())}")
+        return np.asarray(self.h.getSolution().col_value)
+
+    # Drop reference students (positions in the reference set) by fixing their
+    # lambda to 0; the model and its basis are kept
+    def deactivate(self, positions):
+        for j in positions:
+            self.h.changeColBounds(1 + int(j), 0.0, 0.0)
+
+
+# scipy fallback: the constraint matrix is still built once, only the theta
+# column and right-hand side change between students
+class _LinprogSolver:
+    def __init__(self, structure):
+        self.structure = structure
+        self.A = structure.A.copy()
+        self.bounds = np.column_stack([np.zeros(structure.n_cols), np.full(structure.n_cols, np.inf)])
+
+    def solve(self, x_o, y_o):
+        from scipy.optimize import linprog
+
+        st = self.structure
+        self.A[st.m:st.m + st.s, 0] = -y_o
+        result = linprog(-st.cost, A_eq=self.A, b_eq=st.rhs(x_o), bounds=self.bounds, method='highs')
+        if result.status != 0:
+            raise RuntimeError(f"DEA LP not solved: {result.message}")
+        return result.x
+
+    def deactivate(self, positions):
+        self.bounds[1 + np.asarray(positions, dtype=np.int64), 1] = 0.0
+
+
+# One reusable LP for a reference set: 'highs' (warm-started, needs highspy),
+# 'linprog' (scipy) or 'auto'
+def make_solver(structure, solver='auto'):
+    use_highs = solver == 'highs' or (solver == 'auto' and highspy is not None)
+    return _HighsSolver(structure) if use_highs else _LinprogSolver(structure)
+
+
+# Evaluate students (rows of X/Y) against a reference set of students, reusing
+# one LP structure for all of them. reference defaults to all rows, dmus to all
+# rows. Returns one DEAResult of arrays/lists aligned with dmus. With
+# strict=False an LP without optimum (e.g. VRS against a set that does not
+# contain the student) gives theta = NaN instead of raising.
+def solve_dea(X, Y, dmus=None, reference=None, returns='crs', epsilon=EPSILON, solver='auto', strict=True):
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    dmus = np.arange(len(X)) if dmus is None else np.asarray(dmus)
+    reference = np.arange(len(X)) if reference is None else np.asarray(reference)
+
+    structure = LPStructure(X[reference], Y[reference], returns, epsilon)
+    lp = make_solver(structure, solver)
+
+    theta = np.empty(len(dmus))
+    slack_in = np.empty((len(dmus), X.shape[1]))
+    slack_out = np.empty((len(dmus), Y.shape[1]))
+    peers, weights = [], []
+    for k, o in enumerate(dmus):
+        try:
+            theta[k], slack_in[k], slack_out[k], p, w = structure.unpack(lp.solve(X[o], Y[o]))
+        except RuntimeError:
+            if strict:
+                raise
+            theta[k], slack_in[k], slack_out[k], p, w = np.nan, np.nan, np.nan, np.array([], dtype=np.int64), np.array([])
+        peers.append(reference[p])
+        weights.append(w)
+    return DEAResult(theta, slack_in, slack_out, peers, weights)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    return values if np.issubdtype(values.dtype, np.floating) else values.astype(np.float64)
+
+
+def is_efficient(result):
+    return (result.theta <= 1 + TOLERANCE) & (result.slack_in.max(axis=1, initial=0) <= TOLERANCE) \
+        & (result.slack_out.max(axis=1, initial=0) <= TOLERANCE)
+
+
+def is_efficient_solution(theta, slack_in, slack_out):
+    return theta <= 1 + TOLERANCE and slack_in.max(initial=0) <= TOLERANCE and slack_out.max(initial=0) <= TOLERANCE
+
+
+# Per-process state: every cluster's (X, Y) slices and the LP options, sent
+# once per worker rather than with every chunk
+_worker_clusters = None
+_worker_options = None
+
+
+def _init_worker(clusters, options):
+    global _worker_clusters, _worker_options
+    _worker_clusters = clusters
+    _worker_options = options
+
+
+def _solve_chunk(cluster, dmus):
+    X, Y = _worker_clusters[cluster]
+    return cluster, dmus, solve_dea(X, Y, dmus=dmus, **_worker_options)
+
+
+# DEA within every cluster, solved in parallel worker processes. Large clusters
+# are split into chunks of students that share the cluster's reference set, so
+# one big cluster still spreads across cores.
+# Returns {cluster: (row indices, DEAResult)}; peers are row indices of X.
+def solve_clusters(X, Y, labels, returns='crs', epsilon=EPSILON, solver='auto', n_jobs=None, chunk_size=250):
+    # Float inputs are used as they are (e.g. float32 feature store views); each
+    # cluster's rows are gathered and widened by solve_dea
+    X = _as_float(X)
+    Y = _as_float(Y)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    labels = np.asarray(labels)
+    cluster_rows = {cluster: np.flatnonzero(labels == cluster) for cluster in np.unique(labels)}
+    clusters = {cluster: (X[rows], Y[rows]) for cluster, rows in cluster_rows.items()}
+    options = {'returns': returns, 'epsilon': epsilon, 'solver': solver}
+    tasks = [(cluster, np.arange(start, min(start + chunk_size, len(rows))))
+             for cluster, rows in cluster_rows.items() for start in range(0, len(rows), chunk_size)]
+
+    if n_jobs == 1 or len(tasks) == 1:
+        _init_worker(clusters, options)
+        solved = [_solve_chunk(cluster, dmus) for cluster, dmus in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(clusters, options)) as pool:
+            solved = list(pool.map(_solve_chunk, *zip(*tasks)))
+
+    results = {}
+    for cluster, rows in cluster_rows.items():
+        chunks = [result for c, _, result in solved if c == cluster]
+        results[cluster] = (rows, DEAResult(
+            np.concatenate([r.theta for r in chunks]),
+            np.concatenate([r.slack_in for r in chunks]),
+            np.concatenate([r.slack_out for r in chunks]),
+            [rows[p] for r in chunks for p in r.peers],
+            [w for r in chunks for w in r.weights],
+        ))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-cluster output-oriented DEA efficiency of every student.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--clusters', type=int, default=3)
+    parser.add_argument('--returns', choices=['crs', 'vrs'], default='crs')
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    from clustering import fit_kmedoids
+    from feature_store import load_quantified
+    from gower_distance import prepare_gower_features
+
+    # Clustering and DEA read the same float32 matrix
+    table = load_quantified(args.data_dir)
+    labels = fit_kmedoids(prepare_gower_features(table.frame()), args.clusters).labels
+
+    start = time.perf_counter()
+    results = solve_clusters(table.inputs, table.marks, labels, returns=args.returns, n_jobs=args.jobs)
+    seconds = time.perf_counter() - start
+
+    roll_numbers = table.roll_numbers
+    for cluster, (rows, result) in sorted(results.items()):
+        efficient = is_efficient(result)
+        print(f"Cluster {cluster}: {len(rows)} students, {efficient.sum()} efficient")
+        for row, theta, eff in zip(rows, result.theta, efficient):
+            print(f"  {roll_numbers[row]}: efficiency {1 / theta:.3f}{' (efficient)' if eff else ''}")
+    print(f"Solved {len(roll_numbers)} LPs in {seconds:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
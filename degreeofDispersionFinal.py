@@ -6,33 +6,43 @@ from collections import defaultdict
 input_file = 'quantified_results.csv'
 output_file = 'dispersion_results.csv'
 
-# Read the input CSV
-responses = defaultdict(list)
-question_titles = {}
-with open(input_file, 'r', encoding='utf-8-sig') as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        question = row['Question Number']
-        percentage = float(row['Assigned y_k (%)'])
-        title = row['Question Title']
-        responses[question].append(percentage)
-        
+
+# Rows as written to quantified_results.csv
+def read_quantified(input_file):
+    with open(input_file, 'r', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield (row['Question Number'], row['Question Title'], row['Option'], row['Assigned y_k (%)'])
+
+
+# Degree of dispersion (standard deviation of the y_k values) per question, from
+# (question number, title, option, y_k) rows, e.g. straight from quantiicationfinal.py
+def dispersion_rows(quantified_rows):
+    responses = defaultdict(list)
+    question_titles = {}
+    for question, title, _, percentage in quantified_rows:
+        responses[question].append(float(percentage))
+
         # Store the question title for later use
         if question not in question_titles:
             question_titles[question] = title
 
-# Prepare data for output
-output_rows = [("Question Number", "Question Title", "Degree of Dispersion (Std Dev)")]
+    # Calculate dispersion (standard deviation) for each question
+    output_rows = []
+    for question, percentages in responses.items():
+        question_title = question_titles[question]  # Retrieve the correct title for the question
+        std_dev = np.std(percentages)  # Calculate standard deviation
+        output_rows.append((question, question_title, f"{std_dev:.2f}"))
+    return output_rows
+
 
-# Calculate dispersion (standard deviation) for each question
-for question, percentages in responses.items():
-    question_title = question_titles[question]  # Retrieve the correct title for the question
-    std_dev = np.std(percentages)  # Calculate standard deviation
-    output_rows.append((question, question_title, f"{std_dev:.2f}"))
+def write_dispersion(output_rows, output_file):
+    with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(("Question Number", "Question Title", "Degree of Dispersion (Std Dev)"))
+        writer.writerows(output_rows)
 
-# Write the results to the output CSV
-with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
-    writer = csv.writer(f_out)
-    writer.writerows(output_rows)
 
-print(f"✅ Degree of dispersion results written to '{output_file}' successfully!")
+if __name__ == '__main__':
+    write_dispersion(dispersion_rows(read_quantified(input_file)), output_file)
+    print(f"✅ Degree of dispersion results written to '{output_file}' successfully!")
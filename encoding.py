@@ -0,0 +1,75 @@
+import numpy as np
+
+# Code given to answers that are not in a question's vocabulary
+UNKNOWN = -1
+
+
+# Answer text -> vocabulary key: the whole stripped answer ('text') or just its
+# option letter ('letter', e.g. 'b) Rarely' -> 'b')
+def normalize_answers(values, normalize='text'):
+    keys = np.array(['' if v is None or v != v else str(v).strip() for v in values], dtype=object)
+    if normalize == 'letter':
+        keys = np.array([k[:1].lower() for k in keys], dtype=object)
+    return keys
+
+
+# One frozen vocabulary per question. Whole columns (or batches of incoming
+# users) are encoded with a sorted-array lookup; answers outside the
+# vocabulary get the explicit UNKNOWN code instead of mutating the encoder.
+class QuestionEncoder:
+    def __init__(self, vocabularies=None, normalize='text'):
+        self.normalize = normalize
+        self.vocabularies = {}
+        for col, classes in (vocabularies or {}).items():
+            self.vocabularies[col] = np.array(sorted(classes), dtype=str)
+
+    @property
+    def columns(self):
+        return list(self.vocabularies)
+
+    def fit(self, frame, columns):
+        for col in columns:
+            if col in frame.columns:
+                keys = normalize_answers(frame[col].tolist(), self.normalize)
+                self.vocabularies[col] = np.unique(keys[keys != ''].astype(str))
+        return self
+
+    def code_dtype(self):
+        largest = max((len(v) for v in self.vocabularies.values()), default=0)
+        return np.int8 if largest < 127 else np.int16
+
+    def encode_column(self, col, values):
+        vocabulary = self.vocabularies[col]
+        keys = normalize_answers(values, self.normalize).astype(str)
+        if len(vocabulary) == 0:
+            return np.full(len(keys), UNKNOWN, dtype=self.code_dtype())
+        pos = np.minimum(np.searchsorted(vocabulary, keys), len(vocabulary) - 1)
+        return np.where(vocabulary[pos] == keys, pos, UNKNOWN).astype(self.code_dtype())
+
+    # Encode every vocabulary column of a DataFrame in place of its answers
+    def transform(self, frame):
+        frame = frame.copy()
+        for col in self.vocabularies:
+            if col in frame.columns:
+                frame[col] = self.encode_column(col, frame[col].tolist())
+        return frame
+
+    def fit_transform(self, frame, columns):
+        return self.fit(frame, columns).transform(frame)
+
+    # Batch of incoming users (dicts of answers) -> {column: codes}; questions
+    # a user did not answer are UNKNOWN as well
+    def encode_records(self, records):
+        return {col: self.encode_column(col, [r.get(col) for r in records]) for col in self.vocabularies}
+
+    def decode_column(self, col, codes):
+        vocabulary = np.append(self.vocabularies[col].astype(object), None)
+        return vocabulary[np.asarray(codes)]
+
+    def to_dict(self):
+        return {'normalize': self.normalize,
+                'vocabularies': {col: v.tolist() for col, v in self.vocabularies.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['vocabularies'], data['normalize'])
@@ -0,0 +1,240 @@
+import time
+import numpy as np
+import pandas as pd
+
+from cache import ResultCache, profile_key
+from clustering import fit_kmedoids
+from gower_distance import gower_to_medoids, prepare_gower_features
+from incidence import CourseIncidence, align_incidence, extend_incidence, incidence_from_lists
+from instrument import count, stage, timed
+from popularity import CoursePopularityIndex, lookup_rows
+from similarity import CourseSimilarityIndex, blended_top_n
+
+
+# Fit-once, serve-many recommender: medoids are fitted once over the whole
+# population, and new students are assigned by their Gower distance to the k
+# medoids only. refit() is triggered explicitly, on a schedule or on drift.
+class RecommenderEngine:
+    def __init__(self, n_clusters=3, random_state=42, drift_threshold=0.25,
+                 min_drift_samples=50, refit_interval=None, cat_columns=(),
+                 block_rows=2048, n_jobs=1, backend='pam', backend_options=None, course_metric=None,
+                 item_weight=0.0, similarity_top_k=20, cache_size=4096, cache_ttl=None):
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        # Columns compared as categories even when label-encoded to numbers
+        self.cat_columns = list(cat_columns)
+        # Gower matrix tiling / process pool (see gower_matrix_blocked)
+        self.block_rows = block_rows
+        self.n_jobs = n_jobs
+        # k-medoids backend from clustering.BACKENDS; 'clara' and 'fasterpam'
+        # never build the full n x n matrix
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        # Course incidence as one sparse Gower block when clustering: 'hamming'
+        # (same distances as one-hot course columns) or 'jaccard'; None keeps
+        # courses out of the distance
+        self.course_metric = course_metric
+        # Weight of the item-item co-enrollment scores blended into cluster
+        # popularity (0 recommends by cluster popularity alone); each course
+        # keeps its similarity_top_k nearest courses
+        self.item_weight = item_weight
+        self.similarity_top_k = similarity_top_k
+        # Refit once the mean assignment distance of new students exceeds the
+        # fitted mean distance-to-medoid by this fraction
+        self.drift_threshold = drift_threshold
+        self.min_drift_samples = min_drift_samples
+        # Refit after this many seconds, regardless of drift (None disables)
+        self.refit_interval = refit_interval
+        # New-user results by encoded profile; keys carry the fit count, and
+        # every fit clears it (0 disables)
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.model_version_ = 0
+
+    # courses: a CourseIncidence (aligned to roll_numbers if it is not already)
+    # or one list of course names per row
+    @timed('fit')
+    def fit(self, features, roll_numbers, courses):
+        # New positional index without copying the data (a QuantifiedTable
+        # frame stays a view of its matrix)
+        features = features.set_axis(pd.RangeIndex(len(features)), axis=0, copy=False)
+        self.columns_ = list(features.columns)
+        self.cat_features_ = np.array([c in self.cat_columns or not pd.api.types.is_numeric_dtype(features[c])
+                                       for c in self.columns_])
+        self.roll_numbers_ = np.asarray(roll_numbers)
+        self.roll_keys_ = pd.to_numeric(pd.Series(self.roll_numbers_), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+        self.roll_order_ = np.argsort(self.roll_keys_, kind='stable')
+        if isinstance(courses, CourseIncidence):
+            if not np.array_equal(courses.roll_numbers, self.roll_keys_):
+                courses = align_incidence(courses, self.roll_keys_)
+        else:
+            courses = incidence_from_lists(courses, self.roll_keys_)
+        self.incidence_ = courses
+        self.features_ = features
+
+        with stage('prepare_features') as timer:
+            prep = prepare_gower_features(features, self.cat_features_,
+                                          sets=courses.matrix if self.course_metric else None,
+                                          set_metric=self.course_metric or 'hamming')
+            timer.size('num', prep['num'])
+            timer.size('cat', prep['cat'])
+        options = dict(self.backend_options)
+        if self.backend == 'pam':
+            options.setdefault('block_rows', self.block_rows)
+            options.setdefault('n_jobs', self.n_jobs)
+        result = fit_kmedoids(prep, self.n_clusters, self.backend, self.random_state, **options)
+        self.labels_ = np.asarray(result.labels)
+        self.medoid_indices_ = np.asarray(result.medoid_indices)
+
+        # Feature ranges and medoid rows are all that assignment needs (only
+        # the medoid rows are converted, never the whole feature table)
+        X_num, X_cat = self._split(features.iloc[self.medoid_indices_])
+        self.num_ranges_ = prep['num_ranges']
+        self.medoid_num_ = X_num
+        self.medoid_cat_ = X_cat
+
+        self._index_courses(courses)
+
+        # Drift baseline: mean distance of the fitted population to its medoid
+        self.baseline_distance_ = float(result.medoid_distances[np.arange(len(self.labels_)), self.labels_].mean())
+        self.fitted_at_ = time.time()
+        self.model_version_ += 1
+        self.cache.clear()
+        self.n_assigned_ = 0
+        self.assigned_distance_sum_ = 0.0
+        self.pending_features_ = []
+        return self
+
+    # Per-cluster course popularity (and the item-item index) of the fitted
+    # labels over the given enrollments
+    def _index_courses(self, courses):
+        with stage('course_index'):
+            self.popularity_ = CoursePopularityIndex.from_incidence(self.labels_, courses.matrix, courses.courses,
+                                                                   self.n_clusters)
+            self.similarity_ = None
+            self.cluster_counts_ = None
+            if self.item_weight > 0:
+                self.similarity_ = CourseSimilarityIndex.build(courses.matrix, courses.courses, self.similarity_top_k)
+                self.cluster_counts_ = self.popularity_.cluster_counts()
+
+    # Keep the medoids and labels but count and exclude courses from other
+    # enrollments, e.g. all of them after fitting on a holdout split
+    def reindex_courses(self, courses):
+        if not np.array_equal(courses.roll_numbers, self.roll_keys_):
+            courses = align_incidence(courses, self.roll_keys_)
+        self.incidence_ = courses
+        self._index_courses(courses)
+        self.model_version_ += 1
+        self.cache.clear()
+        return self
+
+    def _split(self, features):
+        features = features.reindex(columns=self.columns_)
+        num_cols = [c for c, is_cat in zip(self.columns_, self.cat_features_) if not is_cat]
+        cat_cols = [c for c, is_cat in zip(self.columns_, self.cat_features_) if is_cat]
+        X_num = features[num_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        X_cat = features[cat_cols].to_numpy(dtype=object)
+        return X_num, X_cat
+
+    # Assign new rows to their nearest medoid, O(k * features) per row
+    def assign(self, new_features, observe=True):
+        return self._assign_split(new_features, *self._split(new_features), observe)
+
+    def _assign_split(self, new_features, X_num, X_cat, observe=True):
+        distances = gower_to_medoids(X_num, X_cat, self.medoid_num_, self.medoid_cat_, self.num_ranges_)
+        nearest = distances.argmin(axis=1)
+        labels = self.labels_[self.medoid_indices_[nearest]]
+        if observe:
+            self._observe(new_features, distances.min(axis=1))
+        return labels, distances
+
+    # Drift bookkeeping for assigned rows, given their distance to the nearest medoid
+    def _observe(self, new_features, nearest_distances):
+        self.n_assigned_ += len(nearest_distances)
+        self.assigned_distance_sum_ += float(np.sum(nearest_distances))
+        self.pending_features_.append(new_features.reindex(columns=self.columns_))
+
+    # Blended top-N course ids for students given their clusters and taken masks
+    def _blended_ids(self, clusters, taken, top_n):
+        item_scores = (self.similarity_.score(taken[0])[None, :] if len(taken) == 1
+                       else self.similarity_.score_batch(taken))
+        return blended_top_n(self.cluster_counts_[clusters], item_scores, taken, top_n, self.item_weight)
+
+    def recommend_for_cluster(self, cluster, taken=(), top_n=3):
+        taken_mask = self.popularity_.mask_from_courses(taken)
+        if self.similarity_ is not None:
+            ids = self._blended_ids(np.array([cluster]), taken_mask[None, :], top_n)[0]
+            return [self.popularity_.courses[i] for i in ids if i >= 0]
+        return self.popularity_.recommend(cluster, taken_mask, top_n)
+
+    # Repeat profiles are answered from the cache without touching the
+    # distance code; they still count towards drift
+    @timed('recommend_new_user')
+    def recommend_for_new_user(self, new_features, taken=(), top_n=3):
+        X_num, X_cat = self._split(new_features)
+        key = profile_key(self.model_version_, X_num[0], X_cat[0], top_n, taken)
+        cached = self.cache.get(key)
+        count('new_user_cache_misses' if cached is None else 'new_user_cache_hits')
+        if cached is None:
+            labels, distances = self._assign_split(new_features, X_num, X_cat)
+            cached = (int(labels[0]), float(distances.min(axis=1)[0]),
+                      tuple(self.recommend_for_cluster(labels[0], taken, top_n)))
+            self.cache.put(key, cached)
+        else:
+            self._observe(new_features, [cached[1]])
+        return list(cached[2])
+
+    @timed('recommend_student')
+    def recommend_for_student(self, student_id, top_n=3):
+        matches = np.flatnonzero(self.roll_numbers_ == student_id)
+        if len(matches) == 0:
+            return ["Student ID not found."]
+        cluster = self.labels_[matches[0]]
+        taken_mask = np.logical_or.reduce([self.popularity_.taken_mask(i) for i in matches])
+        if self.similarity_ is not None:
+            ids = self._blended_ids(np.array([cluster]), taken_mask[None, :], top_n)[0]
+            return [self.popularity_.courses[i] for i in ids if i >= 0]
+        return self.popularity_.recommend(cluster, taken_mask, top_n)
+
+    # Recommendations for a whole cohort in one vectorized call: a dense
+    # (students x top_n) array of course names (None where fewer are available),
+    # or a DataFrame indexed by roll number with as_frame=True
+    @timed('recommend_batch')
+    def recommend_batch(self, student_ids, top_n=3, as_frame=False):
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        count('recommend_batch_students', len(student_ids))
+        rows = lookup_rows(self.roll_keys_, student_ids, self.roll_order_)
+        clusters = np.where(rows >= 0, self.labels_[rows], 0)
+        if self.similarity_ is not None:
+            ids = np.full((len(rows), top_n), -1, dtype=np.int32)
+            for start in range(0, len(rows), 8192):
+                chunk = slice(start, start + 8192)
+                ids[chunk] = self._blended_ids(clusters[chunk], self.popularity_.taken_masks(rows[chunk]), top_n)
+        else:
+            ids = self.popularity_.top_n_ids_batch(rows, clusters, top_n)
+        ids[rows < 0] = -1
+        courses = self.popularity_.course_names(ids)
+        if as_frame:
+            return pd.DataFrame(courses, index=pd.Index(student_ids, name='Roll No.(8 Digits)'),
+                                columns=[f'rec_{i + 1}' for i in range(top_n)])
+        return courses
+
+    def drift(self):
+        if self.n_assigned_ == 0 or self.baseline_distance_ == 0:
+            return 0.0
+        return self.assigned_distance_sum_ / self.n_assigned_ / self.baseline_distance_ - 1.0
+
+    def needs_refit(self):
+        if self.refit_interval is not None and time.time() - self.fitted_at_ >= self.refit_interval:
+            return True
+        return self.n_assigned_ >= self.min_drift_samples and self.drift() > self.drift_threshold
+
+    # Refit the medoids. Without arguments, the students assigned since the last
+    # fit are folded into the population (they have no courses yet).
+    def refit(self, features=None, roll_numbers=None, courses=None):
+        if features is None:
+            pending = [f for f in self.pending_features_ if len(f)]
+            features = pd.concat([self.features_] + pending, ignore_index=True)
+            n_new = len(features) - len(self.features_)
+            roll_numbers = np.concatenate([self.roll_numbers_, np.full(n_new, None, dtype=object)])
+            courses = extend_incidence(self.incidence_, np.full(n_new, -1))
+        return self.fit(features, roll_numbers, courses)
@@ -0,0 +1,153 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from degreeofDispersionFinal import read_quantified
+
+ROLL = 'Roll No.(8 Digits)'
+# Option letters a..z; index 26 is the NaN slot for missing or unknown answers
+N_OPTIONS = 26
+
+
+# First letter of every answer as an option index (a = 0 ... z = 25), 26 for
+# missing answers and anything that does not start with a letter
+def option_codes(values):
+    values = np.asarray(values, dtype=object)
+    missing = pd.isna(values)
+    letters = np.char.lower(np.char.lstrip(np.where(missing, '', values).astype(str)).astype('U1'))
+    codes = letters.view(np.uint32).astype(np.int64) - ord('a')
+    return np.where((codes >= 0) & (codes < N_OPTIONS), codes, N_OPTIONS)
+
+
+# Cumulative-percentage y_k values compiled into one float32 lookup array per
+# question (quantified_results.csv rows, or QuestionnaireStats.quantified_rows()
+# in-process). Answers become features with one gather per column; options
+# that were never quantified map to NaN.
+class QuantifiedFeatureStore:
+    def __init__(self, questions, tables):
+        self.questions = list(questions)
+        self.tables = tables
+
+    @classmethod
+    def from_rows(cls, rows):
+        values = {}
+        for _, title, option, y_k in rows:
+            values.setdefault(title, {})[option.strip().lower()[:1]] = float(y_k)
+        tables = []
+        for options in values.values():
+            table = np.full(N_OPTIONS + 1, np.nan, dtype=np.float32)
+            for option, y_k in options.items():
+                code = ord(option) - ord('a') if option else -1
+                if 0 <= code < N_OPTIONS:
+                    table[code] = y_k
+            tables.append(table)
+        return cls(values, tables)
+
+    @classmethod
+    def from_csv(cls, path='quantified_results.csv'):
+        return cls.from_rows(read_quantified(path))
+
+    @classmethod
+    def from_stats(cls, stats):
+        return cls.from_rows(stats.quantified_rows())
+
+    # y_k of one column of answers: the few distinct answers are resolved
+    # once, then every row is a single gather (missing answers hit the NaN slot)
+    def _column(self, j, values, out):
+        ids, uniques = pd.factorize(values)
+        lookup = np.append(self.tables[j][option_codes(uniques)], np.float32(np.nan))
+        out[:] = lookup[ids]
+
+    # (rows x questions) float32 y_k matrix of a response table (raw answer
+    # text); out may be a preallocated float32 matrix (or view) to fill in place
+    def transform(self, frame, out=None):
+        if out is None:
+            out = np.empty((len(frame), len(self.questions)), dtype=np.float32)
+        for j, question in enumerate(self.questions):
+            if question in frame.columns:
+                self._column(j, frame[question].to_numpy(), out[:, j])
+            else:
+                out[:, j] = np.nan
+        return out
+
+    # A batch of incoming users (one dict of answers per user)
+    def transform_records(self, records):
+        out = np.empty((len(records), len(self.questions)), dtype=np.float32)
+        for j, question in enumerate(self.questions):
+            self._column(j, np.array([record.get(question) for record in records], dtype=object), out[:, j])
+        return out
+
+
+# One float32 matrix per student table: the y_k of every answer, then marks as
+# the last column. Clustering reads it through frame() and the efficiency
+# stage through the inputs/marks views; neither copies it.
+class QuantifiedTable:
+    def __init__(self, matrix, roll_numbers, questions):
+        self.matrix = matrix
+        self.roll_numbers = roll_numbers
+        self.questions = list(questions)
+
+    @property
+    def inputs(self):
+        return self.matrix[:, :-1]
+
+    @property
+    def marks(self):
+        return self.matrix[:, -1]
+
+    def frame(self):
+        return pd.DataFrame(self.matrix, index=pd.Index(self.roll_numbers, name=ROLL),
+                            columns=self.questions + ['marks'], copy=False)
+
+
+# Students with a mark and every question quantified, one row each
+def load_quantified(data_dir='.', store=None):
+    if store is None:
+        store = QuantifiedFeatureStore.from_csv(os.path.join(data_dir, 'quantified_results.csv'))
+    response_df = pd.read_csv(os.path.join(data_dir, 'response.csv'))
+    marks_df = pd.read_csv(os.path.join(data_dir, 'marks.csv')).rename(columns={'roll no': ROLL})
+    response_df = response_df.drop_duplicates(ROLL).merge(marks_df, how='inner', on=ROLL)
+
+    matrix = np.empty((len(response_df), len(store.questions) + 1), dtype=np.float32)
+    store.transform(response_df, out=matrix[:, :-1])
+    matrix[:, -1] = response_df['marks'].to_numpy(dtype=np.float32)
+    complete = ~np.isnan(matrix).any(axis=1)
+    roll_numbers = response_df[ROLL].to_numpy()
+    if not complete.all():
+        matrix, roll_numbers = matrix[complete], roll_numbers[complete]
+    return QuantifiedTable(matrix, roll_numbers, store.questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the quantified feature store against the per-answer dict lookup.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--repeat', type=int, default=2000, help="Times the response table is repeated")
+    args = parser.parse_args()
+
+    store = QuantifiedFeatureStore.from_csv(os.path.join(args.data_dir, 'quantified_results.csv'))
+    response_df = pd.read_csv(os.path.join(args.data_dir, 'response.csv'))
+    frame = pd.concat([response_df] * args.repeat, ignore_index=True)
+
+    y_k = {(title, option): float(value) for _, title, option, value in
+           read_quantified(os.path.join(args.data_dir, 'quantified_results.csv'))}
+    start = time.perf_counter()
+    lookup = np.column_stack([
+        [y_k.get((title, letter), np.nan) for letter in frame[title].astype(str).str.strip().str[0].str.upper()]
+        for title in store.questions])
+    lookup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = store.transform(frame)
+    store_seconds = time.perf_counter() - start
+
+    assert np.allclose(lookup, matrix, equal_nan=True)
+    print(f"{len(frame)} rows x {len(store.questions)} questions")
+    print(f"dict lookup per answer: {lookup_seconds * 1000:9.1f} ms")
+    print(f"feature store gathers:  {store_seconds * 1000:9.1f} ms ({matrix.nbytes / 2**20:.1f} MiB float32)")
+
+
+if __name__ == '__main__':
+    main()
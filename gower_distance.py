@@ -0,0 +1,289 @@
+import numpy as np
+
+from instrument import stage
+
+
+# NaN/None mask that also works on object arrays (no pandas needed)
+def is_missing(values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        return np.frompyfunc(lambda v: v is None or v != v, 1, 1)(values).astype(bool)
+    if np.issubdtype(values.dtype, np.floating):
+        return np.isnan(values)
+    return np.zeros(values.shape, dtype=bool)
+
+
+# Gower distance from each row of X to each medoid, using the feature ranges of the
+# fitted population (gower_matrix would recompute them from X + medoids only).
+# Missing values (NaN) are left out of the average for that pair, as in the
+# original Gower definition.
+def gower_to_medoids(X_num, X_cat, medoid_num, medoid_cat, num_ranges, weight_num=None, weight_cat=None):
+    n_num = X_num.shape[1]
+    n_cat = X_cat.shape[1]
+    if weight_num is None:
+        weight_num = np.ones(n_num, dtype=np.float32)
+    if weight_cat is None:
+        weight_cat = np.ones(n_cat, dtype=np.float32)
+
+    # Numeric part: |x - m| / range, shape (rows, medoids, features)
+    delta = np.abs(X_num[:, None, :] - medoid_num[None, :, :])
+    safe_ranges = np.where(num_ranges != 0, num_ranges, 1.0)
+    s_num = np.where(num_ranges != 0, delta / safe_ranges, 0.0)
+    present_num = ~np.isnan(s_num)
+    if n_num:
+        num_sum = (np.where(present_num, s_num, 0.0) * weight_num).sum(axis=2)
+        num_weight = (present_num * weight_num).sum(axis=2)
+    else:
+        num_sum = np.zeros((X_num.shape[0], medoid_num.shape[0]))
+        num_weight = np.zeros_like(num_sum)
+
+    # Categorical part: 0 on match, 1 on mismatch
+    if n_cat:
+        present_cat = ~(is_missing(X_cat)[:, None, :] | is_missing(medoid_cat)[None, :, :])
+        mismatch = X_cat[:, None, :] != medoid_cat[None, :, :]
+        cat_sum = (np.where(present_cat, mismatch, 0.0) * weight_cat).sum(axis=2)
+        cat_weight = (present_cat * weight_cat).sum(axis=2)
+    else:
+        cat_sum = np.zeros_like(num_sum)
+        cat_weight = np.zeros_like(num_sum)
+
+    total_weight = num_weight + cat_weight
+    return np.divide(num_sum + cat_sum, total_weight,
+                     out=np.ones_like(num_sum, dtype=np.float64), where=total_weight > 0)
+
+
+# Column preparation shared by every block of gower_matrix_blocked: numeric
+# columns scaled to [0, 1] by their range, categorical columns turned into
+# integer codes (-1 for missing) so blocks compare codes instead of objects.
+# cat_features may be a boolean mask or a list of column names; by default
+# non-numeric columns are categorical, as in gower.gower_matrix.
+# sets is an optional sparse (rows x items) 0/1 matrix, e.g. the course
+# incidence, compared without densifying it: 'hamming' counts the differing
+# items, each weighted set_weight like one one-hot column would be; 'jaccard'
+# adds a single feature of weight set_weight, 1 - |A & B| / |A | B|.
+def prepare_gower_features(data, cat_features=None, weight=None, sets=None, set_metric='hamming', set_weight=1.0):
+    import pandas as pd
+
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(np.asarray(data))
+    columns = list(frame.columns)
+    if cat_features is None:
+        cat_mask = np.array([not pd.api.types.is_numeric_dtype(frame[c]) for c in columns])
+    elif len(cat_features) == len(columns) and all(isinstance(c, (bool, np.bool_)) for c in cat_features):
+        cat_mask = np.asarray(cat_features, dtype=bool)
+    else:
+        cat_names = set(cat_features)
+        cat_mask = np.array([c in cat_names for c in columns])
+    weight = np.ones(len(columns), dtype=np.float32) if weight is None else np.asarray(weight, dtype=np.float32)
+
+    num_cols = [c for c, is_cat in zip(columns, cat_mask) if not is_cat]
+    cat_cols = [c for c, is_cat in zip(columns, cat_mask) if is_cat]
+
+    # An all-float32 numeric table (e.g. feature_store.QuantifiedTable.frame())
+    # is used in place: no float64 copy, no rescaled copy; the 1 / range of
+    # every column is applied where distances are computed (num_scale)
+    if len(columns) and not cat_mask.any() and all(frame[c].dtype == np.float32 for c in columns):
+        return _prepare_matrix(frame.to_numpy(), weight, sets, set_metric, set_weight)
+
+    num = frame[num_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    # Column extremes ignoring NaN; all-missing columns get a zero range
+    if len(num):
+        col_min = np.nan_to_num(np.where(np.isnan(num), np.inf, num).min(axis=0), posinf=0.0)
+        col_max = np.nan_to_num(np.where(np.isnan(num), -np.inf, num).max(axis=0), neginf=0.0)
+    else:
+        col_min = col_max = np.zeros(len(num_cols))
+    ranges = col_max - col_min
+    scaled = np.divide(num - col_min, ranges, out=np.zeros_like(num), where=ranges != 0)
+    scaled[np.isnan(num)] = np.nan
+
+    cat = np.empty((len(frame), len(cat_cols)), dtype=np.int32)
+    for j, col in enumerate(cat_cols):
+        cat[:, j] = pd.factorize(frame[col], use_na_sentinel=True)[0]
+
+    prep = _set_block(sets, set_metric, set_weight)
+    prep.update({
+        'num': scaled.astype(np.float32),
+        'num_min': np.zeros(len(num_cols)),
+        'num_scale': np.ones(len(num_cols), dtype=np.float32),
+        'cat': cat,
+        'weight_num': weight[~cat_mask],
+        'weight_cat': weight[cat_mask],
+        'weight_sum': float(weight.sum()) + prep['set_block_weight'],
+        'has_missing': bool(np.isnan(num).any() or (cat < 0).any()),
+        'cat_mask': cat_mask,
+        'num_ranges': ranges,
+    })
+    return prep
+
+
+def _set_block(sets, set_metric, set_weight):
+    set_block_weight = 0.0
+    if sets is not None:
+        if set_metric not in ('hamming', 'jaccard'):
+            raise ValueError(f"Unknown set metric {set_metric!r}")
+        sets = sets.tocsr().astype(np.float32)
+        set_block_weight = set_weight * sets.shape[1] if set_metric == 'hamming' else set_weight
+    return {
+        'sets': sets,
+        'set_sizes': None if sets is None else np.asarray(sets.sum(axis=1), dtype=np.float32).ravel(),
+        'set_metric': set_metric,
+        'set_weight': np.float32(set_weight),
+        'set_block_weight': set_block_weight,
+    }
+
+
+# Prepared features over a float32 (rows x features) numeric matrix without
+# copying it: num is the matrix itself, scaled per column in gower_between
+def _prepare_matrix(matrix, weight, sets, set_metric, set_weight):
+    n_features = matrix.shape[1]
+    weight = np.ones(n_features, dtype=np.float32) if weight is None else np.asarray(weight, dtype=np.float32)
+    if len(matrix):
+        col_min = np.nan_to_num(np.fmin.reduce(matrix, axis=0).astype(np.float64), nan=0.0)
+        col_max = np.nan_to_num(np.fmax.reduce(matrix, axis=0).astype(np.float64), nan=0.0)
+    else:
+        col_min = col_max = np.zeros(n_features)
+    ranges = col_max - col_min
+    prep = _set_block(sets, set_metric, set_weight)
+    prep.update({
+        'num': matrix,
+        'num_min': col_min,
+        'num_scale': np.divide(1.0, ranges, out=np.zeros_like(ranges), where=ranges != 0).astype(np.float32),
+        'cat': np.empty((len(matrix), 0), dtype=np.int32),
+        'weight_num': weight,
+        'weight_cat': np.empty(0, dtype=np.float32),
+        'weight_sum': float(weight.sum()) + prep['set_block_weight'],
+        'has_missing': bool(np.isnan(np.add.reduce(matrix, axis=None))),
+        'cat_mask': np.zeros(n_features, dtype=bool),
+        'num_ranges': ranges,
+    })
+    return prep
+
+
+# Gower distances between two row selections of prepared features (slices or
+# index arrays) in float32, accumulated feature by feature so the temporaries
+# stay at (rows x cols) size
+def gower_between(prep, rows, cols):
+    num_a, num_b = prep['num'][rows], prep['num'][cols]
+    cat_a, cat_b = prep['cat'][rows], prep['cat'][cols]
+    total = np.zeros((len(num_a), len(num_b)), dtype=np.float32)
+    present_weight = np.zeros_like(total) if prep['has_missing'] else None
+
+    for f, w in enumerate(prep['weight_num'] * prep['num_scale']):
+        delta = np.abs(num_a[:, f, None] - num_b[None, :, f])
+        if present_weight is None:
+            total += w * delta
+        else:
+            present = ~np.isnan(delta)
+            total += w * np.where(present, delta, 0)
+            present_weight += w * present
+
+    for f, w in enumerate(prep['weight_cat']):
+        a = cat_a[:, f, None]
+        b = cat_b[None, :, f]
+        if present_weight is None:
+            total += w * (a != b)
+        else:
+            present = (a >= 0) & (b >= 0)
+            total += w * ((a != b) & present)
+            present_weight += w * present
+
+    sets = prep.get('sets')
+    if sets is not None:
+        # Shared items from one sparse product; set sizes give the rest
+        shared = (sets[rows] @ sets[cols].T).toarray()
+        size_a = prep['set_sizes'][rows][:, None]
+        size_b = prep['set_sizes'][cols][None, :]
+        if prep['set_metric'] == 'hamming':
+            total += prep['set_weight'] * (size_a + size_b - 2 * shared)
+        else:
+            union = size_a + size_b - shared
+            total += prep['set_weight'] * np.divide(union - shared, union, out=np.zeros_like(union), where=union > 0)
+        if present_weight is not None:
+            present_weight += np.float32(prep['set_block_weight'])
+
+    if present_weight is None:
+        return total / np.float32(prep['weight_sum']) if prep['weight_sum'] else total
+    # Pairs with no feature observed on both sides get the maximum distance
+    return np.divide(total, present_weight, out=np.ones_like(total), where=present_weight > 0)
+
+
+def gower_tile(prep, r0, r1, c0, c1):
+    return gower_between(prep, slice(r0, r1), slice(c0, c1))
+
+
+_worker_prep = None
+_worker_out = None
+
+
+def _init_worker(prep, out_path, n):
+    global _worker_prep, _worker_out
+    _worker_prep = prep
+    _worker_out = np.memmap(out_path, dtype=np.float32, mode='r+', shape=(n, n)) if out_path else None
+
+
+# Row block [r0, r1) against every column block from r0 on; the lower triangle
+# is filled by mirroring
+def _row_block(prep, out, n, r0, r1, block_rows):
+    tiles = []
+    for c0 in range(r0, n, block_rows):
+        c1 = min(c0 + block_rows, n)
+        tile = gower_tile(prep, r0, r1, c0, c1)
+        if c0 == r0:
+            np.fill_diagonal(tile, 0.0)
+        if out is not None:
+            out[r0:r1, c0:c1] = tile
+            out[c0:c1, r0:r1] = tile.T
+        else:
+            tiles.append((c0, c1, tile))
+    return r0, r1, tiles
+
+
+def _worker_row_block(r0, r1, block_rows):
+    n = len(_worker_prep['num'])
+    r0, r1, tiles = _row_block(_worker_prep, _worker_out, n, r0, r1, block_rows)
+    if _worker_out is not None:
+        _worker_out.flush()
+    return r0, r1, tiles
+
+
+# Full n x n Gower distance matrix computed in (block_rows x block_rows) tiles,
+# as float32. With out=<path> the matrix is a np.memmap spilled to that file, so
+# it never has to fit in RAM; with n_jobs > 1 row blocks run in a process pool
+# (workers write straight into the memmap when one is given). sets and
+# set_metric are passed on to prepare_gower_features.
+def gower_matrix_blocked(data, cat_features=None, weight=None, block_rows=2048, out=None, n_jobs=1,
+                         sets=None, set_metric='hamming'):
+    prep = data if isinstance(data, dict) else prepare_gower_features(data, cat_features, weight, sets, set_metric)
+    with stage('gower_matrix') as timer:
+        matrix = _fill_matrix(prep, block_rows, out, n_jobs)
+        timer.size('matrix', matrix)
+    return matrix
+
+
+def _fill_matrix(prep, block_rows, out, n_jobs):
+    n = len(prep['num'])
+    if out is not None:
+        matrix = np.memmap(out, dtype=np.float32, mode='w+', shape=(n, n))
+    else:
+        matrix = np.empty((n, n), dtype=np.float32)
+    blocks = [(r0, min(r0 + block_rows, n)) for r0 in range(0, n, block_rows)]
+
+    if n_jobs == 1 or len(blocks) == 1:
+        for r0, r1 in blocks:
+            _row_block(prep, matrix, n, r0, r1, block_rows)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        if out is not None:
+            matrix.flush()
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(prep, out, n)) as pool:
+            futures = [pool.submit(_worker_row_block, r0, r1, block_rows) for r0, r1 in blocks]
+            for future in futures:
+                r0, r1, tiles = future.result()
+                for c0, c1, tile in tiles:
+                    matrix[r0:r1, c0:c1] = tile
+                    matrix[c0:c1, r0:r1] = tile.T
+
+    if out is not None:
+        matrix.flush()
+    return matrix
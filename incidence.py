@@ -0,0 +1,87 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from popularity import lookup_rows, packed_bits
+
+# matrix: students x courses CSR matrix of ones (uint8), one row per roll number
+# roll_numbers: int64 roll number of every row
+# courses: course name of every column id, sorted
+CourseIncidence = namedtuple('CourseIncidence', ['matrix', 'roll_numbers', 'courses'])
+
+
+# (roll number, course) transactions -> incidence matrix with integer course
+# ids; repeated enrollments count once
+def incidence_from_pairs(roll_numbers, courses, course_names=None):
+    rows, roll_keys = pd.factorize(np.asarray(roll_numbers, dtype=np.int64), sort=True)
+    if course_names is None:
+        cols, course_names = pd.factorize(np.asarray(courses, dtype=object), sort=True)
+    else:
+        cols = pd.Index(course_names).get_indexer(courses)
+        rows, cols = rows[cols >= 0], cols[cols >= 0]
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, cols)),
+                               shape=(len(roll_keys), len(course_names)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return CourseIncidence(matrix, np.asarray(roll_keys, dtype=np.int64), [str(c) for c in course_names])
+
+
+# courses.csv straight into CSR, without the per-student string joins and
+# get_dummies of the one-hot path
+def load_course_incidence(path='courses.csv'):
+    transactions = pd.read_csv(path, dtype={'roll no': 'int64', 'course': str}).dropna(subset=['course'])
+    return incidence_from_pairs(transactions['roll no'].to_numpy(), transactions['course'].to_numpy())
+
+
+# Per-row course lists (row i belongs to roll_numbers[i]) -> incidence matrix.
+# Rows keep their order; roll numbers may be missing or repeated.
+def incidence_from_lists(course_lists, roll_numbers=None, courses=None):
+    course_lists = [[c for c in row if isinstance(c, str)] for row in course_lists]
+    if courses is None:
+        courses = sorted({c for row in course_lists for c in row})
+    course_ids = {c: i for i, c in enumerate(courses)}
+    rows = np.repeat(np.arange(len(course_lists)), [len(row) for row in course_lists])
+    cols = np.array([course_ids.get(c, -1) for row in course_lists for c in row], dtype=np.int64)
+    keep = cols >= 0
+    matrix = sparse.csr_matrix((np.ones(keep.sum(), dtype=np.uint8), (rows[keep], cols[keep])),
+                               shape=(len(course_lists), len(courses)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    if roll_numbers is None:
+        roll_numbers = np.full(len(course_lists), -1, dtype=np.int64)
+    return CourseIncidence(matrix, np.asarray(roll_numbers, dtype=np.int64), list(courses))
+
+
+# Rows of the incidence matrix in the order of roll_numbers; students without
+# enrollments get empty rows
+def align_incidence(incidence, roll_numbers):
+    roll_numbers = np.asarray(roll_numbers, dtype=np.int64)
+    rows = lookup_rows(incidence.roll_numbers, roll_numbers)
+    matrix = incidence.matrix[np.maximum(rows, 0)]
+    if (rows < 0).any():
+        matrix = (sparse.diags((rows >= 0).astype(np.uint8)) @ matrix).tocsr()
+        matrix.eliminate_zeros()
+    return CourseIncidence(matrix, roll_numbers, incidence.courses)
+
+
+# Append empty rows, e.g. for newly assigned students before a refit
+def extend_incidence(incidence, roll_numbers):
+    roll_numbers = np.asarray(roll_numbers, dtype=np.int64)
+    empty = sparse.csr_matrix((len(roll_numbers), len(incidence.courses)), dtype=np.uint8)
+    return CourseIncidence(sparse.vstack([incidence.matrix, empty], format='csr'),
+                           np.concatenate([incidence.roll_numbers, roll_numbers]), incidence.courses)
+
+
+# One packed course bitset per row, in np.packbits layout (as
+# CoursePopularityIndex.taken_bits_), built without densifying the matrix
+def taken_bits(incidence):
+    matrix = incidence.matrix
+    return packed_bits(matrix.indptr, matrix.indices.astype(np.int64), matrix.shape[1])
+
+
+def course_lists(incidence):
+    matrix = incidence.matrix
+    return [[incidence.courses[c] for c in matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]]
+            for i in range(matrix.shape[0])]
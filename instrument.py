@@ -0,0 +1,300 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+# Stage timers, counters, peak RSS and array sizes for the rebuild and serve
+# paths. Everything is off unless enabled, and disabled calls return at once:
+#   RECSYS_METRICS=<file>   collect, and write the report when the process exits
+#                           (Prometheus text for a .prom file, JSON otherwise;
+#                           '-' writes JSON to stderr, '1' only collects, e.g.
+#                           for the service's /metrics endpoint)
+#   RECSYS_PROFILE=<dir>    also run the outermost stages under cProfile and
+#                           write <dir>/<stage>.prof (read with pstats or snakeviz);
+#                           one stage is profiled at a time per process, stages
+#                           overlapping it in other threads are counted as
+#                           profile_skipped instead
+METRICS_ENV = 'RECSYS_METRICS'
+PROFILE_ENV = 'RECSYS_PROFILE'
+
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+# Linux keeps a resettable high-water mark next to the lifetime one: writing 5
+# to clear_refs restarts VmHWM at the current RSS, so the peak of a single
+# stage can be read back afterwards. Returns False where that is unavailable.
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# VmRSS / VmHWM of this process in bytes (None off Linux)
+def proc_rss_bytes(field='VmRSS'):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# Memory held by an array-like: numpy arrays, scipy sparse matrices, pandas
+# frames and series (shallow), lists of those
+def nbytes(value):
+    if hasattr(value, 'indptr'):
+        return int(value.data.nbytes + value.indices.nbytes + value.indptr.nbytes)
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(index=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# Per-stage totals and named counters of one process. Stages are keyed by
+# name, so repeated calls (one per request on the serve path) accumulate.
+class Metrics:
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.counters = {}
+        self.profilers = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._local = threading.local()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, seconds, rss_before, rss_after, sizes):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                             'peak_rss_bytes': 0, 'peak_rss_increase_bytes': 0, 'bytes': {}}
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['peak_rss_bytes'] = max(entry['peak_rss_bytes'], rss_after)
+            # ru_maxrss only grows: this is how far the stage raised the
+            # process peak, 0 for a stage that stayed under an earlier one
+            entry['peak_rss_increase_bytes'] = max(entry['peak_rss_increase_bytes'], rss_after - rss_before)
+            entry['bytes'].update(sizes)
+
+    # cProfile only for the outermost stage of a thread (profilers cannot
+    # nest), and for one thread at a time: a process has a single active
+    # profiler (enforced from Python 3.12). One profiler per stage name
+    # accumulates over its calls; release_profiler() ends the hold.
+    def profiler(self, name):
+        if self.profile_dir is None or getattr(self._local, 'depth', 0):
+            return None
+        if not self._profile_lock.acquire(blocking=False):
+            self.count('profile_skipped')
+            return None
+        with self._lock:
+            profiler = self.profilers.get(name)
+            if profiler is None:
+                profiler = self.profilers[name] = cProfile.Profile()
+        return profiler
+
+    def release_profiler(self):
+        self._profile_lock.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'started_at': self.started_at,
+                'uptime_seconds': time.time() - self.started_at,
+                'peak_rss_bytes': peak_rss_bytes(),
+                'stages': {name: dict(entry, bytes=dict(entry['bytes'])) for name, entry in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        data = self.snapshot()
+        lines = ['# TYPE recsys_peak_rss_bytes gauge', f"recsys_peak_rss_bytes {data['peak_rss_bytes']}"]
+        series = [('stage_calls_total', 'counter', 'calls'), ('stage_seconds_total', 'counter', 'seconds'),
+                  ('stage_seconds_max', 'gauge', 'max_seconds'), ('stage_peak_rss_bytes', 'gauge', 'peak_rss_bytes'),
+                  ('stage_peak_rss_increase_bytes', 'gauge', 'peak_rss_increase_bytes')]
+        for metric, kind, field in series:
+            lines.append(f'# TYPE recsys_{metric} {kind}')
+            lines.extend(f'recsys_{metric}{{stage="{name}"}} {entry[field]}' for name, entry in data['stages'].items())
+        lines.append('# TYPE recsys_stage_bytes gauge')
+        for name, entry in data['stages'].items():
+            lines.extend(f'recsys_stage_bytes{{stage="{name}",array="{array}"}} {size}'
+                         for array, size in entry['bytes'].items())
+        for name, value in data['counters'].items():
+            metric = 'recsys_' + ''.join(c if c.isalnum() else '_' for c in name) + '_total'
+            lines.extend([f'# TYPE {metric} counter', f'{metric} {value}'])
+        return '\n'.join(lines) + '\n'
+
+    # Report to a file (Prometheus text for *.prom, JSON otherwise) or stderr
+    # ('-'), plus one .prof file per profiled stage
+    def write(self, path):
+        if path == '-':
+            print(self.to_json(), file=sys.stderr)
+        elif path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for name, profiler in list(self.profilers.items()):
+                profiler.dump_stats(os.path.join(self.profile_dir, f'{name}.prof'))
+
+
+class _Stage:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.sizes = {}
+
+    # Record the size of an array produced (or consumed) by the stage
+    def size(self, name, value):
+        self.sizes[name] = nbytes(value)
+        return value
+
+    def __enter__(self):
+        local = self.metrics._local
+        self._profiler = self.metrics.profiler(self.name)
+        local.depth = getattr(local, 'depth', 0) + 1
+        self._rss = peak_rss_bytes()
+        if self._profiler is not None:
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.metrics.release_profiler()
+        self.metrics._local.depth -= 1
+        self.metrics.record(self.name, seconds, self._rss, peak_rss_bytes(), self.sizes)
+        return False
+
+
+# Stand-in returned while instrumentation is off
+class _NullStage:
+    def size(self, name, value):
+        return value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+_metrics = None
+
+
+def enabled():
+    return _metrics is not None
+
+
+def metrics():
+    return _metrics
+
+
+# Start collecting in this process (what the environment variables do at
+# import); report is written at exit when given. Returns the Metrics.
+def configure(report=None, profile_dir=None):
+    global _metrics
+    _metrics = Metrics(profile_dir)
+    if report and report != '1':
+        atexit.register(_metrics.write, report)
+    elif profile_dir:
+        atexit.register(_metrics.write, None)
+    return _metrics
+
+
+def disable():
+    global _metrics
+    _metrics = None
+
+
+# Time a block as one stage:
+#   with stage('gower_matrix') as s:
+#       matrix = s.size('matrix', gower_matrix_blocked(prep))
+def stage(name):
+    if _metrics is None:
+        return _NULL_STAGE
+    return _Stage(_metrics, name)
+
+
+def count(name, n=1):
+    if _metrics is not None:
+        _metrics.count(name, n)
+
+
+# Decorator form of stage() for whole functions
+def timed(name):
+    def decorate(fn):
+        def wrapper(*args, **kwargs):
+            if _metrics is None:
+                return fn(*args, **kwargs)
+            with _Stage(_metrics, name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate
+
+
+if os.environ.get(METRICS_ENV) or os.environ.get(PROFILE_ENV):
+    configure(os.environ.get(METRICS_ENV), os.environ.get(PROFILE_ENV))
+
+
+# Cost of the disabled and enabled stage() per call, to keep an eye on the
+# overhead added to the serve path
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-call overhead of instrument.stage().")
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    def run():
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            with stage('overhead'):
+                pass
+        return (time.perf_counter() - start) / args.calls * 1e9
+
+    global _metrics
+    saved = _metrics
+    _metrics = None
+    disabled = run()
+    configure()
+    active = run()
+    _metrics = saved
+    print(f"stage() disabled: {disabled:7.0f} ns/call")
+    print(f"stage() enabled:  {active:7.0f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
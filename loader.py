@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from encoding import QuestionEncoder
+from instrument import stage
+
+# Bump when the cached table layout changes; older caches are rebuilt
+CACHE_FORMAT = 1
+
+ROLL = 'Roll No.(8 Digits)'
+SOURCES = ('response.csv', 'marks.csv', 'courses.csv')
+
+# frame: merged response x marks x courses table (one row per enrolled course,
+#   as the scripts build it) with int8 question codes, float32 marks and
+#   categorical strings
+# encoder: the QuestionEncoder behind the question codes
+# dispersion: degree of dispersion per question title
+StudentTable = namedtuple('StudentTable', ['frame', 'encoder', 'dispersion'])
+
+
+# Size, mtime and content hash of every source file. A cache is still valid
+# when size and mtime match, or when only the mtime changed but the hash did
+# not (e.g. after a checkout).
+def source_signature(data_dir):
+    signature = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(data_dir, name))
+        signature[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': None}
+    return signature
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# A file whose mtime moved but whose hash matched gets the new mtime in cached,
+# so the next load does not hash it again. Returns (fresh, cached was updated).
+def _is_fresh(cached, current, data_dir):
+    updated = False
+    for name, entry in current.items():
+        old = cached.get(name)
+        if old is None or old['size'] != entry['size']:
+            return False, False
+        if old['mtime_ns'] != entry['mtime_ns']:
+            if old['sha1'] != _sha1(os.path.join(data_dir, name)):
+                return False, False
+            old['mtime_ns'] = entry['mtime_ns']
+            updated = True
+    return True, updated
+
+
+# Degree of dispersion per question title, from dispersion.csv or a
+# stats_store.QuestionnaireStats
+def load_dispersion(data_dir='.', stats=None):
+    if stats is not None:
+        return pd.Series(stats.dispersion(), name='Degree of Dispersion (Std Dev)')
+    dispersion_df = pd.read_csv(os.path.join(data_dir, 'dispersion.csv'), index_col='Question Title')
+    return dispersion_df['Degree of Dispersion (Std Dev)']
+
+
+# The three source CSVs, read with the dtypes the table keeps
+def read_sources(data_dir='.'):
+    with stage('load_csv'):
+        return _read_sources(data_dir)
+
+
+def _read_sources(data_dir):
+    response_df = pd.read_csv(os.path.join(data_dir, 'response.csv'), dtype={ROLL: 'int64'})
+    marks_df = pd.read_csv(os.path.join(data_dir, 'marks.csv'), dtype={'roll no': 'int64', 'marks': 'float32'})
+    courses_df = pd.read_csv(os.path.join(data_dir, 'courses.csv'), dtype={'roll no': 'int64', 'course': 'category'})
+    return response_df, marks_df, courses_df
+
+
+# Encode the questionnaire answers and merge marks and courses onto them
+def encode_sources(response_df, marks_df, courses_df, normalize='text', question_columns=None):
+    marks_df = marks_df.rename(columns={'roll no': ROLL})
+    courses_df = courses_df.rename(columns={'roll no': ROLL})
+
+    if question_columns is None:
+        question_columns = list(response_df.columns[4:])
+    encoder = QuestionEncoder(normalize=normalize)
+    with stage('encode'):
+        response_df = encoder.fit_transform(response_df, question_columns)
+        for col in response_df.columns[:4]:
+            if response_df[col].dtype == object:
+                response_df[col] = response_df[col].astype('category')
+
+    with stage('merge') as timer:
+        frame = response_df.merge(marks_df, how='left', on=ROLL).merge(courses_df, how='left', on=ROLL)
+        timer.size('frame', frame)
+    return frame, encoder
+
+
+def build_student_table(data_dir='.', normalize='text', question_columns=None):
+    return encode_sources(*read_sources(data_dir), normalize, question_columns)
+
+
+def _save_table(frame, encoder, cache_dir, signature):
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    columns = []
+    for i, col in enumerate(frame.columns):
+        series = frame[col]
+        entry = {'name': col, 'file': f'{i}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['categories'] = [str(c) for c in series.cat.categories]
+            np.save(os.path.join(cache_dir, entry['file']), series.cat.codes.to_numpy())
+        else:
+            np.save(os.path.join(cache_dir, entry['file']), series.to_numpy())
+        columns.append(entry)
+
+    manifest = {'format_version': CACHE_FORMAT, 'sources': signature,
+                'encoder': encoder.to_dict(), 'columns': columns}
+    # The manifest is written last: a cache without one is never read
+    _write_manifest(manifest_path, manifest)
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+
+
+def _load_table(cache_dir, manifest, mmap=False):
+    data = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(cache_dir, entry['file']), mmap_mode='r' if mmap else None)
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, entry['categories'])
+        data[entry['name']] = values
+    return pd.DataFrame(data), QuestionEncoder.from_dict(manifest['encoder'])
+
+
+# Merged student table, built once and cached as one .npy file per column
+# under <data_dir>/.cache/student_table-<normalize>/. The cache is rebuilt
+# when a source CSV changes.
+def load_student_table(data_dir='.', normalize='text', cache_dir=None, use_cache=True, stats=None):
+    dispersion = load_dispersion(data_dir, stats)
+    if not use_cache:
+        frame, encoder = build_student_table(data_dir, normalize)
+        return StudentTable(frame, encoder, dispersion)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, '.cache', f'student_table-{normalize}')
+    signature = source_signature(data_dir)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        fresh, updated = False, False
+        if manifest['format_version'] == CACHE_FORMAT:
+            fresh, updated = _is_fresh(manifest['sources'], signature, data_dir)
+        if fresh:
+            if updated:
+                _write_manifest(manifest_path, manifest)
+            with stage('load_cache') as timer:
+                frame, encoder = _load_table(cache_dir, manifest)
+                timer.size('frame', frame)
+            return StudentTable(frame, encoder, dispersion)
+
+    frame, encoder = build_student_table(data_dir, normalize)
+    for name, entry in signature.items():
+        entry['sha1'] = _sha1(os.path.join(data_dir, name))
+    _save_table(frame, encoder, cache_dir, signature)
+    return StudentTable(frame, encoder, dispersion)
+
+
+def clear_cache(data_dir='.'):
+    shutil.rmtree(os.path.join(data_dir, '.cache'), ignore_errors=True)
+
+
+# The read_csv -> rename -> merge -> join -> LabelEncoder sequence the
+# scripts used before this module, kept for the memory comparison
+def legacy_student_table(data_dir='.'):
+    from sklearn.preprocessing import LabelEncoder
+
+    dispersion_df = pd.read_csv(os.path.join(data_dir, 'dispersion.csv'))
+    marks_df = pd.read_csv(os.path.join(data_dir, 'marks.csv'))
+    courses_df = pd.read_csv(os.path.join(data_dir, 'courses.csv'))
+    response_df = pd.read_csv(os.path.join(data_dir, 'response.csv'))
+    marks_df.rename(columns={'roll no': ROLL}, inplace=True)
+    courses_df.rename(columns={'roll no': ROLL}, inplace=True)
+    response_df = response_df.merge(marks_df, how='left', on=ROLL)
+    response_df = response_df.merge(courses_df, how='left', on=ROLL)
+    dispersion_df.set_index('Question Title', inplace=True)
+    response_df = response_df.join(dispersion_df[['Degree of Dispersion (Std Dev)']],
+                                   on=response_df.columns[4], rsuffix='_dispersion')
+    encoder = LabelEncoder()
+    for col in response_df.columns[4:18]:
+        response_df[col] = encoder.fit_transform(response_df[col].astype(str))
+    return response_df
+
+
+def _measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame = result.frame if isinstance(result, StudentTable) else result
+    print(f"{label:<22} {seconds * 1000:9.1f} ms  peak {peak / 2**20:8.2f} MiB  "
+          f"table {frame.memory_usage(deep=True).sum() / 2**20:8.2f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy load/merge/encode path with the cached loader.")
+    parser.add_argument('--data-dir', default='.')
+    args = parser.parse_args()
+
+    # Imported up front so the legacy timing does not include sklearn's import
+    import sklearn.preprocessing  # noqa: F401
+
+    clear_cache(args.data_dir)
+    _measure('legacy', lambda: legacy_student_table(args.data_dir))
+    _measure('loader (no cache)', lambda: load_student_table(args.data_dir, use_cache=False))
+    _measure('loader (cold cache)', lambda: load_student_table(args.data_dir))
+    _measure('loader (warm cache)', lambda: load_student_table(args.data_dir))
+
+
+if __name__ == '__main__':
+    main()
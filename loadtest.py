@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import csv
+import json
+import random
+import time
+
+import numpy as np
+
+
+# One keep-alive HTTP/1.1 connection
+class Client:
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method, path, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+# Roll numbers and questionnaire answers of the existing students, used as
+# the request mix (new-user requests replay real answers)
+def load_workload(data_dir='.'):
+    with open(f'{data_dir}/response.csv', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    roll_numbers = [int(r['Roll No.(8 Digits)']) for r in rows if r['Roll No.(8 Digits)'].isdigit()]
+    answers = [{k: v for k, v in r.items() if k not in ('Submission ID', 'Submission time', 'Name', 'Roll No.(8 Digits)')}
+               for r in rows]
+    return roll_numbers, answers
+
+
+async def run_load(host, port, roll_numbers, answers, n_requests, concurrency, new_fraction, seed=0):
+    rng = random.Random(seed)
+    plan = [('new', rng.choice(answers)) if rng.random() < new_fraction else ('student', rng.choice(roll_numbers))
+            for _ in range(n_requests)]
+    latencies = {'student': [], 'new': []}
+    errors = 0
+    position = 0
+
+    async def worker():
+        nonlocal position, errors
+        client = await Client.connect(host, port)
+        try:
+            while position < len(plan):
+                kind, value = plan[position]
+                position += 1
+                start = time.perf_counter()
+                if kind == 'new':
+                    status, _ = await client.request('POST', '/recommend/new', value)
+                else:
+                    status, _ = await client.request('GET', f'/recommend/{value}')
+                latencies[kind].append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    client = await Client.connect(host, port)
+    _, health = await client.request('GET', '/health')
+    await client.close()
+    return latencies, errors, elapsed, health
+
+
+def report(latencies, errors, elapsed, health):
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests in {elapsed:.2f} s ({total / elapsed:.0f} req/s), {errors} errors")
+    for kind, values in [('all', latencies['student'] + latencies['new'])] + list(latencies.items()):
+        if values:
+            ms = np.asarray(values) * 1000
+            print(f"  {kind:<8} n={len(ms):<6} p50 {np.percentile(ms, 50):7.2f} ms  "
+                  f"p99 {np.percentile(ms, 99):7.2f} ms  max {ms.max():7.2f} ms")
+    if health.get('batches'):
+        print(f"  new-user batches: {health['batches']}, "
+              f"mean size {health['batched_requests'] / health['batches']:.1f}")
+    if health.get('cache'):
+        cache = health['cache']
+        print(f"  result cache: hit rate {cache['hit_rate']:.1%} ({cache['hits']} hits, {cache['misses']} misses)")
+
+
+async def main_async(args):
+    roll_numbers, answers = load_workload(args.data_dir)
+    host, port, server_task = args.host, args.port, None
+    if args.model:
+        from service import RecommendationService
+
+        # Run the service in this process on a free port
+        service = RecommendationService(args.model, args.max_batch, args.max_wait_ms / 1000, watch_interval=0)
+        ready = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(service.serve(host, 0, ready))
+        port = await ready
+    try:
+        results = await run_load(host, port, roll_numbers, answers, args.requests, args.concurrency, args.new_fraction)
+        report(*results)
+    finally:
+        if server_task is not None:
+            # Let the server see the closed connections before stopping it
+            await asyncio.sleep(0.05)
+            server_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure p50/p99 latency of the recommendation service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', help="Start the service in-process on this artifact instead of using --port")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--new-fraction', type=float, default=0.5)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
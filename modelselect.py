@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from clustering import fit_pam_precomputed, total_cost
+from gower_distance import gower_matrix_blocked, prepare_gower_features
+from popularity import CoursePopularityIndex
+
+
+# Hide one random course from a fraction of the students with at least two
+# courses. Returns the visible incidence matrix, the holdout rows and the
+# hidden course id of each row.
+def holdout_split(matrix, fraction=0.2, random_state=42):
+    rng = np.random.default_rng(random_state)
+    counts = np.diff(matrix.indptr)
+    eligible = np.flatnonzero(counts >= 2)
+    rows = np.sort(rng.choice(eligible, int(round(len(eligible) * fraction)), replace=False))
+    positions = matrix.indptr[rows] + rng.integers(0, counts[rows])
+    hidden = matrix.indices[positions].astype(np.int64)
+    visible = matrix.copy()
+    visible.data[positions] = 0
+    visible.eliminate_zeros()
+    return visible, rows, hidden
+
+
+# Share of holdout students whose hidden course is in their cluster's top-N
+# (popularity from the visible enrollments only)
+def holdout_hit_rate(labels, n_clusters, visible, courses, rows, hidden, top_n=3):
+    if len(rows) == 0:
+        return float('nan')
+    popularity = CoursePopularityIndex.from_incidence(labels, visible, courses, n_clusters)
+    ids = popularity.top_n_ids_batch(rows, labels[rows], top_n)
+    return float((ids == hidden[:, None]).any(axis=1).mean())
+
+
+# Fit one (k, seed) on the precomputed Gower matrix and score it: mean
+# distance to medoid, silhouette (on a row sample for large n) and holdout hit-rate
+def evaluate_fit(matrix, n_clusters, random_state, visible, courses, rows, hidden, top_n=3,
+                 silhouette_sample=2000):
+    from sklearn.metrics import silhouette_score
+
+    start = time.perf_counter()
+    result = fit_pam_precomputed(matrix, n_clusters, random_state, init='k-medoids++')
+    labels = np.asarray(result.labels)
+    seconds = time.perf_counter() - start
+    n = len(labels)
+    if 1 < len(np.unique(labels)) < n:
+        sample_size = silhouette_sample if n > silhouette_sample else None
+        score = float(silhouette_score(matrix, labels, metric='precomputed', sample_size=sample_size,
+                                       random_state=random_state))
+    else:
+        score = float('nan')
+    return {
+        'k': int(n_clusters),
+        'seed': int(random_state),
+        'cost': total_cost(result) / n,
+        'silhouette': score,
+        'hit_rate': holdout_hit_rate(labels, n_clusters, visible, courses, rows, hidden, top_n),
+        'medoids': [int(m) for m in result.medoid_indices],
+        'seconds': seconds,
+    }
+
+
+# Per-process state: the Gower matrix opened read-only from the shared memmap
+# file (pages are shared through the OS cache, never pickled) and the holdout
+_worker_matrix = None
+_worker_context = None
+
+
+def _init_worker(matrix_path, n, context):
+    global _worker_matrix, _worker_context
+    _worker_matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(n, n))
+    _worker_context = context
+
+
+def _worker_evaluate(n_clusters, random_state):
+    return evaluate_fit(_worker_matrix, n_clusters, random_state, **_worker_context)
+
+
+# Evaluate every (k, seed) pair against the memmapped matrix, in a process
+# pool when n_jobs > 1. Results come back in (k, seed) order.
+def run_grid(matrix_path, n, ks, seeds, context, n_jobs=1):
+    tasks = [(k, seed) for k in ks for seed in seeds]
+    if n_jobs == 1:
+        _init_worker(matrix_path, n, context)
+        return [_worker_evaluate(k, seed) for k, seed in tasks]
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(matrix_path, n, context)) as pool:
+        return list(pool.map(_worker_evaluate, *zip(*tasks)))
+
+
+# Best candidate by holdout hit-rate, then silhouette, then lowest cost
+# (select='silhouette' puts silhouette first)
+def best_candidate(candidates, select='hit_rate'):
+    def key(c):
+        hit_rate = -1.0 if np.isnan(c['hit_rate']) else c['hit_rate']
+        score = -1.0 if np.isnan(c['silhouette']) else c['silhouette']
+        first, second = (hit_rate, score) if select == 'hit_rate' else (score, hit_rate)
+        return first, second, -c['cost']
+    return max(candidates, key=key)
+
+
+# Gower matrix of prep written once to a memmap under work_dir, then the
+# (k, seed) grid evaluated for each pool size in jobs. Returns the candidates
+# (from the first run) and the wall-clock time of every run.
+def select_model(prep, ks, seeds, context, jobs=(1,), work_dir=None, block_rows=2048):
+    n = len(prep['num'])
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        matrix_path = os.path.join(tmp, 'gower.f32')
+        start = time.perf_counter()
+        matrix = gower_matrix_blocked(prep, block_rows=block_rows, out=matrix_path, n_jobs=max(jobs))
+        matrix.flush()
+        del matrix
+        matrix_seconds = time.perf_counter() - start
+
+        candidates, scaling = None, []
+        for n_jobs in jobs:
+            start = time.perf_counter()
+            results = run_grid(matrix_path, n, ks, seeds, context, n_jobs)
+            scaling.append({'n_jobs': n_jobs, 'seconds': time.perf_counter() - start})
+            candidates = candidates or results
+    return candidates, scaling, matrix_seconds
+
+
+# The artifact model of the best candidate. It is the evaluated fit itself
+# (same features, visible enrollments, k, seed and init), so it carries the
+# medoids that were scored; a refit on every enrollment would be a different,
+# unscored model. The holdout only serves for scoring, so the course index is
+# then rebuilt from every enrollment: held-out courses are counted and never
+# recommended back to the students who took them. Returns the engine and its
+# holdout hit rate.
+def fit_selected(features, roll_numbers, incidence, visible, rows, hidden, best, cat_columns, item_weight=0.0,
+                 top_n=3):
+    from engine import RecommenderEngine
+
+    engine = RecommenderEngine(n_clusters=best['k'], random_state=best['seed'], cat_columns=cat_columns,
+                               backend_options={'init': 'k-medoids++'}, course_metric='hamming',
+                               item_weight=item_weight)
+    engine.fit(features, roll_numbers, incidence._replace(matrix=visible))
+    medoids = [int(m) for m in engine.medoid_indices_]
+    if medoids != best['medoids']:
+        raise RuntimeError(f"Artifact medoids {medoids} differ from the evaluated {best['medoids']}")
+    hit_rate = holdout_hit_rate(engine.labels_, best['k'], visible, incidence.courses, rows, hidden, top_n)
+    return engine.reindex_courses(incidence), hit_rate
+
+
+def _int_list(text):
+    values = []
+    for part in text.split(','):
+        low, _, high = part.partition('-')
+        values.extend(range(int(low), int(high or low) + 1))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Choose k (and seed) for the k-medoids model and write the best artifact.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--out', default='model')
+    parser.add_argument('--k', default='2-8', help="Cluster counts to try, e.g. 2-8 or 3,5,7")
+    parser.add_argument('--seeds', type=int, default=3, help="Random seeds per k")
+    parser.add_argument('--jobs', default=f'1,{os.cpu_count() or 1}',
+                        help="Process pool sizes to time the grid with; the largest also builds the matrix")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fraction of students with one course held out")
+    parser.add_argument('--top-n', type=int, default=3)
+    parser.add_argument('--select', choices=['hit_rate', 'silhouette'], default='hit_rate')
+    parser.add_argument('--item-weight', type=float, default=0.0)
+    parser.add_argument('--report', help="Write candidates and scaling as JSON to this file")
+    parser.add_argument('--no-artifact', action='store_true', help="Only report, do not write the best model")
+    args = parser.parse_args()
+
+    from pipeline import categorical_columns, prepare_training_data
+
+    features, roll_numbers, incidence, encoder = prepare_training_data(args.data_dir)
+    # Cluster on the visible enrollments so held-out courses cannot leak in
+    visible, rows, hidden = holdout_split(incidence.matrix, args.holdout)
+    prep = prepare_gower_features(features, categorical_columns, sets=visible)
+    context = {'visible': visible, 'courses': incidence.courses, 'rows': rows, 'hidden': hidden, 'top_n': args.top_n}
+
+    ks = [k for k in _int_list(args.k) if 1 < k < len(features)]
+    seeds = list(range(42, 42 + args.seeds))
+    jobs = sorted(set(_int_list(args.jobs)))
+    # Imported up front so the first timed run does not pay for them
+    import sklearn.metrics  # noqa: F401
+    import sklearn_extra.cluster  # noqa: F401
+    candidates, scaling, matrix_seconds = select_model(prep, ks, seeds, context, jobs)
+
+    print(f"{len(features)} students, {len(rows)} held-out courses; Gower matrix in {matrix_seconds:.2f} s")
+    print(f"{'k':>3} {'seed':>5} {'mean cost':>10} {'silhouette':>11} {'hit rate':>9} {'fit s':>7}")
+    for c in candidates:
+        print(f"{c['k']:>3} {c['seed']:>5} {c['cost']:>10.4f} {c['silhouette']:>11.4f} "
+              f"{c['hit_rate']:>9.3f} {c['seconds']:>7.3f}")
+    print(f"Grid of {len(candidates)} fits on {os.cpu_count()} cores:")
+    for run in scaling:
+        speedup = scaling[0]['seconds'] / run['seconds']
+        print(f"  n_jobs={run['n_jobs']:<3} {run['seconds']:7.2f} s  speedup {speedup:4.2f}x  "
+              f"efficiency {speedup * scaling[0]['n_jobs'] / run['n_jobs']:5.1%}")
+
+    best = best_candidate(candidates, args.select)
+    print(f"Best: k={best['k']} seed={best['seed']} (hit rate {best['hit_rate']:.3f}, "
+          f"silhouette {best['silhouette']:.4f})")
+
+    shipped = None
+    if not args.no_artifact:
+        from artifact import build_artifact
+
+        engine, hit_rate = fit_selected(features, roll_numbers, incidence, visible, rows, hidden, best,
+                                        categorical_columns, args.item_weight, args.top_n)
+        shipped = {'medoids': [int(m) for m in engine.medoid_indices_], 'hit_rate': hit_rate,
+                   'version_dir': build_artifact(engine, args.out, encoder)}
+        print(f"Model artifact written to {shipped['version_dir']} (holdout hit rate {shipped['hit_rate']:.3f})")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'matrix_seconds': matrix_seconds, 'best': best,
+                       'candidates': candidates, 'scaling': scaling, 'artifact': shipped}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
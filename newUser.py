@@ -1,33 +1,19 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
-from sklearn_extra.cluster import KMedoids
-from gower import gower_matrix
-
-# Load CSV Files
-dispersion_df = pd.read_csv('dispersion.csv')
-marks_df = pd.read_csv('marks.csv')
-courses_df = pd.read_csv('courses.csv')
-response_df = pd.read_csv('response.csv')
-
-# Rename for consistency
-marks_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-courses_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-
-# Merge marks and courses with response data based on Roll No
-response_df = response_df.merge(marks_df, how='left', on='Roll No.(8 Digits)')
-response_df = response_df.merge(courses_df, how='left', on='Roll No.(8 Digits)')
-
-# Merge degree of dispersion for specific question
-dispersion_df.set_index('Question Title', inplace=True)
-response_df = response_df.join(
-    dispersion_df[['Degree of Dispersion (Std Dev)']],
-    on='Interest in Subjects: How interested are you in exploring new subjects?',
-    rsuffix='_dispersion'
-)
-
-# Encode categorical responses by extracting the first letter (option alphabet)
-encoder = LabelEncoder()
+from loader import load_student_table
+from engine import RecommenderEngine
+from incidence import load_course_incidence, taken_bits
+from peers import PeerIndex
+from pipeline import student_level
+
+# Load the merged response x marks x courses table (built once, then cached);
+# question columns arrive as int8 codes of their option letters (a, b, ...)
+table = load_student_table(normalize='letter')
+response_df = table.frame
+encoder = table.encoder
+dispersion = table.dispersion  # degree of dispersion per question title
+
+# Questionnaire columns (compared as categories)
 categorical_columns = [
     'Interest in Subjects: How interested are you in exploring new subjects?',
     'Skill Development: How important is skill development in your choice of electives?',
@@ -45,24 +31,6 @@ categorical_columns = [
     'Future Studies: Are you planning further studies in any area?'
 ]
 
-# Function to safely encode responses
-def safe_encode(encoder, new_value):
-    # Extract the first letter (alphabet) from the response text (e.g., 'a', 'b', etc.)
-    option_letter = new_value[0]  # e.g., 'a', 'b'
-    try:
-        # Transform the option letter into an integer
-        return encoder.transform([option_letter])[0]
-    except ValueError:  # If new letter is encountered
-        # If the option is unseen, append the new letter to the encoder's classes and return the encoded value
-        encoder.classes_ = np.append(encoder.classes_, option_letter)
-        return encoder.transform([option_letter])[0]
-
-# Encode the responses in the DataFrame
-for col in categorical_columns:
-    if col in response_df.columns:
-        # Extract the first letter from the response and fit the encoder
-        response_df[col] = response_df[col].str[0]  # Only keep the first letter of the response
-        encoder.fit(response_df[col].astype(str))
 
 # Prepare the response for a new user
 new_user_responses = {
@@ -86,88 +54,47 @@ new_user_responses = {
     'Future Studies: Are you planning further studies in any area?': 'b) No',
 }
 
-# Encode the new user responses
-new_user_encoded = {}
-for col in new_user_responses:
-    if col in categorical_columns:
-        new_user_encoded[col] = safe_encode(encoder, new_user_responses[col])
-
-# Add the new user data to the response_df
-new_user_df = pd.DataFrame([new_user_encoded])
-response_df = pd.concat([response_df, new_user_df], ignore_index=True)
-
-# Ensure proper preprocessing and clustering (same as previous code)
-# Prepare numeric data for Gower distance
-gower_ready_df = response_df.select_dtypes(include=[np.number])
-
-# Handle missing values before clustering
-# For numeric columns, replace NaN with the mean of that column
-gower_ready_df = gower_ready_df.fillna(gower_ready_df.mean())
+# One row per student (the merged table has one per enrolled course): only
+# the declared feature columns, missing marks filled with the mean, and each
+# student's courses aggregated into one sparse course set
+feature_columns = categorical_columns + ['marks']
+student_features, roll_numbers, student_courses = student_level(response_df, load_course_incidence('courses.csv'),
+                                                                 feature_columns)
 
-# For categorical columns, you can replace NaN with the mode (most frequent value)
-for col in categorical_columns:
-    response_df[col] = response_df[col].fillna(response_df[col].mode()[0])
-
-# Recompute the Gower distance matrix after handling NaN values
-gower_dist_matrix = gower_matrix(response_df)
-
-# Check if there are NaNs in the Gower matrix
-if np.any(np.isnan(gower_dist_matrix)):
-    print("Warning: Gower matrix contains NaN values. Removing rows/columns with NaNs.")
-    # Remove rows and columns that contain NaN values
-    gower_dist_matrix = np.nan_to_num(gower_dist_matrix)
-
-# Clustering using KMedoids
+# Fit the medoids once; new users are assigned to them without re-clustering
 n_clusters = 3
-kmedoids = KMedoids(n_clusters=n_clusters, metric="precomputed", random_state=42)
-
-# Attempt to fit KMedoids with the preprocessed Gower distance matrix
-try:
-    kmedoids.fit(gower_dist_matrix)
-    response_df['Cluster'] = kmedoids.labels_
-except ValueError as e:
-    print(f"Error during clustering: {e}")
+engine = RecommenderEngine(n_clusters=n_clusters, random_state=42, cat_columns=categorical_columns)
+engine.fit(student_features, roll_numbers, student_courses)
+response_df['Cluster'] = response_df['Roll No.(8 Digits)'].map(dict(zip(roll_numbers, engine.labels_)))
 
 # Function to recommend courses for the new user based on their cluster
-def recommend_courses_for_new_user(response_df, new_user_responses, top_n=3):
-    new_user_encoded = {}
-    for col in new_user_responses:
-        if col in categorical_columns:
-            new_user_encoded[col] = safe_encode(encoder, new_user_responses[col])
-
-    # Add the new user data to the response DataFrame
-    new_user_df = pd.DataFrame([new_user_encoded])
-    response_df = pd.concat([response_df, new_user_df], ignore_index=True)
-
-    # Now that the new user is part of the dataset, perform clustering and recommend courses
-    gower_ready_df = response_df.select_dtypes(include=[np.number])
-    gower_dist_matrix = gower_matrix(gower_ready_df)
-
-    # Check if there are NaNs in the Gower matrix
-    if np.any(np.isnan(gower_dist_matrix)):
-        print("Warning: Gower matrix contains NaN values. Removing rows/columns with NaNs.")
-        gower_dist_matrix = np.nan_to_num(gower_dist_matrix)
-
-    kmedoids.fit(gower_dist_matrix)
-    response_df['Cluster'] = kmedoids.labels_
+def recommend_courses_for_new_user(new_user_responses, top_n=3):
+    new_user_df = pd.DataFrame(encoder.encode_records([new_user_responses]))
 
-    # Find the cluster of the new user (last added user)
-    new_user_cluster = response_df.iloc[-1]['Cluster']
+    # Refit on schedule or once new users have drifted away from the medoids
+    if engine.needs_refit():
+        engine.refit()
 
-    # Get other students in the same cluster
-    cluster_students = response_df[response_df['Cluster'] == new_user_cluster]
+    # Assign the new user to the nearest medoid (Gower distance to k medoids only)
+    return engine.recommend_for_new_user(new_user_df, top_n=top_n)
 
-    # Get the courses taken by students in the same cluster
-    cluster_ids = cluster_students['Roll No.(8 Digits)']
-    cluster_courses_series = cluster_students['course'].explode()
-    common_courses = cluster_courses_series.value_counts().head(top_n).index.tolist()
+# Nearest-peers mode: index every existing student's answer codes and marks,
+# and recommend what the new student's k most similar students took
+students = response_df.drop_duplicates('Roll No.(8 Digits)')
+peer_index = PeerIndex.build(students[categorical_columns].to_numpy(), students['marks'], student_courses.courses,
+                             taken_bits(student_courses), students['Roll No.(8 Digits)'])
 
-    # Exclude courses already taken by the new user
-    student_courses = cluster_students.loc[cluster_students['Roll No.(8 Digits)'] == new_user_responses['Roll No.(8 Digits)'], 'course']
-    recommended_courses = [course for course in common_courses if course not in student_courses]
+def recommend_courses_from_peers(new_user_responses, k=10, top_n=3):
+    encoded = encoder.encode_records([new_user_responses])
+    codes = np.array([encoded[col][0] for col in categorical_columns])
+    mark = float(new_user_responses.get('marks', np.nan))
+    recommended = peer_index.recommend(codes, mark, k, top_n, new_user_responses.get('courses_taken', []))
 
-    return recommended_courses[:top_n]
+    # The new student is searchable as a peer right away
+    peer_index.add(codes[None, :], mark, roll_numbers=int(new_user_responses.get('Roll No.(8 Digits)', -1)))
+    return recommended
 
 # Example usage for the new user
-recommended_courses = recommend_courses_for_new_user(response_df, new_user_responses)
+recommended_courses = recommend_courses_for_new_user(new_user_responses)
 print(f"Recommended Courses for new user: {recommended_courses}")
+print(f"Recommended Courses from nearest peers: {recommend_courses_from_peers(new_user_responses)}")
@@ -1,33 +1,19 @@
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 from sklearn_extra.cluster import KMedoids
-from gower import gower_matrix
-
-# Load CSV Files
-dispersion_df = pd.read_csv('dispersion.csv')
-marks_df = pd.read_csv('marks.csv')
-courses_df = pd.read_csv('courses.csv')
-response_df = pd.read_csv('response.csv')
-
-# Rename for consistency
-marks_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-courses_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-
-# Merge marks and courses with response data based on Roll No
-response_df = response_df.merge(marks_df, how='left', on='Roll No.(8 Digits)')
-response_df = response_df.merge(courses_df, how='left', on='Roll No.(8 Digits)')
-
-# Merge degree of dispersion for specific question
-dispersion_df.set_index('Question Title', inplace=True)
-response_df = response_df.join(
-    dispersion_df[['Degree of Dispersion (Std Dev)']],
-    on='Interest in Subjects: How interested are you in exploring new subjects?',
-    rsuffix='_dispersion'
-)
-
-# Encode categorical responses
-encoder = LabelEncoder()
+from loader import load_student_table
+from incidence import align_incidence, load_course_incidence
+from gower_distance import gower_matrix_blocked
+from popularity import CoursePopularityIndex, lookup_rows
+from instrument import stage, timed
+
+# Load the merged response x marks x courses table (built once, then cached);
+# question columns arrive as int8 codes of each question's vocabulary
+table = load_student_table()
+response_df = table.frame
+encoder = table.encoder
+dispersion = table.dispersion  # degree of dispersion per question title
+
+# Questionnaire columns (compared as categories)
 categorical_columns = [
     'Interest in Subjects: How interested are you in exploring new subjects?',
     'Skill Development: How important is skill development in your choice of electives?',
@@ -45,67 +31,58 @@ categorical_columns = [
     'Future Studies: Are you planning further studies in any area?'
 ]
 
-for col in categorical_columns:
-    if col in response_df.columns:
-        response_df[col] = encoder.fit_transform(response_df[col].astype(str))
-
-# Prepare one-hot encoded course matrix
-course_matrix = response_df.groupby('Roll No.(8 Digits)')['course'].apply(lambda x: ', '.join(x.dropna())).reset_index()
-course_matrix['course'] = course_matrix['course'].apply(lambda x: x.split(', ') if x else [])
-course_matrix = course_matrix.set_index('Roll No.(8 Digits)')
-
-# One-hot encode courses
-course_onehot = course_matrix['course'].apply(pd.Series).stack().str.get_dummies().groupby(level=0).sum()
+# Student x course incidence (CSR, integer course ids) straight from courses.csv
+incidence = load_course_incidence('courses.csv')
 
-# Set index for response_df for merge
-response_df = response_df.set_index('Roll No.(8 Digits)')
+# One row per student; students without any enrolled course are left out
+response_df = response_df.drop_duplicates('Roll No.(8 Digits)').drop(columns='course')
+response_df = response_df[response_df['Roll No.(8 Digits)'].isin(incidence.roll_numbers)].reset_index(drop=True)
+incidence = align_incidence(incidence, response_df['Roll No.(8 Digits)'])
 
-# Ensure unique indices before merging
-response_df = response_df[~response_df.index.duplicated(keep='first')]
-course_onehot = course_onehot[~course_onehot.index.duplicated(keep='first')]
+# Declared features only: the questionnaire answers and marks (identifiers
+# such as the roll number are never distance features)
+gower_ready_df = response_df[categorical_columns + ['marks']]
+gower_ready_df = gower_ready_df.fillna(gower_ready_df.mean())
 
-# Align indices and merge
-common_index = response_df.index.intersection(course_onehot.index)
-response_df = response_df.loc[common_index]
-course_onehot = course_onehot.loc[common_index]
-response_df = pd.concat([response_df, course_onehot], axis=1).fillna(0)
-
-# Reset index for flat DataFrame
-response_df.reset_index(inplace=True)
-
-# Prepare numeric data for Gower distance
-gower_ready_df = response_df.select_dtypes(include=[np.number])
-
-# Compute Gower distance matrix
-gower_dist_matrix = gower_matrix(gower_ready_df)
+# Compute Gower distance matrix in float32 row blocks, comparing the
+# questionnaire answers as categories rather than as their label codes; the
+# courses are one sparse block counting the courses two students do not share
+gower_dist_matrix = gower_matrix_blocked(gower_ready_df, cat_features=categorical_columns, sets=incidence.matrix)
 
 # Clustering using KMedoids
 n_clusters = 3
 kmedoids = KMedoids(n_clusters=n_clusters, metric="precomputed", random_state=42)
-kmedoids.fit(gower_dist_matrix)
+with stage('kmedoids_fit'):
+    kmedoids.fit(gower_dist_matrix)
 
 # Add cluster labels to DataFrame
 response_df['Cluster'] = kmedoids.labels_
 
+# Precompute per-cluster course rankings and each student's taken-course bitset
+student_rows = {roll_no: row for row, roll_no in enumerate(response_df['Roll No.(8 Digits)'])}
+with stage('course_index'):
+    popularity_index = CoursePopularityIndex.from_incidence(kmedoids.labels_, incidence.matrix, incidence.courses, n_clusters)
+
 # Recommendation function
+@timed('recommend_student')
 def recommend_courses_based_on_cluster(student_id, top_n=3):
-    if student_id not in response_df['Roll No.(8 Digits)'].values:
+    if student_id not in student_rows:
         return ["Student ID not found."]
 
-    student_row = response_df[response_df['Roll No.(8 Digits)'] == student_id]
-    student_cluster = student_row['Cluster'].values[0]
-    cluster_students = response_df[response_df['Cluster'] == student_cluster]
-
-    # Courses taken by students in the same cluster
-    cluster_ids = cluster_students['Roll No.(8 Digits)']
-    cluster_courses_series = course_matrix.loc[course_matrix.index.isin(cluster_ids), 'course'].explode()
-    common_courses = cluster_courses_series.value_counts().head(top_n).index.tolist()
-
-    # Exclude already taken by the student
-    student_courses = course_matrix.loc[student_id, 'course'] if student_id in course_matrix.index else []
-    recommended = [c for c in common_courses if c not in student_courses]
-
-    return recommended[:top_n]
+    # Masked top-N over the cluster's ranking: courses the student already took
+    # are skipped before cutting to top_n
+    row = student_rows[student_id]
+    return popularity_index.recommend_for_row(row, kmedoids.labels_[row], top_n)
+
+# Batch recommendation for a whole cohort: returns a (students x top_n) array of
+# courses, None where a student has fewer than top_n courses left to recommend
+@timed('recommend_batch')
+def recommend_courses_for_cohort(student_ids, top_n=3):
+    rows = lookup_rows(response_df['Roll No.(8 Digits)'].to_numpy(), np.asarray(student_ids))
+    clusters = np.where(rows >= 0, kmedoids.labels_[rows], 0)
+    ids = popularity_index.top_n_ids_batch(rows, clusters, top_n)
+    ids[rows < 0] = -1
+    return popularity_index.course_names(ids)
 
 # Example usage
 student_id = 22103061
@@ -0,0 +1,129 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from dea import EPSILON, solve_dea
+
+# cost: minimum total obstruction from each student up to layer 1 (0 on layer
+#   1, inf when no path exists)
+# next_hop: the next reference student on that path (-1 on layer 1 or without a path)
+# attractiveness / progress: the A_j and P_j used in the obstruction
+PathResult = namedtuple('PathResult', ['cost', 'next_hop', 'attractiveness', 'progress'])
+
+
+# Attractiveness A_j: how far j lies beyond the layer below it, 1/theta - 1 with
+# j evaluated against that layer (0 on the last layer).
+# Progress P_j: how far j still is from the layer above it, theta - 1 with j
+# evaluated against that layer (0 on layer 1).
+# Both are solved in bulk: one LP structure per adjacent layer pair.
+def layer_scores(X, Y, layers, returns='crs', epsilon=EPSILON, solver='auto'):
+    n = len(X)
+    attractiveness = np.zeros(n)
+    progress = np.zeros(n)
+    n_layers = int(layers.max()) if n else 0
+    members = {l: np.flatnonzero(layers == l) for l in range(1, n_layers + 1)}
+    for l in range(1, n_layers + 1):
+        if l < n_layers:
+            below = solve_dea(X, Y, dmus=members[l], reference=members[l + 1],
+                              returns=returns, epsilon=epsilon, solver=solver, strict=False)
+            with np.errstate(divide='ignore'):
+                attractiveness[members[l]] = np.nan_to_num(1 / below.theta - 1, nan=0.0, posinf=0.0)
+        if l > 1:
+            above = solve_dea(X, Y, dmus=members[l], reference=members[l - 1],
+                              returns=returns, epsilon=epsilon, solver=solver, strict=False)
+            progress[members[l]] = np.nan_to_num(above.theta - 1, nan=0.0)
+    return np.maximum(attractiveness, 0), np.maximum(progress, 0)
+
+
+# Proximity omega between every student of one layer (rows) and every student
+# of the layer above (columns), as in the README:
+#   omega = sum_i a_i |x_i0 - x_ij| - sum_r a_r |y_r0 - y_rj|
+# on range-scaled data with equal weights a = 1/m and 1/s by default
+def proximity(X_a, Y_a, X_b, Y_b, alpha_in=None, alpha_out=None):
+    alpha_in = np.full(X_a.shape[1], 1 / X_a.shape[1]) if alpha_in is None else alpha_in
+    alpha_out = np.full(Y_a.shape[1], 1 / Y_a.shape[1]) if alpha_out is None else alpha_out
+    omega = np.abs(X_a[:, None, :] - X_b[None, :, :]) @ alpha_in
+    omega -= np.abs(Y_a[:, None, :] - Y_b[None, :, :]) @ alpha_out
+    return omega
+
+
+# Minimum-obstruction paths for every student of a stratified cluster in one
+# dynamic-programming pass over the layered DAG: layer l only links to layer
+# l - 1, so cost(j) = min_k H(j, k) + cost(k) is one vectorized min over the
+# (|E_l| x |E_l-1|) obstruction matrix per layer, top layer first.
+def obstruction_paths(X, Y, layers, returns='crs', epsilon=EPSILON, solver='auto',
+                      alpha_in=None, alpha_out=None):
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    layers = np.asarray(layers)
+    n = len(X)
+
+    attractiveness, progress = layer_scores(X, Y, layers, returns, epsilon, solver)
+
+    # Proximity is measured on range-scaled features
+    def scale(M):
+        span = M.max(axis=0) - M.min(axis=0) if len(M) else np.ones(M.shape[1])
+        return np.divide(M - M.min(axis=0, initial=0), span, out=np.zeros_like(M), where=span != 0)
+    Xs, Ys = scale(X), scale(Y)
+
+    cost = np.zeros(n)
+    next_hop = np.full(n, -1, dtype=np.int64)
+    n_layers = int(layers.max()) if n else 0
+    above = np.flatnonzero(layers == 1)
+    for l in range(2, n_layers + 1):
+        current = np.flatnonzero(layers == l)
+        omega = proximity(Xs[current], Ys[current], Xs[above], Ys[above], alpha_in, alpha_out)
+        # A non-positive omega means the peer is no closer a reference: no edge
+        H = np.full(omega.shape, np.inf)
+        np.divide(np.broadcast_to((attractiveness[above] + progress[above])[None, :], omega.shape), omega,
+                  out=H, where=omega > 0)
+        total = H + cost[above][None, :]
+        best = total.argmin(axis=1)
+        cost[current] = total[np.arange(len(current)), best]
+        next_hop[current] = np.where(np.isfinite(cost[current]), above[best], -1)
+        above = current
+    return PathResult(cost, next_hop, attractiveness, progress)
+
+
+# Path of student j from its own layer up to layer 1, as row indices
+def reconstruct_path(next_hop, j):
+    path = []
+    j = next_hop[j]
+    while j >= 0:
+        path.append(int(j))
+        j = next_hop[j]
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimum-obstruction improvement paths for inefficient students.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--clusters', type=int, default=3)
+    args = parser.parse_args()
+
+    from clustering import fit_kmedoids
+    from feature_store import load_quantified
+    from gower_distance import prepare_gower_features
+    from stratification import stratify_clusters
+
+    table = load_quantified(args.data_dir)
+    labels = fit_kmedoids(prepare_gower_features(table.frame()), args.clusters).labels
+    X, marks, roll_numbers = table.inputs, table.marks, table.roll_numbers
+
+    for cluster, (rows, strata) in stratify_clusters(X, marks, labels).items():
+        result = obstruction_paths(X[rows], marks[rows], strata.layers)
+        print(f"Cluster {cluster}:")
+        for j in np.flatnonzero(strata.layers > 1):
+            if not np.isfinite(result.cost[j]):
+                print(f"  {roll_numbers[rows[j]]} (layer {strata.layers[j]}): no finite path (no peer above has positive proximity)")
+                continue
+            path = [roll_numbers[rows[k]] for k in reconstruct_path(result.next_hop, j)]
+            print(f"  {roll_numbers[rows[j]]} (layer {strata.layers[j]}): "
+                  f"{' -> '.join(map(str, path))}  H = {result.cost[j]:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import time
+
+import numpy as np
+
+from encoding import UNKNOWN
+
+
+# Exact nearest-peer search over encoded questionnaires plus marks. Answers are
+# stored question-major as int8 codes, so the Hamming distance of a query to
+# every student (the number of questions answered differently) is one int8
+# comparison per question accumulated in place. The distance is Gower-like:
+#   (mismatched questions + |marks difference| / marks range) / compared features
+# Only questions the query answered are compared (a peer's UNKNOWN answer is a
+# mismatch). Mismatch counts are small integers, so the k nearest are found by
+# a bincount threshold first and exact distances are only computed for the few
+# candidates under it. Students are appended in place (amortized growth), so
+# a new student is searchable as soon as they are added; the marks range
+# widens to cover them, and a query's scaled marks difference is capped at 1
+# (as for a Gower feature), which keeps the threshold exact.
+class PeerIndex:
+    def __init__(self, n_questions, courses, marks_range=1.0, capacity=1024):
+        self.n_questions = n_questions
+        self.courses = list(courses)
+        self.course_ids = {c: i for i, c in enumerate(self.courses)}
+        self.marks_range = float(marks_range) or 1.0
+        self._marks_low = np.inf
+        self._marks_high = -np.inf
+        self.size = 0
+        self._codes = np.full((n_questions, capacity), UNKNOWN, dtype=np.int8)
+        self._marks = np.full(capacity, np.nan, dtype=np.float32)
+        self._roll_numbers = np.full(capacity, -1, dtype=np.int64)
+        self._taken = np.zeros((capacity, (len(self.courses) + 7) // 8), dtype=np.uint8)
+
+    # codes: (students x questions) QuestionEncoder codes; taken: packed course
+    # bitsets in CoursePopularityIndex layout (e.g. its taken_bits_)
+    @classmethod
+    def build(cls, codes, marks, courses, taken=None, roll_numbers=None):
+        codes = np.atleast_2d(codes)
+        marks = np.asarray(marks, dtype=np.float32)
+        finite = marks[np.isfinite(marks)]
+        marks_range = float(finite.max() - finite.min()) if len(finite) else 1.0
+        index = cls(codes.shape[1], courses, marks_range, capacity=max(len(codes), 1))
+        index.add(codes, marks, taken, roll_numbers)
+        return index
+
+    def _grow(self, needed):
+        capacity = len(self._marks)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity)
+        codes = np.full((self.n_questions, capacity), UNKNOWN, dtype=np.int8)
+        codes[:, :self.size] = self._codes[:, :self.size]
+        marks = np.full(capacity, np.nan, dtype=np.float32)
+        marks[:self.size] = self._marks[:self.size]
+        roll_numbers = np.full(capacity, -1, dtype=np.int64)
+        roll_numbers[:self.size] = self._roll_numbers[:self.size]
+        taken = np.zeros((capacity, self._taken.shape[1]), dtype=np.uint8)
+        taken[:self.size] = self._taken[:self.size]
+        self._codes, self._marks, self._roll_numbers, self._taken = codes, marks, roll_numbers, taken
+
+    # Append students; returns their row positions
+    def add(self, codes, marks, taken=None, roll_numbers=None):
+        codes = np.atleast_2d(np.asarray(codes, dtype=np.int8))
+        n = len(codes)
+        self._grow(self.size + n)
+        rows = slice(self.size, self.size + n)
+        self._codes[:, rows] = codes.T
+        self._marks[rows] = np.broadcast_to(np.asarray(marks, dtype=np.float32), n)
+        finite = self._marks[rows][np.isfinite(self._marks[rows])]
+        if len(finite):
+            self._marks_low = min(self._marks_low, float(finite.min()))
+            self._marks_high = max(self._marks_high, float(finite.max()))
+            self.marks_range = max(self.marks_range, self._marks_high - self._marks_low)
+        if taken is not None:
+            self._taken[rows] = taken
+        if roll_numbers is not None:
+            self._roll_numbers[rows] = roll_numbers
+        self.size += n
+        return np.arange(rows.start, rows.stop)
+
+    def mismatches(self, codes):
+        codes = np.asarray(codes).ravel()
+        total = np.zeros(self.size, dtype=np.uint8)
+        for q in np.flatnonzero(codes != UNKNOWN):
+            total += self._codes[q, :self.size] != codes[q]
+        return total
+
+    def _distance(self, mismatches, rows, codes, mark):
+        distances = mismatches.astype(np.float32)
+        n_features = np.full(len(mismatches), np.float32((np.asarray(codes) != UNKNOWN).sum()))
+        if np.isfinite(mark):
+            delta = np.minimum(np.abs(self._marks[rows] - np.float32(mark)) / np.float32(self.marks_range), 1)
+            known = np.isfinite(delta)
+            distances += np.where(known, delta, 0)
+            n_features += known
+        return np.divide(distances, n_features, out=np.ones_like(distances), where=n_features > 0)
+
+    # Distance of the query to every indexed student
+    def distances(self, codes, mark=np.nan):
+        return self._distance(self.mismatches(codes), slice(0, self.size), codes, mark)
+
+    # Rows and distances of the k nearest students, nearest first (ties by row)
+    def nearest(self, codes, mark=np.nan, k=10):
+        k = min(k, self.size)
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        mismatches = self.mismatches(codes)
+        # t: fewest mismatches that still leaves k students at or under it. The
+        # marks term adds less than one mismatch, so nobody beyond t + 1 can
+        # enter the top k
+        t = int(np.searchsorted(np.cumsum(np.bincount(mismatches)), k))
+        bound = t + 1 if np.isfinite(mark) else t
+        rows = np.flatnonzero(mismatches <= bound)
+        distances = self._distance(mismatches[rows], rows, codes, mark)
+        best = np.lexsort((rows, distances))[:k]
+        return rows[best], distances[best]
+
+    # Top-N courses among the k nearest peers, each peer's courses weighted by
+    # 1 - distance; courses in taken (names) are skipped
+    def recommend(self, codes, mark=np.nan, k=10, top_n=3, taken=()):
+        rows, distances = self.nearest(codes, mark, k)
+        peer_taken = np.unpackbits(self._taken[rows], axis=1, count=len(self.courses)).astype(np.float32)
+        scores = (1 - distances) @ peer_taken
+        for course in taken:
+            if course in self.course_ids:
+                scores[self.course_ids[course]] = 0
+        order = np.argsort(-scores, kind='stable')[:top_n]
+        return [self.courses[i] for i in order if scores[i] > 0]
+
+    @property
+    def roll_numbers(self):
+        return self._roll_numbers[:self.size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time nearest-peer queries on synthetic students.")
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=14)
+    parser.add_argument('--options', type=int, default=5)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--k', type=int, default=25)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, args.options, (args.students, args.questions))
+    marks = rng.uniform(4, 10, args.students)
+    taken = np.packbits(rng.random((args.students, args.courses)) < 0.04, axis=1)
+    courses = [f'C{i}' for i in range(args.courses)]
+
+    start = time.perf_counter()
+    index = PeerIndex.build(codes, marks, courses, taken)
+    print(f"Indexed {args.students} students in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    queries = rng.integers(0, args.options, (args.queries, args.questions))
+    start = time.perf_counter()
+    for q in queries:
+        index.recommend(q, 7.5, args.k)
+    print(f"k={args.k} peer recommendation: {(time.perf_counter() - start) / args.queries * 1000:.3f} ms per query")
+
+    start = time.perf_counter()
+    for q in queries:
+        index.add(q[None, :], 7.5)
+    print(f"Incremental insert: {(time.perf_counter() - start) / args.queries * 1e6:.1f} us per student")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import os
+
+from incidence import align_incidence, load_course_incidence
+from instrument import stage
+from loader import load_student_table
+
+categorical_columns = [
+    'Interest in Subjects: How interested are you in exploring new subjects?',
+    'Skill Development: How important is skill development in your choice of electives?',
+    'Preferred Learning Method: Which learning method do you prefer?',
+    'Time Commitment: How many hours per week can you dedicate to a subject?',
+    'Exam Preparation: How do you usually prepare for exams?',
+    'Mock Test Participation: How often do you take mock tests?',
+    'Psychological State Before Tests: How do you feel before taking an exam?',
+    'Time Management: How do you plan to manage the workload?',
+    'Career Goals: How important is alignment with career goals in choosing a Subject?',
+    'Learning Motivation: What motivates you to choose a Subject?',
+    'Peer Influence: Would you consider a subject because your peers are choosing it?',
+    'Feedback from Seniors: Have you received feedback from seniors about your course in general?',
+    'Resource Availability: Do you have access to necessary resources for Subjects?',
+    'Future Studies: Are you planning further studies in any area?'
+]
+
+# Declared model inputs: the questionnaire answers and marks. Identifiers
+# (Submission ID, Name, Roll No.) and courses are never distance features.
+feature_columns = categorical_columns + ['marks']
+
+
+# Same preprocessing as oldUser.py, packaged for the model build step.
+# Returns the Gower-ready feature frame (without course columns), roll
+# numbers, the aligned CourseIncidence and the fitted QuestionEncoder holding
+# every question's vocabulary. The merged table comes from the loader cache;
+# stats (a stats_store.QuestionnaireStats) supplies the dispersion in-process.
+def prepare_training_data(data_dir='.', stats=None):
+    table = load_student_table(data_dir, stats=stats)
+    with stage('load_courses'):
+        incidence = load_course_incidence(os.path.join(data_dir, 'courses.csv'))
+    with stage('features') as timer:
+        gower_ready_df, roll_numbers, incidence = training_features(table.frame, incidence)
+        timer.size('features', gower_ready_df)
+        timer.size('incidence', incidence.matrix)
+    return gower_ready_df, roll_numbers, incidence, table.encoder
+
+
+# Quantified (y_k) features instead of answer codes, for the build step: the
+# QuantifiedTable frame (a view of the float32 matrix the efficiency stage
+# reads, see feature_store), its roll numbers, the incidence aligned to them
+# (students without courses get an empty set) and the QuantifiedFeatureStore
+def quantified_training_data(data_dir='.'):
+    from feature_store import QuantifiedFeatureStore, load_quantified
+
+    store = QuantifiedFeatureStore.from_csv(os.path.join(data_dir, 'quantified_results.csv'))
+    table = load_quantified(data_dir, store)
+    incidence = align_incidence(load_course_incidence(os.path.join(data_dir, 'courses.csv')), table.roll_numbers)
+    return table.frame(), table.roll_numbers, incidence, store
+
+
+# One row per student with a course enrollment: the declared feature columns
+# (see student_level), roll numbers and the incidence aligned to them
+def training_features(response_df, incidence):
+    response_df = response_df[response_df['Roll No.(8 Digits)'].isin(incidence.roll_numbers)]
+    return student_level(response_df, incidence)
+
+
+# Normalized student-level model input from the merged table (one row per
+# enrolled course): one row per student with only the declared feature
+# columns, missing numeric values filled with the column mean, and the
+# courses aggregated into the incidence rows aligned to the roll numbers.
+# Students without courses are kept with an empty course set.
+def student_level(response_df, incidence, columns=None):
+    students = response_df.drop_duplicates('Roll No.(8 Digits)').reset_index(drop=True)
+    features = students[feature_columns if columns is None else list(columns)]
+    features = features.fillna(features.mean(numeric_only=True))
+    roll_numbers = students['Roll No.(8 Digits)'].to_numpy()
+    return features, roll_numbers, align_incidence(incidence, roll_numbers)
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+# Row position of every query key in keys (-1 when absent), via one sort + searchsorted
+def lookup_rows(keys, queries, order=None):
+    keys = np.asarray(keys)
+    queries = np.asarray(queries)
+    rows = np.full(len(queries), -1, dtype=np.int64)
+    if len(keys) == 0:
+        return rows
+    if order is None:
+        order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, queries), len(keys) - 1)
+    found = sorted_keys[pos] == queries
+    rows[found] = order[pos[found]]
+    return rows
+
+
+# One packed bitset row per student of the courses they took, from raw CSR
+# parts (row pointers and column ids); bit i of a row is course id i
+def packed_bits(indptr, ids, n_courses):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    bits = np.zeros((len(indptr) - 1, (n_courses + 7) // 8), dtype=np.uint8)
+    np.bitwise_or.at(bits, (rows, ids >> 3), (0x80 >> (ids & 7)).astype(np.uint8))
+    return bits
+
+
+# Precomputed per-cluster course popularity.
+#   ranked_[c]        course ids of cluster c, most popular first
+#   ranked_counts_[c] matching enrollment counts
+#   taken_bits_       one packed bitset row per student of the courses they took
+# A recommendation is then a masked top-N over the cluster's ranked array:
+# already-taken courses are dropped before cutting to top_n, so a student gets
+# top_n results whenever their cluster has that many untaken courses.
+class CoursePopularityIndex:
+    def __init__(self, courses, ranked, ranked_counts, taken_bits):
+        self.courses = list(courses)
+        self.course_ids = {c: i for i, c in enumerate(self.courses)}
+        self.ranked_ = ranked
+        self.ranked_counts_ = ranked_counts
+        self.taken_bits_ = taken_bits
+        self._max_taken = None
+
+    @classmethod
+    def from_csr(cls, labels, indptr, ids, courses, n_clusters):
+        labels = np.asarray(labels)
+        n_courses = len(courses)
+        rows = np.repeat(np.arange(len(labels)), np.diff(indptr))
+
+        # Enrollment counts per (cluster, course) in one bincount
+        counts = np.bincount(labels[rows] * n_courses + ids, minlength=n_clusters * n_courses)
+        counts = counts.reshape(n_clusters, n_courses).astype(np.int32)
+        ranked = np.argsort(-counts, axis=1, kind='stable').astype(np.int32)
+        ranked_counts = np.take_along_axis(counts, ranked, axis=1)
+        return cls(courses, ranked, ranked_counts, packed_bits(indptr, ids, n_courses))
+
+    # From a students x courses CSR matrix (e.g. incidence.CourseIncidence.matrix)
+    @classmethod
+    def from_incidence(cls, labels, matrix, courses, n_clusters):
+        matrix = matrix.tocsr()
+        return cls.from_csr(labels, matrix.indptr, matrix.indices.astype(np.int64), courses, n_clusters)
+
+    # Enrollment counts as a dense (clusters x courses) array, in course id order
+    def cluster_counts(self):
+        counts = np.zeros(self.ranked_.shape, dtype=np.int32)
+        np.put_along_axis(counts, np.asarray(self.ranked_, dtype=np.int64), self.ranked_counts_, axis=1)
+        return counts
+
+    def taken_mask(self, row):
+        return np.unpackbits(self.taken_bits_[row], count=len(self.courses)).astype(bool)
+
+    def mask_from_courses(self, courses_taken):
+        mask = np.zeros(len(self.courses), dtype=bool)
+        for c in courses_taken:
+            if c in self.course_ids:
+                mask[self.course_ids[c]] = True
+        return mask
+
+    # Top-N course ids of a cluster, skipping courses set in taken_mask
+    def top_n_ids(self, cluster, taken_mask=None, top_n=3):
+        ranked = self.ranked_[cluster]
+        keep = self.ranked_counts_[cluster] > 0
+        if taken_mask is not None:
+            keep &= ~taken_mask[ranked]
+        return ranked[keep][:top_n]
+
+    def recommend(self, cluster, taken_mask=None, top_n=3):
+        return [self.courses[i] for i in self.top_n_ids(cluster, taken_mask, top_n)]
+
+    def recommend_for_row(self, row, cluster, top_n=3):
+        return self.recommend(cluster, self.taken_mask(row), top_n)
+
+    # Most courses any single student has taken; bounds how far down a ranking
+    # the first top_n untaken courses can be
+    def max_taken(self):
+        if self._max_taken is None:
+            popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+            self._max_taken = int(popcount[self.taken_bits_].sum(axis=1).max()) if len(self.taken_bits_) else 0
+        return self._max_taken
+
+    # Dense (students x top_n) course ids for a whole cohort, -1 where a student
+    # has fewer than top_n untaken courses. Per-student work is array gathers
+    # over the first top_n + max_taken() ranked courses only, done in chunks.
+    def top_n_ids_batch(self, rows, clusters, top_n=3, chunk_size=8192):
+        rows = np.asarray(rows)
+        clusters = np.asarray(clusters)
+        width = min(len(self.courses), top_n + self.max_taken())
+        out = np.full((len(rows), top_n), -1, dtype=np.int32)
+        for start in range(0, len(rows), chunk_size):
+            stop = start + chunk_size
+            ranked = self.ranked_[clusters[start:stop], :width]
+            keep = self.ranked_counts_[clusters[start:stop], :width] > 0
+            chunk_rows = rows[start:stop]
+            known = chunk_rows >= 0
+            if known.any():
+                # Test each ranked course's bit in the student's packed bitset
+                bits = self.taken_bits_[chunk_rows[known][:, None], ranked[known] >> 3]
+                taken = (bits >> (7 - (ranked[known] & 7))) & 1
+                keep[known] &= taken == 0
+            # Stable argsort of ~keep moves the first top_n kept positions to the front
+            first = np.argsort(~keep, axis=1, kind='stable')[:, :top_n]
+            ids = np.take_along_axis(ranked, first, axis=1)
+            out[start:stop, :ids.shape[1]] = np.where(np.take_along_axis(keep, first, axis=1), ids, -1)
+        return out
+
+    # (students x courses) taken masks of the given rows; unknown rows (-1) are empty
+    def taken_masks(self, rows):
+        rows = np.asarray(rows)
+        masks = np.unpackbits(self.taken_bits_[np.maximum(rows, 0)], axis=1, count=len(self.courses)).astype(bool)
+        masks[rows < 0] = False
+        return masks
+
+    def course_names(self, ids):
+        names = np.array(self.courses + [None], dtype=object)
+        return names[ids]
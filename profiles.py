@@ -0,0 +1,177 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+# Unique (answers, numeric buckets) rows of prepared Gower features (see
+# prepare_gower_features); course sets are not part of the key:
+#   representatives: first student row of every profile
+#   counts:          students per profile (the k-medoids weights)
+#   inverse:         profile of every student
+#   ids:             (table groups x profiles) index into each group's tables
+#   tables:          per group, weighted distance between its value combinations
+#   present:         per group, weight observed on both sides (None without missing values)
+#   sets:            mean course vector of each profile's students, dense when small (or None)
+#   set_sizes:       mean course count of each profile's students
+Profiles = namedtuple('Profiles', ['representatives', 'counts', 'inverse', 'ids', 'tables', 'present',
+                                   'sets', 'set_sizes', 'prep'])
+
+
+# Distinct values of one feature column: (value id per row, value table)
+# Missing values get id 0 and a NaN value.
+def _feature_values(column):
+    missing = np.isnan(column)
+    values, ids = np.unique(column[~missing], return_inverse=True)
+    row_ids = np.zeros(len(column), dtype=np.int64)
+    row_ids[~missing] = ids + 1
+    return row_ids, np.concatenate([[np.nan], values])
+
+
+# Numeric features with more than n_buckets distinct values are cut into
+# n_buckets equal-width buckets of their [0, 1] scaled range and compared by
+# bucket centre (marks, for instance); the rest are kept exact.
+def _quantize(prep, n_buckets):
+    num = (prep['num'].astype(np.float64) - prep['num_min']) * prep['num_scale']
+    for f in range(num.shape[1]):
+        column = num[:, f]
+        if len(np.unique(column[~np.isnan(column)])) > n_buckets:
+            bucket = np.minimum(np.floor(column * n_buckets), n_buckets - 1)
+            num[:, f] = np.where(np.isnan(column), np.nan, (bucket + 0.5) / n_buckets)
+    return num
+
+
+# Features whose value tables are small are fused into one table over their
+# value combinations (weights folded in), up to max_size entries per side, so
+# a profile pair costs one lookup per group instead of one per question
+def _fuse(ids, tables, present, weights, max_size=256):
+    groups = []
+    for f in np.argsort([len(t) for t in tables], kind='stable'):
+        size = len(tables[f])
+        if groups and groups[-1][0] * size <= max_size:
+            groups[-1][0] *= size
+            groups[-1][1].append(f)
+        else:
+            groups.append([size, [f]])
+
+    fused_ids, fused_tables, fused_present = [], [], []
+    for size, members in groups:
+        group_ids = np.zeros(len(ids[0]), dtype=np.int64)
+        table = np.zeros((1, 1), dtype=np.float32)
+        observed = np.zeros((1, 1), dtype=np.float32)
+        for f in members:
+            v = len(tables[f])
+            group_ids = group_ids * v + ids[f]
+            table = (table[:, None, :, None] + weights[f] * tables[f][None, :, None, :]).reshape(len(table) * v, -1)
+            observed = (observed[:, None, :, None] + weights[f] * present[f][None, :, None, :]).reshape(len(table), -1)
+        fused_ids.append(group_ids)
+        fused_tables.append(table.astype(np.float32))
+        fused_present.append(observed.astype(np.float32))
+    return np.array(fused_ids, dtype=np.intp).reshape(len(groups), -1), fused_tables, fused_present
+
+
+# Collapse students into unique (answers, numeric buckets) profiles with
+# multiplicity counts. Each feature gets a small table of distances between
+# its distinct values, so profile distances are table lookups. Course sets
+# differ inside a profile, so each profile carries its students' mean course
+# vector: the hamming course term between two profiles is then the exact mean
+# over their student pairs (jaccard takes the same means, as an approximation).
+def unique_profiles(prep, n_buckets=20):
+    num = _quantize(prep, n_buckets)
+    columns, tables, present = [], [], []
+    for f in range(num.shape[1]):
+        row_ids, values = _feature_values(num[:, f])
+        columns.append(row_ids)
+        tables.append(np.abs(values[:, None] - values[None, :]).astype(np.float32))
+    for f in range(prep['cat'].shape[1]):
+        codes = prep['cat'][:, f].astype(np.float64)
+        row_ids, values = _feature_values(np.where(codes < 0, np.nan, codes))
+        columns.append(row_ids)
+        tables.append((values[:, None] != values[None, :]).astype(np.float32))
+    for table in tables:
+        observed = np.ones(len(table), dtype=bool)
+        observed[0] = False
+        present.append((observed[:, None] & observed[None, :]).astype(np.float32))
+        table[~(observed[:, None] & observed[None, :])] = 0
+
+    keys = np.stack(columns, axis=1) if columns else np.zeros((len(num), 0), dtype=np.int64)
+    radix = keys.max(axis=0) + 1 if len(keys) else np.ones(keys.shape[1], dtype=np.int64)
+    if np.sum(np.log2(radix.astype(np.float64))) < 62:
+        # Mixed-radix code of the whole row: one int64 per student
+        strides = np.concatenate([np.cumprod(radix[::-1])[::-1][1:], [1]]).astype(np.int64)
+        _, first, inverse, counts = np.unique(keys @ strides, return_index=True, return_inverse=True,
+                                              return_counts=True)
+    else:
+        _, first, inverse, counts = np.unique(keys, axis=0, return_index=True, return_inverse=True,
+                                              return_counts=True)
+
+    n_features = num.shape[1] + prep['cat'].shape[1]
+    weights = np.concatenate([prep['weight_num'], prep['weight_cat']]).astype(np.float32)
+    ids, tables, present = _fuse([keys[first, f] for f in range(n_features)], tables, present, weights)
+
+    inverse = inverse.ravel()
+    sets, set_sizes = prep.get('sets'), None
+    if sets is not None:
+        members = sparse.csr_matrix((1.0 / counts[inverse], (inverse, np.arange(len(inverse)))),
+                                    shape=(len(counts), len(inverse)), dtype=np.float32)
+        sets = (members @ sets.astype(np.float32)).tocsr()
+        set_sizes = np.bincount(inverse, weights=prep['set_sizes'], minlength=len(counts)) / counts
+        # Few courses: a dense product is much cheaper than a sparse one
+        if sets.shape[0] * sets.shape[1] <= 50_000_000:
+            sets = sets.toarray()
+    return Profiles(
+        representatives=first,
+        counts=counts,
+        inverse=inverse,
+        ids=ids,
+        tables=tables,
+        present=present if prep['has_missing'] else None,
+        sets=sets,
+        set_sizes=None if set_sizes is None else set_sizes.astype(np.float32),
+        prep=prep,
+    )
+
+
+# Gower distances between two selections of profiles, as gower_between does
+# for students, with every feature looked up in its value table
+def profile_between(profiles, rows, cols):
+    ids_a, ids_b = profiles.ids[:, rows], profiles.ids[:, cols]
+    prep = profiles.prep
+    total = np.zeros((ids_a.shape[1], ids_b.shape[1]), dtype=np.float32)
+    present_weight = None if profiles.present is None else np.zeros_like(total)
+    # Columns are gathered once per table, then every row is a contiguous copy
+    for g, table in enumerate(profiles.tables):
+        total += np.take(table[:, ids_b[g]], ids_a[g], axis=0)
+        if present_weight is not None:
+            present_weight += np.take(profiles.present[g][:, ids_b[g]], ids_a[g], axis=0)
+
+    if profiles.sets is not None:
+        sets = profiles.sets
+        shared = sets[rows] @ sets[cols].T
+        shared = shared.toarray() if hasattr(shared, 'toarray') else shared
+        size_a = profiles.set_sizes[rows][:, None]
+        size_b = profiles.set_sizes[cols][None, :]
+        if prep['set_metric'] == 'hamming':
+            total += prep['set_weight'] * (size_a + size_b - 2 * shared)
+        else:
+            union = size_a + size_b - shared
+            total += prep['set_weight'] * np.divide(union - shared, union, out=np.zeros_like(union), where=union > 0)
+        if present_weight is not None:
+            present_weight += np.float32(prep['set_block_weight'])
+
+    if present_weight is None:
+        return total / np.float32(prep['weight_sum']) if prep['weight_sum'] else total
+    return np.divide(total, present_weight, out=np.ones_like(total), where=present_weight > 0)
+
+
+# Full (profiles x profiles) Gower matrix in float32 row blocks; only the
+# upper triangle is computed and mirrored
+def profile_matrix(profiles, block_rows=256):
+    n = len(profiles.counts)
+    matrix = np.empty((n, n), dtype=np.float32)
+    for r0 in range(0, n, block_rows):
+        r1 = min(r0 + block_rows, n)
+        tile = profile_between(profiles, slice(r0, r1), slice(r0, n))
+        matrix[r0:r1, r0:] = tile
+        matrix[r0:, r0:r1] = tile.T
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
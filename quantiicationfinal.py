@@ -1,53 +1,73 @@
 import csv
 from collections import Counter
 
+from degreeofDispersionFinal import dispersion_rows, write_dispersion
+
 # Input and Output File Paths
 input_file = 'response.csv'       # Your original questionnaire CSV
 output_file = 'quantified_results.csv'  # Output CSV with y_k values
+dispersion_file = 'dispersion_results.csv'  # Output CSV with std dev per question
+
+
+# Single pass over the responses: one Counter per question, updated row by row,
+# so memory stays constant however large the export is. Empty cells are
+# skipped in place, so later answers stay aligned with their own question.
+def count_options(input_file):
+    with open(input_file, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)  # Header row
+        question_titles = header[4:]
+        option_counts = [Counter() for _ in question_titles]
+        for row in reader:
+            if len(row) > 4:
+                for counts, cell in zip(option_counts, row[4:]):
+                    cell = cell.strip()
+                    if cell:
+                        # Only the first letter (option) of each answer, lowercased
+                        counts[cell[0].lower()] += 1
+    return question_titles, option_counts
+
+
+# Cumulative-percentage y_k rows for every question
+def quantified_rows(question_titles, option_counts):
+    output_rows = []
+    for q_index, (question_title, counts) in enumerate(zip(question_titles, option_counts)):
+        total_responses = sum(counts.values())
+        if total_responses == 0:
+            continue
+
+        # Sort options alphabetically: a, b, c, ...
+        sorted_options = sorted(counts.keys())
+
+        # Calculate percentages
+        percentages = [(counts[opt] / total_responses) * 100 for opt in sorted_options]
+
+        # Calculate cumulative y_k
+        y_values = []
+        cumulative = 0
+        for percent in percentages:
+            cumulative += percent
+            y_values.append(cumulative)
+
+        # Store results in reverse order (from least to most preferred)
+        for opt, y_k in zip(sorted_options[::-1], y_values[::-1]):
+            output_rows.append((f"Q{q_index + 1}", question_title, opt.upper(), f"{y_k:.2f}"))
+    return output_rows
+
+
+def write_quantified(output_rows, output_file):
+    with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(("Question Number", "Question Title", "Option", "Assigned y_k (%)"))
+        writer.writerows(output_rows)
+
+
+if __name__ == '__main__':
+    question_titles, option_counts = count_options(input_file)
+    output_rows = quantified_rows(question_titles, option_counts)
+    write_quantified(output_rows, output_file)
+    print(f"\n✅ Quantified results written to '{output_file}' successfully!")
 
-all_responses = []
-
-# Read and clean responses
-with open(input_file, 'r', encoding='utf-8-sig') as file:
-    reader = csv.reader(file)
-    header = next(reader)  # Header row
-    for row in reader:
-        if len(row) > 4:
-            # Extract only the first letter (option) from each answer, lowercased
-            cleaned = [cell.strip()[0].lower() for cell in row[4:] if cell.strip()]
-            all_responses.append(cleaned)
-
-# Transpose to get columns (i.e., questions)
-question_columns = list(zip(*all_responses))
-
-# Prepare data for output
-output_rows = [("Question Number", "Question Title", "Option", "Assigned y_k (%)")]
-
-for q_index, responses in enumerate(question_columns):
-    option_counts = Counter(responses)
-    total_responses = sum(option_counts.values())
-    question_title = header[q_index + 4]
-
-    # Sort options alphabetically: a, b, c, ...
-    sorted_options = sorted(option_counts.keys())
-    
-    # Calculate percentages
-    percentages = [(option_counts[opt] / total_responses) * 100 for opt in sorted_options]
-
-    # Calculate cumulative y_k
-    y_values = []
-    cumulative = 0
-    for percent in percentages:
-        cumulative += percent
-        y_values.append(cumulative)
-
-    # Store results in reverse order (from least to most preferred)
-    for opt, y_k in zip(sorted_options[::-1], y_values[::-1]):
-        output_rows.append((f"Q{q_index + 1}", question_title, opt.upper(), f"{y_k:.2f}"))
-
-# Write to CSV
-with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
-    writer = csv.writer(f_out)
-    writer.writerows(output_rows)
-
-print(f"\n✅ Quantified results written to '{output_file}' successfully!")
+    # Feed the std-dev step directly, without reading the file back
+    write_dispersion(dispersion_rows(output_rows), dispersion_file)
+    print(f"✅ Degree of dispersion results written to '{dispersion_file}' successfully!")
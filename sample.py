@@ -1,33 +1,16 @@
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import LabelEncoder
-from sklearn_extra.cluster import KMedoids
-from gower import gower_matrix
-
-# Load CSV Files
-dispersion_df = pd.read_csv('dispersion.csv')
-marks_df = pd.read_csv('marks.csv')
-courses_df = pd.read_csv('courses.csv')
-response_df = pd.read_csv('response.csv')
-
-# Rename for consistency
-marks_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-courses_df.rename(columns={'roll no': 'Roll No.(8 Digits)'}, inplace=True)
-
-# Merge marks and courses with response data based on Roll No
-response_df = response_df.merge(marks_df, how='left', on='Roll No.(8 Digits)')
-response_df = response_df.merge(courses_df, how='left', on='Roll No.(8 Digits)')
-
-# Merge degree of dispersion for specific question
-dispersion_df.set_index('Question Title', inplace=True)
-response_df = response_df.join(
-    dispersion_df[['Degree of Dispersion (Std Dev)']],
-    on='Interest in Subjects: How interested are you in exploring new subjects?',
-    rsuffix='_dispersion'
-)
-
-# Encode categorical responses
-encoder = LabelEncoder()
+from loader import load_student_table
+from incidence import align_incidence, load_course_incidence
+from engine import RecommenderEngine
+
+# Load the merged response x marks x courses table (built once, then cached);
+# question columns arrive as int8 codes of each question's vocabulary
+table = load_student_table()
+response_df = table.frame
+encoder = table.encoder
+dispersion = table.dispersion  # degree of dispersion per question title
+
+# Questionnaire columns (compared as categories)
 categorical_columns = [
     'Interest in Subjects: How interested are you in exploring new subjects?',
     'Skill Development: How important is skill development in your choice of electives?',
@@ -45,54 +28,28 @@ categorical_columns = [
     'Future Studies: Are you planning further studies in any area?'
 ]
 
-for col in categorical_columns:
-    if col in response_df.columns:
-        response_df[col] = encoder.fit_transform(response_df[col].astype(str))
-
-# Prepare one-hot encoded course matrix
-course_matrix = response_df.groupby('Roll No.(8 Digits)')['course'].apply(lambda x: ', '.join(x.dropna())).reset_index()
-course_matrix['course'] = course_matrix['course'].apply(lambda x: x.split(', ') if x else [])
-course_matrix = course_matrix.set_index('Roll No.(8 Digits)')
-
-# One-hot encode courses
-course_onehot = course_matrix['course'].apply(pd.Series).stack().str.get_dummies().groupby(level=0).sum()
 
-# Set index for response_df for merge
-response_df = response_df.set_index('Roll No.(8 Digits)')
+# Student x course incidence (CSR, integer course ids) straight from courses.csv
+incidence = load_course_incidence('courses.csv')
 
-# Ensure unique indices before merging
-response_df = response_df[~response_df.index.duplicated(keep='first')]
-course_onehot = course_onehot[~course_onehot.index.duplicated(keep='first')]
+# One row per student; students without any enrolled course are left out
+response_df = response_df.drop_duplicates('Roll No.(8 Digits)').drop(columns='course')
+response_df = response_df[response_df['Roll No.(8 Digits)'].isin(incidence.roll_numbers)].reset_index(drop=True)
+incidence = align_incidence(incidence, response_df['Roll No.(8 Digits)'])
 
-# Align indices and merge
-common_index = response_df.index.intersection(course_onehot.index)
-response_df = response_df.loc[common_index]
-course_onehot = course_onehot.loc[common_index]
-response_df = pd.concat([response_df, course_onehot], axis=1).fillna(0)
+# Declared features only: the questionnaire answers and marks (identifiers
+# such as the roll number are never distance features)
+gower_ready_df = response_df[categorical_columns + ['marks']]
+gower_ready_df = gower_ready_df.fillna(gower_ready_df.mean())
 
-# Reset index for flat DataFrame
-response_df.reset_index(inplace=True)
-
-# Prepare numeric data for Gower distance
-gower_ready_df = response_df.select_dtypes(include=[np.number])
-
-# Compute Gower distance matrix
-gower_dist_matrix = gower_matrix(gower_ready_df)
-
-# Clustering using KMedoids
+# Fit the medoids once; new users are assigned to them without re-clustering
 n_clusters = 3
-kmedoids = KMedoids(n_clusters=n_clusters, metric="precomputed", random_state=42)
-kmedoids.fit(gower_dist_matrix)
+engine = RecommenderEngine(n_clusters=n_clusters, random_state=42, cat_columns=categorical_columns,
+                           course_metric='hamming')
+engine.fit(gower_ready_df, response_df['Roll No.(8 Digits)'], incidence)
 
 # Add cluster labels to DataFrame
-response_df['Cluster'] = kmedoids.labels_
-
-# Safe encoding for new user
-def safe_encode(encoder, response):
-    try:
-        return encoder.transform([response])[0]
-    except ValueError:
-        return encoder.fit([response]).transform([response])[0]
+response_df['Cluster'] = engine.labels_
 
 # New user data
 new_user_responses = {
@@ -114,80 +71,23 @@ new_user_responses = {
     'courses_taken': []  # New user, no courses taken yet
 }
 
-# Encode the new user's responses
-new_user_encoded = {}
-for col in new_user_responses:
-    if col in categorical_columns:
-        new_user_encoded[col] = safe_encode(encoder, new_user_responses[col])
-
-# Add the new user data to the response_df (as a new row)
-new_user_df = pd.DataFrame([new_user_encoded])
-response_df = pd.concat([response_df, new_user_df], ignore_index=True)
-
-# Prepare numeric data for Gower distance
-gower_ready_df = response_df.select_dtypes(include=[np.number])
-
-# Compute Gower distance matrix
-gower_dist_matrix = gower_matrix(gower_ready_df)
-
-# Re-cluster including the new user
-kmedoids.fit(gower_dist_matrix)
-response_df['Cluster'] = kmedoids.labels_
-
 # Function to recommend courses for the new user based on their cluster
 def recommend_courses_for_new_user(new_user_responses, top_n=3):
-    new_user_encoded = {}
-    for col in new_user_responses:
-        if col in categorical_columns:
-            new_user_encoded[col] = safe_encode(encoder, new_user_responses[col])
-
-    # Add the new user data to the response DataFrame
-    new_user_df = pd.DataFrame([new_user_encoded])
-    response_df = pd.concat([response_df, new_user_df], ignore_index=True)
-
-    # Now that the new user is part of the dataset, perform clustering and recommend courses
-    gower_ready_df = response_df.select_dtypes(include=[np.number])
-    gower_dist_matrix = gower_matrix(gower_ready_df)
-
-    kmedoids.fit(gower_dist_matrix)
-    response_df['Cluster'] = kmedoids.labels_
-
-    # Find the cluster of the new user (last added user)
-    new_user_cluster = response_df.iloc[-1]['Cluster']
+    # Whole-vocabulary lookup; answers outside it are encoded as UNKNOWN
+    new_user_df = pd.DataFrame(encoder.encode_records([new_user_responses]))
 
-    # Get other students in the same cluster
-    cluster_students = response_df[response_df['Cluster'] == new_user_cluster]
+    # Refit on schedule or once new users have drifted away from the medoids
+    if engine.needs_refit():
+        engine.refit()
 
-    # Get the courses taken by students in the same cluster
-    cluster_ids = cluster_students['Roll No.(8 Digits)']
-    cluster_courses_series = course_matrix.loc[course_matrix.index.isin(cluster_ids), 'course'].explode()
-    common_courses = cluster_courses_series.value_counts().head(top_n).index.tolist()
-
-    # Exclude courses already taken by the new user
-    student_courses = course_matrix.loc[new_user_df.index[0], 'course'] if new_user_df.index[0] in course_matrix.index else []
-    recommended_courses = [course for course in common_courses if course not in student_courses]
-
-    return recommended_courses[:top_n]
+    # Assign the new user to the nearest medoid (Gower distance to k medoids only)
+    student_courses = new_user_responses.get('courses_taken', [])
+    return engine.recommend_for_new_user(new_user_df, taken=student_courses, top_n=top_n)
 
 # Recommendation function
 def recommend_courses_based_on_cluster(student_id, top_n=3):
-    if student_id not in response_df['Roll No.(8 Digits)'].values:
-        return ["Student ID not found."]
-
-    student_row = response_df[response_df['Roll No.(8 Digits)'] == student_id]
-    student_cluster = student_row['Cluster'].values[0]
-    cluster_students = response_df[response_df['Cluster'] == student_cluster]
-
-    # Courses taken by students in the same cluster
-    cluster_ids = cluster_students['Roll No.(8 Digits)']
-    cluster_courses_series = course_matrix.loc[course_matrix.index.isin(cluster_ids), 'course'].explode()
-    common_courses = cluster_courses_series.value_counts().head(top_n).index.tolist()
-
-    # Exclude already taken by the student
-    student_courses = course_matrix.loc[student_id, 'course'] if student_id in course_matrix.index else []
-    recommended = [c for c in common_courses if c not in student_courses]
-
-    return recommended[:top_n]
+    # Masked top-N over the precomputed cluster ranking
+    return engine.recommend_for_student(student_id, top_n)
 
 # Example usage
 recommended_courses = recommend_courses_for_new_user(new_user_responses)
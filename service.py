@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from artifact import CURRENT, load_artifact
+from cache import ResultCache
+from instrument import count, metrics, stage
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Long-running recommendation service over a model artifact (see artifact.py):
+#   GET  /recommend/<roll_no>[?top_n=3]  existing student
+#   POST /recommend/new[?top_n=3]        questionnaire JSON (optional courses_taken)
+#   GET  /health                         served model version, batch and cache counters
+#   POST /reload                         load the artifact's CURRENT version now
+#   GET  /metrics                        stage timings and counters as Prometheus
+#                                        text (when RECSYS_METRICS is set, see instrument.py)
+# New-user requests arriving together are micro-batched: the batcher waits at
+# most max_wait seconds for up to max_batch requests and assigns them all in
+# one vectorized call. Repeat questionnaires are answered from the model's
+# result cache before they reach the batcher. The model is swapped by rebinding
+# self.model once a new version is fully loaded, so every request runs against
+# one consistent model; the swap hands the cache over emptied.
+class RecommendationService:
+    def __init__(self, model_path, max_batch=64, max_wait=0.002, watch_interval=2.0,
+                 cache_size=4096, cache_ttl=None):
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.watch_interval = watch_interval
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.model = load_artifact(model_path)
+        self.model.cache = self.cache
+        self._current_mtime = self._mtime()
+        self._queue = None
+        self.batches = 0
+        self.batched_requests = 0
+
+    def _mtime(self):
+        try:
+            return os.stat(os.path.join(self.model_path, CURRENT)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    # Load the version CURRENT points at in an executor thread, then swap it in
+    # on the event loop: the result cache is only ever touched from the loop
+    async def reload(self):
+        mtime = self._mtime()
+        model = await asyncio.get_running_loop().run_in_executor(None, load_artifact, self.model_path)
+        model.cache = self.cache
+        self.model = model
+        self.cache.clear()
+        self._current_mtime = mtime
+        return model.model_version
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self._mtime() != self._current_mtime:
+                await self.reload()
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            model = self.model
+            count('batched_requests', len(batch))
+            # Any failure goes to the requests still waiting; the batcher
+            # itself keeps running for the next batch
+            try:
+                with stage('serve_batch'):
+                    labels, _ = model.assign([responses for responses, _, _, _ in batch])
+                for (responses, top_n, key, future), label in zip(batch, labels):
+                    courses = model.recommend_for_cluster(label, responses.get('courses_taken', []), top_n)
+                    model.cache.put(key, (int(label), tuple(courses)))
+                    if not future.done():
+                        future.set_result({'cluster': int(label), 'courses': courses,
+                                           'model_version': model.model_version})
+                self.batches += 1
+                self.batched_requests += len(batch)
+            except Exception as error:  # noqa: BLE001 - reported to every waiting request
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def recommend_new(self, responses, top_n=3):
+        model = self.model
+        key = model.profile_key(responses, responses.get('courses_taken', []), top_n)
+        cached = model.cache.get(key)
+        count('new_user_cache_misses' if cached is None else 'new_user_cache_hits')
+        if cached is not None:
+            return {'cluster': cached[0], 'courses': list(cached[1]), 'model_version': model.model_version}
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((responses, top_n, key, future))
+        return await future
+
+    def recommend_student(self, roll_no, top_n=3):
+        model = self.model
+        courses = model.recommend_for_student(roll_no, top_n)
+        if courses == ["Student ID not found."]:
+            raise HTTPError(404, f"Student {roll_no} not found")
+        return {'roll_no': roll_no, 'courses': courses, 'model_version': model.model_version}
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        top_n = query.get('top_n', ['3'])[0]
+        if not top_n.isdigit() or int(top_n) < 1:
+            raise HTTPError(400, "top_n must be a positive integer")
+        top_n = int(top_n)
+        parts = [p for p in url.path.split('/') if p]
+
+        if parts == ['health']:
+            return {'status': 'ok', 'model_version': self.model.model_version,
+                    'batches': self.batches, 'batched_requests': self.batched_requests,
+                    'cache': self.cache.stats()}
+        if parts == ['metrics']:
+            if metrics() is None:
+                raise HTTPError(404, "Metrics are disabled (set RECSYS_METRICS=1)")
+            return metrics().to_prometheus()
+        if parts == ['reload']:
+            if method != 'POST':
+                raise HTTPError(405, "Use POST")
+            version = await self.reload()
+            return {'model_version': version}
+        if len(parts) == 2 and parts[0] == 'recommend':
+            if parts[1] == 'new':
+                if method != 'POST':
+                    raise HTTPError(405, "Use POST")
+                try:
+                    responses = json.loads(body or b'{}')
+                except ValueError:
+                    raise HTTPError(400, "Body must be questionnaire JSON") from None
+                if not isinstance(responses, dict):
+                    raise HTTPError(400, "Body must be a JSON object")
+                return await self.recommend_new(responses, top_n)
+            if not parts[1].isdigit():
+                raise HTTPError(400, "Roll number must be numeric")
+            return self.recommend_student(int(parts[1]), top_n)
+        raise HTTPError(404, f"No route for {url.path}")
+
+    # Minimal HTTP/1.1 with keep-alive, enough for local clients and the load test
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, payload = 200, await self.route(method, target, body)
+                except HTTPError as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception as error:  # noqa: BLE001 - keep serving other requests
+                    status, payload = 500, {'error': repr(error)}
+
+                # Routes answer JSON, except /metrics (Prometheus text)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), 'text/plain; version=0.0.4'
+                else:
+                    data, content_type = json.dumps(payload).encode(), 'application/json'
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                             f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8000, ready=None):
+        self._queue = asyncio.Queue()
+        tasks = [asyncio.create_task(self._batcher())]
+        if self.watch_interval:
+            tasks.append(asyncio.create_task(self._watch()))
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready.set_result(server.sockets[0].getsockname()[1])
+        else:
+            print(f"Serving model {self.model.model_version} on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve course recommendations over HTTP.")
+    parser.add_argument('--model', default='model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help="Seconds between checks of the artifact's CURRENT pointer (0 disables)")
+    parser.add_argument('--cache-size', type=int, default=4096, help="Cached new-user results (0 disables)")
+    parser.add_argument('--cache-ttl', type=float, help="Seconds a cached result stays valid (default: until reload)")
+    args = parser.parse_args()
+
+    service = RecommendationService(args.model, args.max_batch, args.max_wait_ms / 1000, args.watch_interval,
+                                    args.cache_size, args.cache_ttl)
+    start = time.perf_counter()
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"Stopped after {time.perf_counter() - start:.0f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from artifact import build_artifact, load_artifact
+from loader import ROLL, read_sources
+
+# Sharded model builds: students are partitioned by the first prefix_digits
+# of their roll number (22103061 -> '22103', batch and department) or by a
+# cohort column of response.csv, and every shard gets its own encoder
+# vocabularies, medoids and course index as a regular model artifact:
+#   <path>/shards.json        how students map to shards, and every shard's directory
+#   <path>/<shard>/...        artifact.py layout (versions plus CURRENT)
+# Shards with fewer than min_students students are pooled into FALLBACK,
+# which also answers students and new users of unknown shards.
+SHARDS = 'shards.json'
+FALLBACK = 'other'
+
+
+# Shard key of every student row: roll-number prefix, or the cohort column
+def shard_keys(response_df, prefix_digits=5, cohort_column=None):
+    if cohort_column is not None:
+        return response_df[cohort_column].astype(str).to_numpy()
+    return response_df[ROLL].astype('int64').astype(str).str[:prefix_digits].to_numpy()
+
+
+def _shard_dir(key):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in key)
+
+
+# Students of each shard as {shard: roll numbers}, and the sorted keys of the
+# small shards pooled into FALLBACK
+def partition(response_df, prefix_digits=5, cohort_column=None, min_students=10):
+    students = response_df.drop_duplicates(ROLL)
+    keys = shard_keys(students, prefix_digits, cohort_column)
+    names, sizes = np.unique(keys, return_counts=True)
+    small = sorted(str(name) for name in names[sizes < min_students])
+    keys = np.where(np.isin(keys, small), FALLBACK, keys)
+    roll_numbers = students[ROLL].to_numpy()
+    return {key: roll_numbers[keys == key] for key in np.unique(keys)}, small
+
+
+# Fit and write one shard from its slice of the three source tables; runs in
+# a worker process. Returns the manifest entry of the shard.
+def build_shard(key, response_df, marks_df, courses_df, out_dir, n_clusters=3, backend='pam', item_weight=0.0,
+                model_version=None):
+    from engine import RecommenderEngine
+    from incidence import incidence_from_pairs
+    from loader import encode_sources
+    from pipeline import categorical_columns, training_features
+
+    start = time.perf_counter()
+    frame, encoder = encode_sources(response_df, marks_df, courses_df)
+    courses_df = courses_df.dropna(subset=['course'])
+    incidence = incidence_from_pairs(courses_df['roll no'].to_numpy(), courses_df['course'].astype(str).to_numpy())
+    features, roll_numbers, incidence = training_features(frame, incidence)
+    # k-medoids needs fewer clusters than students
+    engine = RecommenderEngine(n_clusters=max(1, min(n_clusters, len(features) - 1)), random_state=42,
+                               cat_columns=categorical_columns, backend=backend, course_metric='hamming',
+                               item_weight=item_weight)
+    engine.fit(features, roll_numbers, incidence)
+    version_dir = build_artifact(engine, os.path.join(out_dir, _shard_dir(key)), encoder, model_version)
+    return {
+        'dir': _shard_dir(key),
+        'model_version': os.path.basename(version_dir),
+        'students': int(len(features)),
+        'n_clusters': int(engine.n_clusters),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _build_shard(args):
+    return args[0], build_shard(*args)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, SHARDS), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Partition the sources and build every shard (or only the listed ones) in a
+# process pool. With only=..., the other shards' artifacts and manifest
+# entries are left as they are, unless the partition itself moved: when the
+# cohorts pooled into FALLBACK changed, FALLBACK and any new shard are rebuilt
+# too and shards that no longer exist leave the manifest. Returns the manifest.
+def build_shards(data_dir, out_dir, prefix_digits=5, cohort_column=None, min_students=10, n_clusters=3,
+                 backend='pam', item_weight=0.0, n_jobs=1, only=None):
+    response_df, marks_df, courses_df = read_sources(data_dir)
+    shards, pooled = partition(response_df, prefix_digits, cohort_column, min_students)
+    key = {'prefix_digits': prefix_digits, 'cohort_column': cohort_column, 'min_students': min_students}
+
+    manifest = {'key': key, 'pooled': pooled, 'shards': {}}
+    if only is not None:
+        manifest = read_manifest(out_dir)
+        if manifest['key'] != key:
+            raise ValueError(f"Shards in {out_dir} were built with {manifest['key']}, not {key}")
+        unknown = set(only) - set(shards)
+        if unknown:
+            raise ValueError(f"Unknown shards: {', '.join(sorted(unknown))}")
+        only = set(only)
+        if manifest.get('pooled') != pooled or set(manifest['shards']) != set(shards):
+            only |= set(shards) - set(manifest['shards'])
+            if FALLBACK in shards:
+                only.add(FALLBACK)
+            for name in set(manifest['shards']) - set(shards):
+                del manifest['shards'][name]
+            manifest['pooled'] = pooled
+        shards = {name: shards[name] for name in sorted(only)}
+
+    model_version = time.strftime('%Y%m%d%H%M%S')
+    tasks = []
+    for name, roll_numbers in shards.items():
+        tasks.append((name, response_df[response_df[ROLL].isin(roll_numbers)],
+                      marks_df[marks_df['roll no'].isin(roll_numbers)],
+                      courses_df[courses_df['roll no'].isin(roll_numbers)],
+                      out_dir, n_clusters, backend, item_weight, model_version))
+    if n_jobs == 1 or len(tasks) == 1:
+        results = [_build_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_build_shard, tasks))
+    manifest['shards'].update(dict(results))
+
+    # Publish the shard map only once every shard is in place
+    tmp = os.path.join(out_dir, SHARDS + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, SHARDS))
+    return manifest
+
+
+# Sends each request to the model of its shard. Shard models are loaded on
+# first use (memory-mapped, see load_artifact); reload() picks up a rebuilt
+# shard without touching the others.
+class ShardRouter:
+    def __init__(self, path):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self.key = self.manifest['key']
+        self.models = {}
+        self._roll_numbers = None
+
+    def model(self, shard):
+        model = self.models.get(shard)
+        if model is None:
+            model = self.models[shard] = load_artifact(os.path.join(self.path, self.manifest['shards'][shard]['dir']))
+        return model
+
+    def reload(self, shard=None):
+        self.manifest = read_manifest(self.path)
+        for name in [shard] if shard is not None else list(self.models):
+            self.models.pop(name, None)
+        # Cohort shards may have gained or lost students
+        self._roll_numbers = None
+
+    def _known(self, key):
+        if key in self.manifest['shards']:
+            return key
+        return FALLBACK if FALLBACK in self.manifest['shards'] else None
+
+    # Roll number -> shard, for cohort-column shards: every shard's roll
+    # numbers, sorted once
+    def _roll_lookup(self):
+        if self._roll_numbers is None:
+            names = list(self.manifest['shards'])
+            rolls = [np.asarray(self.model(name).roll_numbers) for name in names]
+            roll_numbers = np.concatenate(rolls)
+            owners = np.repeat(np.arange(len(names)), [len(r) for r in rolls])
+            order = np.argsort(roll_numbers, kind='stable')
+            self._roll_numbers, self._owners, self._names = roll_numbers[order], owners[order], names
+        return self._roll_numbers, self._owners, self._names
+
+    def shard_for_student(self, student_id):
+        if self.key['cohort_column'] is None:
+            return self._known(str(int(student_id))[:self.key['prefix_digits']])
+        roll_numbers, owners, names = self._roll_lookup()
+        i = np.searchsorted(roll_numbers, int(student_id))
+        if i < len(roll_numbers) and roll_numbers[i] == int(student_id):
+            return names[owners[i]]
+        return None
+
+    # New users are routed by their roll number, or by the cohort column
+    # answer when shards are built by cohort
+    def shard_for_new_user(self, responses):
+        if self.key['cohort_column'] is not None:
+            value = responses.get(self.key['cohort_column'])
+            return self._known(str(value)) if value is not None else self._known(None)
+        roll_no = responses.get(ROLL)
+        if roll_no is None:
+            return self._known(None)
+        return self._known(str(int(roll_no))[:self.key['prefix_digits']])
+
+    def recommend_for_student(self, student_id, top_n=3):
+        shard = self.shard_for_student(student_id)
+        if shard is None:
+            return ["Student ID not found."]
+        return self.model(shard).recommend_for_student(student_id, top_n)
+
+    # Same name as the oldUser.py function it replaces for sharded models
+    recommend_courses_based_on_cluster = recommend_for_student
+
+    def recommend_for_new_user(self, responses, taken=(), top_n=3):
+        shard = self.shard_for_new_user(responses)
+        if shard is None:
+            raise ValueError("No shard for this user: give the roll number or cohort, or build a fallback shard")
+        return self.model(shard).recommend_for_new_user(responses, taken, top_n)
+
+    # A cohort in one call per shard; rows of unknown students stay None
+    def recommend_batch(self, student_ids, top_n=3):
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        shards = np.array([self.shard_for_student(s) or '' for s in student_ids], dtype=object)
+        out = np.full((len(student_ids), top_n), None, dtype=object)
+        for shard in set(shards) - {''}:
+            rows = np.flatnonzero(shards == shard)
+            out[rows] = self.model(shard).recommend_batch(student_ids[rows], top_n)
+        return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query per-department (sharded) recommendation models.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Partition the students and build every shard's artifact")
+    build.add_argument('--data-dir', default='.')
+    build.add_argument('--out', default='shards')
+    build.add_argument('--prefix-digits', type=int, default=5, help="Roll-number digits that name a shard")
+    build.add_argument('--cohort-column', help="Shard by this response.csv column instead of the roll number")
+    build.add_argument('--min-students', type=int, default=10,
+                       help=f"Smaller shards are pooled into '{FALLBACK}'")
+    build.add_argument('--clusters', type=int, default=3)
+    build.add_argument('--backend', default='pam')
+    build.add_argument('--item-weight', type=float, default=0.0)
+    build.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    build.add_argument('--only', help="Rebuild only these shards (comma separated), keeping the others")
+
+    serve = sub.add_parser('serve', help="Route one query to its shard")
+    serve.add_argument('--model', default='shards')
+    serve.add_argument('--student', type=int, help="Roll number of an existing student")
+    serve.add_argument('--answers', help="JSON file with a new user's answers (and roll number or cohort)")
+    serve.add_argument('--top-n', type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        os.makedirs(args.out, exist_ok=True)
+        start = time.perf_counter()
+        only = args.only.split(',') if args.only else None
+        manifest = build_shards(args.data_dir, args.out, args.prefix_digits, args.cohort_column, args.min_students,
+                                args.clusters, args.backend, args.item_weight, args.jobs, only)
+        wall = time.perf_counter() - start
+        # Shards built by this run share its model version (with --only, more
+        # than the listed ones when the pooled shard had to follow)
+        latest = max(entry['model_version'] for entry in manifest['shards'].values())
+        built = {name: entry for name, entry in manifest['shards'].items() if entry['model_version'] == latest}
+        for name, entry in built.items():
+            print(f"{name:<12} {entry['students']:>8} students  k={entry['n_clusters']}  {entry['seconds']:7.2f} s")
+        total = sum(entry['seconds'] for entry in built.values())
+        print(f"{len(built)} shards in {wall:.2f} s wall ({total:.2f} s of shard builds, {args.jobs} jobs)")
+        return
+
+    router = ShardRouter(args.model)
+    if args.student is not None:
+        print(f"Recommended Courses for student {args.student} (shard {router.shard_for_student(args.student)}): "
+              f"{router.recommend_for_student(args.student, args.top_n)}")
+    if args.answers:
+        with open(args.answers, encoding='utf-8') as f:
+            responses = json.load(f)
+        taken = responses.get('courses_taken', [])
+        print(f"Recommended Courses for new user (shard {router.shard_for_new_user(responses)}): "
+              f"{router.recommend_for_new_user(responses, taken, args.top_n)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import argparse
+import time
+
+import numpy as np
+
+
+# Item-item course similarity from co-enrollment. Every course keeps only its
+# top_k most similar courses, as two dense (courses x top_k) arrays:
+#   neighbors_ course ids, padded with len(courses)
+#   scores_    cosine similarity (or raw co-enrollment count), 0 at padding
+# A student's item score for course c is the sum of c's similarity to each
+# course they took: one gather + bincount over their taken courses.
+class CourseSimilarityIndex:
+    def __init__(self, courses, neighbors, scores):
+        self.courses = list(courses)
+        self.neighbors_ = neighbors
+        self.scores_ = scores
+        self._matrix = None
+
+    # Built offline from a students x courses incidence matrix, chunk_size
+    # courses at a time: one sparse product gives the chunk's co-enrollment
+    # counts against every course, which are pruned to top_k right away, so
+    # the full courses x courses matrix is never held.
+    @classmethod
+    def build(cls, matrix, courses, top_k=20, measure='cosine', chunk_size=256):
+        from scipy import sparse
+
+        if measure not in ('cosine', 'cooccurrence'):
+            raise ValueError(f"Unknown similarity measure {measure!r}")
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        n_courses = matrix.shape[1]
+        norms = np.sqrt(np.asarray(matrix.sum(axis=0), dtype=np.float32).ravel())
+        by_course = matrix.T.tocsr()
+
+        k = min(top_k, max(n_courses - 1, 0))
+        neighbors = np.full((n_courses, k), n_courses, dtype=np.int32)
+        scores = np.zeros((n_courses, k), dtype=np.float32)
+        for c0 in range(0, n_courses, chunk_size):
+            c1 = min(c0 + chunk_size, n_courses)
+            co = (by_course[c0:c1] @ matrix).toarray()
+            if measure == 'cosine':
+                denom = norms[c0:c1, None] * norms[None, :]
+                co = np.divide(co, denom, out=np.zeros_like(co), where=denom > 0)
+            # A course is not its own neighbour
+            co[np.arange(c1 - c0), np.arange(c0, c1)] = 0
+            if k == 0:
+                continue
+            top = np.argpartition(-co, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(co, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            neighbors[c0:c1] = np.where(top_scores > 0, top, n_courses)
+            scores[c0:c1] = top_scores
+        return cls(courses, neighbors, scores)
+
+    # Item scores of one student from their taken-course mask
+    def score(self, taken_mask):
+        taken = np.flatnonzero(taken_mask)
+        n_courses = len(self.courses)
+        return np.bincount(self.neighbors_[taken].ravel(), self.scores_[taken].ravel(),
+                           minlength=n_courses + 1)[:n_courses]
+
+    # Pruned index as a sparse (courses x courses) matrix, for batch scoring.
+    # scipy is imported here, not with the module, so the serve path only
+    # loads it for blended batch requests
+    def as_matrix(self):
+        from scipy import sparse
+
+        if self._matrix is None:
+            n_courses = len(self.courses)
+            keep = self.neighbors_ < n_courses
+            rows = np.repeat(np.arange(n_courses), keep.sum(axis=1))
+            self._matrix = sparse.csr_matrix((self.scores_[keep], (rows, self.neighbors_[keep])),
+                                             shape=(n_courses, n_courses))
+        return self._matrix
+
+    # Item scores of many students from a (students x courses) taken mask
+    def score_batch(self, taken):
+        from scipy import sparse
+
+        return (sparse.csr_matrix(taken, dtype=np.float32) @ self.as_matrix()).toarray()
+
+
+# Blend of cluster popularity and item scores, each scaled to [0, 1] per
+# student, then a masked top-N:
+#   score = (1 - item_weight) * popularity + item_weight * item score
+# popularity and item_scores are (students x courses); taken is a bool mask of
+# the same shape. Returns (students x top_n) course ids, -1 where a student has
+# fewer than top_n courses with a positive score.
+def blended_top_n(popularity, item_scores, taken, top_n=3, item_weight=0.5):
+    popularity = np.asarray(popularity, dtype=np.float64)
+    item_scores = np.asarray(item_scores, dtype=np.float64)
+    pop_max = popularity.max(axis=1, keepdims=True) if popularity.shape[1] else 1
+    item_max = item_scores.max(axis=1, keepdims=True) if item_scores.shape[1] else 1
+    score = (1 - item_weight) * np.divide(popularity, pop_max, out=np.zeros_like(popularity), where=pop_max > 0)
+    score += item_weight * np.divide(item_scores, item_max, out=np.zeros_like(item_scores), where=item_max > 0)
+    score[taken] = 0
+
+    # Stable sort: ties keep course id order, as in the popularity ranking
+    n = min(top_n, score.shape[1])
+    top = np.argsort(-score, axis=1, kind='stable')[:, :n]
+    top_scores = np.take_along_axis(score, top, axis=1)
+    ids = np.full((len(score), top_n), -1, dtype=np.int32)
+    ids[:, :n] = np.where(top_scores > 0, top, -1)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the course similarity index and time single-student queries.")
+    parser.add_argument('--courses', default='courses.csv')
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--measure', choices=['cosine', 'cooccurrence'], default='cosine')
+    parser.add_argument('--queries', type=int, default=10000)
+    args = parser.parse_args()
+
+    from incidence import load_course_incidence
+
+    incidence = load_course_incidence(args.courses)
+    start = time.perf_counter()
+    index = CourseSimilarityIndex.build(incidence.matrix, incidence.courses, args.top_k, args.measure)
+    print(f"Built index over {len(index.courses)} courses in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    taken = incidence.matrix.toarray().astype(bool)
+    rows = np.random.default_rng(0).integers(0, len(taken), args.queries)
+    start = time.perf_counter()
+    for row in rows:
+        index.score(taken[row])
+    print(f"Single-student scoring: {(time.perf_counter() - start) / args.queries * 1e6:.1f} us per query")
+
+    for c in range(min(5, len(index.courses))):
+        kept = index.neighbors_[c] < len(index.courses)
+        pairs = ', '.join(f"{index.courses[n]} ({s:.2f})" for n, s in zip(index.neighbors_[c][kept][:5], index.scores_[c][kept][:5]))
+        print(f"  {index.courses[c]}: {pairs}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import csv
+import json
+from collections import Counter
+
+from degreeofDispersionFinal import dispersion_rows
+from quantiicationfinal import quantified_rows
+
+
+# Incremental questionnaire statistics. Keeps, per question, the option counts
+# behind the y_k values. Submissions are keyed by Submission ID, so re-sent
+# rows are ignored; rows without an ID are rejected. Adding a batch costs
+# O(batch); y_k values and the degree of dispersion are derived from the
+# counts (O(options) per touched question) when read, so nothing is re-read
+# from disk.
+class QuestionnaireStats:
+    def __init__(self, question_titles):
+        self.question_titles = list(question_titles)
+        self.option_counts = [Counter() for _ in self.question_titles]
+        self.seen_ids = set()
+        self._rows = None
+
+    @classmethod
+    def from_csv(cls, input_file):
+        with open(input_file, 'r', encoding='utf-8-sig', newline='') as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            stats = cls(header[4:])
+            stats.add_rows(reader, header)
+        return stats
+
+    # Rows as lists in response.csv column order (Submission ID first). The
+    # whole batch is checked first, so a row without an ID adds nothing.
+    def add_rows(self, rows, header=None):
+        offset = 4 if header is None else header.index(self.question_titles[0])
+        rows = list(rows)
+        for i, row in enumerate(rows):
+            if row and not (isinstance(row[0], str) and row[0].strip()):
+                raise ValueError(f"Row {i} has no Submission ID")
+        added = 0
+        for row in rows:
+            if len(row) <= offset or row[0] in self.seen_ids:
+                continue
+            self.seen_ids.add(row[0])
+            self._add_answers(row[offset:offset + len(self.question_titles)])
+            added += 1
+        if added:
+            self._rows = None
+        return added
+
+    # Submissions as dicts keyed by column title, e.g. form webhook payloads
+    def add_submissions(self, submissions):
+        return self.add_rows([[s.get('Submission ID'), '', '', ''] + [s.get(q, '') for q in self.question_titles]
+                              for s in submissions])
+
+    def _add_answers(self, answers):
+        for q, cell in enumerate(answers):
+            cell = (cell or '').strip()
+            if not cell:
+                continue
+            self.option_counts[q][cell[0].lower()] += 1
+
+    # Same rows quantiicationfinal.py writes to quantified_results.csv
+    def quantified_rows(self):
+        if self._rows is None:
+            self._rows = quantified_rows(self.question_titles, self.option_counts)
+        return self._rows
+
+    # {question title: {option letter: y_k}}
+    def y_k(self):
+        values = {}
+        for _, title, option, y_k in self.quantified_rows():
+            values.setdefault(title, {})[option] = float(y_k)
+        return values
+
+    # {question title: degree of dispersion}, as in dispersion.csv
+    def dispersion(self):
+        return {title: float(std_dev) for _, title, std_dev in dispersion_rows(self.quantified_rows())}
+
+    def to_dict(self):
+        return {
+            'question_titles': self.question_titles,
+            'option_counts': [dict(counts) for counts in self.option_counts],
+            'seen_ids': sorted(self.seen_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['question_titles'])
+        stats.option_counts = [Counter(counts) for counts in data['option_counts']]
+        stats.seen_ids = set(data['seen_ids'])
+        return stats
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
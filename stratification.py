@@ -0,0 +1,143 @@
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dea import EPSILON, LPStructure, is_efficient_solution, make_solver
+
+# layers: 1-based efficiency layer of every student (1 = first frontier E1)
+# stats: one dict per layer with the counts and seconds spent on it
+Stratification = namedtuple('Stratification', ['layers', 'stats'])
+
+
+# Pairs (i, j) where student i strictly dominates student j: no more of any
+# input, no less of any output, and strictly better somewhere. A dominated
+# student can never be on an efficient frontier while its dominator is present.
+def dominance_pairs(X, Y, chunk_size=512):
+    dominators, dominated = [], []
+    for start in range(0, len(X), chunk_size):
+        x = X[start:start + chunk_size]
+        y = Y[start:start + chunk_size]
+        weakly = (X[:, None, :] <= x[None, :, :]).all(axis=2) & (Y[:, None, :] >= y[None, :, :]).all(axis=2)
+        strictly = (X[:, None, :] < x[None, :, :]).any(axis=2) | (Y[:, None, :] > y[None, :, :]).any(axis=2)
+        i, j = np.nonzero(weakly & strictly)
+        dominators.append(i)
+        dominated.append(j + start)
+    return np.concatenate(dominators), np.concatenate(dominated)
+
+
+# Context-dependent DEA stratification: S1 -> E1, S2 = S1 - E1 -> E2, ...
+# Instead of re-solving every remaining student at every layer:
+#   * students that still have a dominator in S_l are skipped (they provably
+#     cannot be efficient); each layer's frontier only decrements the
+#     dominator counts of the students it dominated
+#   * one LP over the whole set is kept for all layers; peeled students are
+#     switched off by fixing their lambda to 0, so HiGHS keeps its basis
+#   * a student's cached solution is reused while all of its reference peers
+#     are still present (removing unused columns cannot change the optimum)
+def stratify(X, Y, returns='crs', epsilon=EPSILON, solver='auto', max_layers=None):
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    n = len(X)
+
+    start = time.perf_counter()
+    dominators, dominated = dominance_pairs(X, Y)
+    order = np.argsort(dominators, kind='stable')
+    dominated_by = np.split(dominated[order], np.searchsorted(dominators[order], np.arange(1, n)))
+    dominator_count = np.bincount(dominated, minlength=n)
+    setup_seconds = time.perf_counter() - start
+
+    lp = make_solver(LPStructure(X, Y, returns, epsilon), solver)
+    layers = np.zeros(n, dtype=np.int32)
+    remaining = np.ones(n, dtype=bool)
+    cache = {}
+    stats = []
+
+    layer = 0
+    while remaining.any() and (max_layers is None or layer < max_layers):
+        layer += 1
+        layer_start = time.perf_counter()
+        candidates = np.flatnonzero(remaining & (dominator_count == 0))
+        efficient = []
+        cache_hits = 0
+        for j in candidates:
+            cached = cache.get(j)
+            if cached is not None and remaining[cached[3]].all():
+                cache_hits += 1
+            else:
+                solution = lp.solve(X[j], Y[j])
+                structure = lp.structure
+                cached = (solution[0], solution[1 + n:1 + n + structure.m], solution[1 + n + structure.m:],
+                          np.flatnonzero(solution[1:1 + n] > 1e-9))
+                cache[j] = cached
+            if is_efficient_solution(cached[0], cached[1], cached[2]):
+                efficient.append(j)
+        # Numerical safety net: a non-empty set always has a frontier
+        if not efficient:
+            efficient = list(candidates) if len(candidates) else list(np.flatnonzero(remaining))
+        efficient = np.asarray(efficient)
+
+        layers[efficient] = layer
+        remaining[efficient] = False
+        lp.deactivate(efficient)
+        for e in efficient:
+            dominator_count[dominated_by[e]] -= 1
+
+        stats.append({
+            'layer': layer,
+            'remaining': int(remaining.sum() + len(efficient)),
+            'skipped_dominated': int(remaining.sum() + len(efficient) - len(candidates)),
+            'cache_hits': cache_hits,
+            'lps_solved': int(len(candidates) - cache_hits),
+            'efficient': int(len(efficient)),
+            'seconds': time.perf_counter() - layer_start,
+        })
+
+    if stats:
+        stats[0]['seconds'] += setup_seconds
+    return Stratification(layers, stats)
+
+
+# Stratify every cluster separately; returns {cluster: (row indices, Stratification)}
+def stratify_clusters(X, Y, labels, returns='crs', epsilon=EPSILON, solver='auto'):
+    # Widened per cluster, so a float32 feature store matrix is not copied whole
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    labels = np.asarray(labels)
+    results = {}
+    for cluster in np.unique(labels):
+        rows = np.flatnonzero(labels == cluster)
+        results[cluster] = (rows, stratify(X[rows], Y[rows], returns, epsilon, solver))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hierarchical efficiency layers per cluster, with per-layer timing.")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--clusters', type=int, default=3)
+    parser.add_argument('--returns', choices=['crs', 'vrs'], default='crs')
+    args = parser.parse_args()
+
+    from clustering import fit_kmedoids
+    from feature_store import load_quantified
+    from gower_distance import prepare_gower_features
+
+    table = load_quantified(args.data_dir)
+    labels = fit_kmedoids(prepare_gower_features(table.frame()), args.clusters).labels
+
+    for cluster, (rows, result) in stratify_clusters(table.inputs, table.marks, labels, args.returns).items():
+        naive = sum(s['remaining'] for s in result.stats)
+        solved = sum(s['lps_solved'] for s in result.stats)
+        print(f"Cluster {cluster}: {len(rows)} students, {len(result.stats)} layers, "
+              f"{solved} LPs solved (naive: {naive})")
+        for s in result.stats:
+            print(f"  layer {s['layer']:>3}: {s['remaining']:>5} remaining, {s['skipped_dominated']:>5} skipped, "
+                  f"{s['cache_hits']:>4} cached, {s['lps_solved']:>5} solved, {s['efficient']:>4} efficient, "
+                  f"{s['seconds'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
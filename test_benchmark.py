@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from benchmark import cluster_regressions, generate_dataset, run_size, split_enrollments
+
+
+@pytest.fixture(scope='module')
+def result(tmp_path_factory):
+    data_dir = generate_dataset(1000, str(tmp_path_factory.mktemp('bench')))
+    return run_size(data_dir)
+
+
+# The generated groups carry signal the clusters recover
+def test_cluster_popularity_beats_global(result):
+    assert not cluster_regressions([result])
+    assert result['quality']['cluster_popularity']['recall'] > result['quality']['global_popularity']['recall']
+
+
+# Archetype answers repeat, so unique profiles are well under the cohort size
+def test_profiles_repeat(result):
+    assert result['unique_profiles'] < result['students'] / 2
+
+
+def test_stage_memory_is_per_stage(result):
+    increases = [s['peak_rss_increase_mib'] for s in result['stages'].values()]
+    if increases[0] is None:
+        pytest.skip("no resettable peak RSS on this platform")
+    # The Gower matrix alone is n^2 float32, even after earlier stages peaked
+    assert result['stages']['gower']['peak_rss_increase_mib'] >= 1000 ** 2 * 4 / 2**20 * 0.9
+
+
+def test_split_hides_some_never_all_enrollments():
+    import scipy.sparse as sp
+
+    matrix = sp.random(200, 20, density=0.3, format='csr', random_state=0)
+    matrix.data[:] = 1
+    visible, hidden, rows = split_enrollments(matrix)
+    np.testing.assert_array_equal((visible + hidden).toarray(), matrix.toarray())
+    counts = np.diff(visible.indptr)[rows]
+    assert (counts >= 1).all() and (np.diff(hidden.indptr)[rows] >= 1).all()
@@ -0,0 +1,77 @@
+import numpy as np
+
+from artifact import load_artifact
+from cache import ResultCache, profile_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counts():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'evictions': 1,
+                             'expirations': 0, 'invalidations': 0}
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put('a', 1)
+    clock.now = 10
+    assert cache.get('a') == 1
+    clock.now = 10.5
+    assert cache.get('a') is None
+    assert len(cache) == 0 and cache.expirations == 1 and cache.misses == 1
+
+
+def test_clear_keeps_counters():
+    cache = ResultCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.clear()
+    assert cache.get('a') is None
+    assert (cache.hits, cache.misses, cache.invalidations) == (1, 1, 1)
+
+
+def test_key_covers_version_profile_top_n_and_taken():
+    key = profile_key('v1', np.array([7.5, np.nan]), np.array([1, 2]), 3, ('B', 'A'))
+    assert key == profile_key('v1', [7.5, float('nan')], [1, 2], 3, ['A', 'B'])
+    assert hash(key) == hash(profile_key('v1', [7.5, float('nan')], [1, 2], 3, ['A', 'B']))
+    assert key != profile_key('v2', [7.5, float('nan')], [1, 2], 3, ['A', 'B'])
+    assert key != profile_key('v1', [7.5, float('nan')], [1, 2], 5, ['A', 'B'])
+    assert key != profile_key('v1', [7.5, float('nan')], [1, 2], 3, ['A'])
+
+
+# Repeat profiles are served from the cache; a new model version misses even
+# on a cache shared across versions (as the service shares one over reloads)
+def test_serving_model_cache_is_versioned(model_dir, answers):
+    model = load_artifact(model_dir)
+    first = model.recommend_for_new_user(answers)
+    assert model.recommend_for_new_user(answers) == first
+    assert (model.cache.hits, model.cache.misses) == (1, 1)
+
+    model.model_version = model.model_version + '-next'
+    assert model.recommend_for_new_user(answers) == first
+    assert (model.cache.hits, model.cache.misses) == (1, 2)
+    assert len(model.cache) == 2
+
+
+def test_serving_model_cache_ttl(model_dir, answers):
+    model = load_artifact(model_dir)
+    clock = FakeClock()
+    model.cache = ResultCache(ttl=60, clock=clock)
+    model.recommend_for_new_user(answers)
+    clock.now = 61
+    model.recommend_for_new_user(answers)
+    assert (model.cache.hits, model.cache.misses, model.cache.expirations) == (0, 2, 1)
@@ -0,0 +1,69 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from clustering import fit_fasterpam, fit_pam, fit_weighted_alternate, total_cost
+from gower_distance import gower_matrix_blocked, prepare_gower_features
+
+
+def _prep(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return prepare_gower_features(pd.DataFrame({
+        'marks': rng.uniform(40, 100, n),
+        'hours': rng.integers(0, 20, n).astype(float),
+        'branch': rng.choice(['CSE', 'ECE', 'ME', 'CE'], n),
+    }))
+
+
+def _cost(matrix, medoids):
+    return float(matrix[:, medoids].min(axis=1).sum())
+
+
+# FasterPAM stops only when no (medoid, non-medoid) swap lowers the cost: check
+# every single swap by brute force on the full matrix
+def test_fasterpam_is_swap_optimal():
+    prep = _prep()
+    matrix = gower_matrix_blocked(prep).astype(np.float64)
+    result = fit_fasterpam(prep, 4, random_state=0)
+    medoids = list(result.medoid_indices)
+    cost = _cost(matrix, medoids)
+    assert np.isclose(total_cost(result), cost, rtol=1e-5)
+    for m, candidate in itertools.product(range(len(medoids)), range(len(matrix))):
+        if candidate in medoids:
+            continue
+        swapped = medoids[:m] + [candidate] + medoids[m + 1:]
+        assert _cost(matrix, swapped) >= cost - 1e-4
+
+
+def test_fasterpam_labels_are_nearest_medoid():
+    prep = _prep(seed=1)
+    result = fit_fasterpam(prep, 3, random_state=1, candidate_batch=7)
+    matrix = gower_matrix_blocked(prep)
+    np.testing.assert_allclose(result.medoid_distances, matrix[:, result.medoid_indices], atol=1e-6)
+    np.testing.assert_array_equal(result.labels, result.medoid_distances.argmin(axis=1))
+
+
+# On a table small enough to try every medoid set, FasterPAM and PAM both
+# reach the optimum of well-separated groups
+def test_fasterpam_and_pam_find_separated_groups():
+    rng = np.random.default_rng(2)
+    centers = np.repeat([10.0, 50.0, 90.0], 6)
+    prep = prepare_gower_features(pd.DataFrame({'marks': centers + rng.uniform(-2, 2, 18)}))
+    matrix = gower_matrix_blocked(prep).astype(np.float64)
+    best = min(_cost(matrix, list(m)) for m in itertools.combinations(range(18), 3))
+    assert np.isclose(total_cost(fit_fasterpam(prep, 3)), best, rtol=1e-5)
+    assert np.isclose(total_cost(fit_pam(prep, 3)), best, rtol=1e-5)
+
+
+
+# Medoids 0 and 1 are at distance 0: medoid 1 is labelled into cluster 0
+# while row 2 is still closer to it, so cluster 1 does not contain its medoid
+def test_weighted_alternate_with_medoid_outside_its_cluster():
+    matrix = np.array([[0, 0, 1, 0.5],
+                       [0, 0, 0.5, 1],
+                       [1, 0.5, 0, 1],
+                       [0.5, 1, 1, 0]], dtype=np.float32)
+    result = fit_weighted_alternate(matrix, np.ones(4), 2)
+    np.testing.assert_array_equal(result.medoid_indices, [0, 2])
+    np.testing.assert_array_equal(result.labels, [0, 0, 1, 0])
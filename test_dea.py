@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from dea import is_efficient, solve_clusters, solve_dea
+
+
+def _data(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(1, 10, (n, 3)), rng.uniform(1, 10, (n, 2))
+
+
+# The warm-started HiGHS model and the scipy fallback solve the same LPs
+@pytest.mark.parametrize('returns', ['crs', 'vrs'])
+def test_highs_matches_linprog(returns):
+    pytest.importorskip('highspy')
+    X, Y = _data()
+    highs = solve_dea(X, Y, returns=returns, solver='highs')
+    linprog = solve_dea(X, Y, returns=returns, solver='linprog')
+    np.testing.assert_allclose(highs.theta, linprog.theta, rtol=1e-7)
+    # Slacks enter the objective with weight epsilon, so they agree loosely
+    np.testing.assert_allclose(highs.slack_in, linprog.slack_in, atol=1e-5)
+    np.testing.assert_allclose(highs.slack_out, linprog.slack_out, atol=1e-5)
+    np.testing.assert_array_equal(is_efficient(highs), is_efficient(linprog))
+
+
+# One input, one output, constant returns: theta is the best output / input
+# ratio over the student's own
+def test_crs_single_ratio():
+    rng = np.random.default_rng(1)
+    x, y = rng.uniform(1, 10, 20), rng.uniform(1, 10, 20)
+    result = solve_dea(x[:, None], y)
+    ratio = y / x
+    np.testing.assert_allclose(result.theta, ratio.max() / ratio, rtol=1e-7)
+    np.testing.assert_array_equal(is_efficient(result), np.isclose(ratio, ratio.max()))
+
+
+# Peers and weights reproduce the projection: sum lambda y = theta y_o + s_out
+def test_peers_reproduce_projection():
+    X, Y = _data(seed=2)
+    result = solve_dea(X, Y)
+    for o in range(len(X)):
+        projected = result.weights[o] @ Y[result.peers[o]]
+        np.testing.assert_allclose(projected, result.theta[o] * Y[o] + result.slack_out[o], atol=1e-6)
+        np.testing.assert_allclose(result.weights[o] @ X[result.peers[o]] + result.slack_in[o], X[o], atol=1e-6)
+
+
+# Chunked, multi-process cluster solves equal one solve per cluster
+def test_clusters_match_per_cluster_solves():
+    X, Y = _data(n=40, seed=3)
+    labels = np.repeat([0, 1], 20)
+    results = solve_clusters(X, Y, labels, n_jobs=2, chunk_size=7)
+    for cluster, (rows, result) in results.items():
+        expected = solve_dea(X[rows], Y[rows])
+        np.testing.assert_allclose(result.theta, expected.theta, rtol=1e-7)
+        assert all(set(p) <= set(rows) for p in result.peers)
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from encoding import UNKNOWN, QuestionEncoder, normalize_answers
+
+
+def _frame():
+    return pd.DataFrame({'Q1': ['a) Often', 'b) Rarely', ' a) Often ', None],
+                         'Q2': ['yes', 'no', 'yes', 'maybe'],
+                         'marks': [7.0, 8.0, 9.0, 6.5]})
+
+
+# Codes decode back to the normalized answers; missing answers are UNKNOWN
+def test_round_trip():
+    frame = _frame()
+    encoder = QuestionEncoder().fit(frame, ['Q1', 'Q2'])
+    codes = encoder.transform(frame)
+    assert codes['marks'].equals(frame['marks'])
+    assert list(codes['Q1']) == [0, 1, 0, UNKNOWN]
+    assert list(encoder.decode_column('Q1', codes['Q1'])) == ['a) Often', 'b) Rarely', 'a) Often', None]
+    assert list(encoder.decode_column('Q2', codes['Q2'])) == ['yes', 'no', 'yes', 'maybe']
+
+
+# Answers never seen in training get UNKNOWN and leave the vocabulary frozen
+def test_unseen_answers_are_unknown():
+    encoder = QuestionEncoder().fit(_frame(), ['Q1', 'Q2'])
+    before = {col: v.copy() for col, v in encoder.vocabularies.items()}
+    encoded = encoder.encode_records([{'Q1': 'c) Never', 'Q2': 'no'}, {'Q2': 'perhaps'}, {'Q1': 'b) Rarely'}])
+    np.testing.assert_array_equal(encoded['Q1'], [UNKNOWN, UNKNOWN, 1])
+    np.testing.assert_array_equal(encoded['Q2'], [1, UNKNOWN, UNKNOWN])
+    for col, vocabulary in encoder.vocabularies.items():
+        np.testing.assert_array_equal(vocabulary, before[col])
+
+
+def test_letter_normalization():
+    assert list(normalize_answers(['b) Rarely', ' A) Often', None, float('nan')], 'letter')) == ['b', 'a', '', '']
+    encoder = QuestionEncoder(normalize='letter').fit(_frame(), ['Q1'])
+    np.testing.assert_array_equal(encoder.encode_column('Q1', ['B) other wording', 'z) new']), [1, UNKNOWN])
+
+
+# The serialized encoder is JSON and encodes exactly like the original
+def test_serialized_encoder_encodes_the_same():
+    frame = _frame()
+    encoder = QuestionEncoder().fit(frame, ['Q1', 'Q2'])
+    restored = QuestionEncoder.from_dict(json.loads(json.dumps(encoder.to_dict())))
+    assert restored.transform(frame).equals(encoder.transform(frame))
+    assert restored.code_dtype() == np.int8
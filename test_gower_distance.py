@@ -0,0 +1,56 @@
+import gower
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from gower_distance import gower_between, gower_matrix_blocked, prepare_gower_features
+
+
+def _frame(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'marks': rng.uniform(40, 100, n),
+        'hours': rng.integers(0, 20, n).astype(float),
+        'branch': rng.choice(['CSE', 'ECE', 'ME'], n),
+        'club': rng.choice(['yes', 'no'], n),
+    })
+
+
+# Row blocks smaller than the table, so several blocks and a ragged last one
+def test_blocked_matrix_matches_gower_package():
+    frame = _frame()
+    expected = gower.gower_matrix(frame)
+    np.testing.assert_allclose(gower_matrix_blocked(frame, block_rows=7), expected, atol=1e-6)
+
+
+def test_blocked_matrix_matches_gower_package_with_weights():
+    frame = _frame(seed=1)
+    weight = np.array([2.0, 0.5, 1.0, 3.0])
+    expected = gower.gower_matrix(frame, weight=weight)
+    np.testing.assert_allclose(gower_matrix_blocked(frame, weight=weight, block_rows=16), expected, atol=1e-6)
+
+
+def test_blocked_matrix_into_memmap_from_workers(tmp_path):
+    frame = _frame(n=25, seed=2)
+    matrix = gower_matrix_blocked(frame, block_rows=4, out=str(tmp_path / 'gower.dat'), n_jobs=2)
+    np.testing.assert_allclose(matrix, gower.gower_matrix(frame), atol=1e-6)
+
+
+# A sparse 'hamming' set block counts like one one-hot column per item
+def test_hamming_sets_match_dense_one_hot_columns():
+    frame = _frame(n=30, seed=3)
+    rng = np.random.default_rng(3)
+    taken = (rng.random((30, 6)) < 0.3).astype(np.float32)
+    dense = pd.concat([frame, pd.DataFrame(taken.astype(int).astype(str), columns=[f'c{i}' for i in range(6)])], axis=1)
+    expected = gower.gower_matrix(dense)
+    blocked = gower_matrix_blocked(frame, sets=sp.csr_matrix(taken), set_metric='hamming', block_rows=8)
+    np.testing.assert_allclose(blocked, expected, atol=1e-6)
+
+
+# The float32 fast path keeps the raw values and scales where distances are taken
+def test_float32_frame_matches_scaled_path():
+    frame = _frame(n=20, seed=4)[['marks', 'hours']]
+    raw = prepare_gower_features(frame.astype(np.float32))
+    scaled = prepare_gower_features(frame)
+    np.testing.assert_allclose(gower_between(raw, slice(None), np.arange(20)),
+                               gower_between(scaled, slice(None), np.arange(20)), atol=1e-6)
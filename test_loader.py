@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import pytest
+
+import loader
+from loader import load_student_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in loader.SOURCES + ('dispersion.csv',):
+        shutil.copy(os.path.join(HERE, name), tmp_path)
+    return tmp_path
+
+
+def _count_hashes(monkeypatch):
+    calls = []
+    sha1 = loader._sha1
+    monkeypatch.setattr(loader, '_sha1', lambda path: calls.append(path) or sha1(path))
+    return calls
+
+
+# A touched but unchanged source is hashed once, then trusted by its new mtime
+def test_touched_source_is_hashed_once(data_dir, monkeypatch):
+    first = load_student_table(str(data_dir))
+    path = data_dir / 'marks.csv'
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    calls = _count_hashes(monkeypatch)
+    second = load_student_table(str(data_dir))
+    assert calls == [str(path)]
+    assert second.frame.equals(first.frame)
+    load_student_table(str(data_dir))
+    assert calls == [str(path)]
+
+
+def test_changed_source_rebuilds(data_dir):
+    load_student_table(str(data_dir))
+    path = data_dir / 'marks.csv'
+    lines = path.read_text().splitlines()
+    path.write_text('\n'.join(lines[:-1]) + '\n')
+    table = load_student_table(str(data_dir))
+    assert table.frame.equals(load_student_table(str(data_dir), use_cache=False).frame)
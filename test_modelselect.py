@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from artifact import build_artifact, load_artifact
+from gower_distance import prepare_gower_features
+from modelselect import fit_selected, holdout_split, select_model
+from pipeline import categorical_columns, prepare_training_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def selected(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('data')
+    for name in ('response.csv', 'marks.csv', 'courses.csv', 'dispersion.csv'):
+        shutil.copy(os.path.join(HERE, name), data_dir)
+    features, roll_numbers, incidence, encoder = prepare_training_data(str(data_dir))
+    visible, rows, hidden = holdout_split(incidence.matrix, 0.2)
+    prep = prepare_gower_features(features, categorical_columns, sets=visible)
+    context = {'visible': visible, 'courses': incidence.courses, 'rows': rows, 'hidden': hidden, 'top_n': 3}
+    candidates, _, _ = select_model(prep, [3], [42], context)
+    engine, hit_rate = fit_selected(features, roll_numbers, incidence, visible, rows, hidden, candidates[0],
+                                    categorical_columns)
+    model_dir = str(tmp_path_factory.mktemp('model'))
+    build_artifact(engine, model_dir, encoder)
+    return engine, incidence, rows, candidates[0], hit_rate, load_artifact(model_dir)
+
+
+def test_selected_model_is_the_evaluated_fit(selected):
+    engine, _, _, best, hit_rate, _ = selected
+    assert [int(m) for m in engine.medoid_indices_] == best['medoids']
+    assert hit_rate == best['hit_rate']
+
+
+# Held-out courses are hidden while scoring only: the served model never
+# recommends a course a student took, held-out ones included
+def test_served_recommendations_exclude_taken_courses(selected):
+    engine, incidence, rows, _, _, served = selected
+    assert len(rows)
+    matrix = incidence.matrix
+    for i, student in enumerate(incidence.roll_numbers):
+        taken = {incidence.courses[c] for c in matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]}
+        assert not taken & set(served.recommend_for_student(student, 3))
+        assert not taken & set(engine.recommend_for_student(student, 3))
+    batch = served.recommend_batch(incidence.roll_numbers, 3)
+    for i, recommended in enumerate(batch):
+        taken = {incidence.courses[c] for c in matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]}
+        assert not taken & {c for c in recommended if c is not None}
@@ -0,0 +1,63 @@
+import numpy as np
+
+from paths import layer_scores, obstruction_paths, reconstruct_path
+from stratification import stratify
+
+
+def _data(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    X, Y = rng.uniform(1, 10, (n, 2)), rng.uniform(1, 10, n)
+    return X, Y, stratify(X, Y).layers
+
+
+# Obstruction of every edge j -> k (k one layer above j), from the README
+# formula on range-scaled features; inf when omega is not positive
+def _obstruction(X, Y, layers, j, k, scores):
+    attractiveness, progress = scores
+    Z = np.column_stack([X, Y])
+    span = Z.max(axis=0) - Z.min(axis=0)
+    d = np.abs(Z[j] - Z[k]) / span
+    omega = d[:X.shape[1]].mean() - d[X.shape[1]:].mean()
+    return (attractiveness[k] + progress[k]) / omega if omega > 0 else np.inf
+
+
+# Every path up to layer 1 enumerated explicitly: (cost, path)
+def _brute_force(X, Y, layers, j, scores):
+    if layers[j] == 1:
+        return 0.0, []
+    best = (np.inf, None)
+    for k in np.flatnonzero(layers == layers[j] - 1):
+        rest, path = _brute_force(X, Y, layers, k, scores)
+        cost = _obstruction(X, Y, layers, j, k, scores) + rest
+        if cost < best[0]:
+            best = (cost, [int(k)] + path)
+    return best
+
+
+def test_dp_matches_path_enumeration():
+    X, Y, layers = _data()
+    assert layers.max() >= 3
+    scores = layer_scores(X, Y[:, None], layers)
+    result = obstruction_paths(X, Y, layers)
+    for j in range(len(X)):
+        cost, path = _brute_force(X, Y, layers, j, scores)
+        if np.isfinite(cost):
+            assert np.isclose(result.cost[j], cost, rtol=1e-9)
+            assert reconstruct_path(result.next_hop, j) == path
+        else:
+            assert result.cost[j] == np.inf
+            assert result.next_hop[j] == -1
+
+
+# Equal inputs: every peer above differs only in output, so omega < 0 and no
+# edge exists; the students below layer 1 get no path
+def test_no_positive_proximity_means_no_path():
+    X = np.ones((6, 1))
+    Y = np.arange(1.0, 7.0)
+    layers = stratify(X, Y).layers
+    result = obstruction_paths(X, Y, layers)
+    below = layers > 1
+    assert below.any()
+    assert np.isinf(result.cost[below]).all()
+    assert (result.next_hop[below] == -1).all()
+    assert (result.cost[~below] == 0).all()
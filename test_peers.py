@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from encoding import UNKNOWN
+from peers import PeerIndex
+
+
+def _students(n, n_questions=8, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, 3, (n, n_questions)).astype(np.int8)
+    codes[rng.random(codes.shape) < 0.1] = UNKNOWN
+    marks = rng.uniform(40, 100, n).astype(np.float32)
+    marks[rng.random(n) < 0.1] = np.nan
+    taken = np.packbits(rng.random((n, 5)) < 0.4, axis=1)
+    return codes, marks, taken
+
+
+def _index(n=300, seed=0):
+    codes, marks, taken = _students(n, seed=seed)
+    return PeerIndex.build(codes, marks, list('ABCDE'), taken), np.random.default_rng(seed + 100)
+
+
+# Brute force: sort every student by (distance, row)
+def _brute_force(index, codes, mark, k):
+    distances = index.distances(codes, mark)
+    order = np.lexsort((np.arange(index.size), distances))[:k]
+    return order, distances[order]
+
+
+def _query(rng, n_questions=8):
+    codes = rng.integers(0, 3, n_questions).astype(np.int8)
+    codes[rng.random(n_questions) < 0.2] = UNKNOWN
+    return codes
+
+
+@pytest.mark.parametrize('k', [1, 10, 50])
+def test_nearest_matches_brute_force(k):
+    index, rng = _index()
+    for _ in range(100):
+        codes = _query(rng)
+        mark = np.nan if rng.random() < 0.2 else float(rng.uniform(20, 120))
+        rows, distances = index.nearest(codes, mark, k)
+        expected_rows, expected_distances = _brute_force(index, codes, mark, k)
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_array_equal(distances, expected_distances)
+
+
+# Students added after build widen the marks range and are found at once
+def test_nearest_after_add_matches_brute_force():
+    index, rng = _index(n=100, seed=1)
+    codes, marks, taken = _students(100, seed=2)
+    index.add(codes, marks * 2, taken)
+    assert index.size == 200
+    for _ in range(100):
+        codes = _query(rng)
+        mark = float(rng.uniform(0, 250))
+        rows, distances = index.nearest(codes, mark, 10)
+        expected_rows, expected_distances = _brute_force(index, codes, mark, 10)
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_array_equal(distances, expected_distances)
+
+
+def test_distances_are_gower_like():
+    index = PeerIndex.build(np.array([[0, 1, 2], [0, 2, UNKNOWN]], dtype=np.int8), [50.0, 100.0], ['A'])
+    # Query answered 2 of 3 questions; marks range 50
+    codes = np.array([0, 1, UNKNOWN], dtype=np.int8)
+    np.testing.assert_allclose(index.distances(codes, 75.0), [(0 + 0.5) / 3, (1 + 0.5) / 3], rtol=1e-6)
+    np.testing.assert_allclose(index.distances(codes), [0, 0.5], rtol=1e-6)
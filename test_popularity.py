@@ -0,0 +1,56 @@
+import numpy as np
+import scipy.sparse as sp
+
+from popularity import CoursePopularityIndex, lookup_rows
+
+
+def _cohort(n=200, n_courses=12, n_clusters=3, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, n_clusters, n)
+    matrix = sp.csr_matrix((rng.random((n, n_courses)) < 0.3).astype(np.uint8))
+    courses = [chr(ord('A') + i) for i in range(n_courses)]
+    return labels, matrix, courses, CoursePopularityIndex.from_incidence(labels, matrix, courses, n_clusters)
+
+
+# Per student: the cluster's courses by enrollment count (ties by course id),
+# minus the ones the student took, then cut to top_n
+def _brute_force(labels, matrix, row, top_n):
+    dense = matrix.toarray()
+    counts = dense[labels == labels[row]].sum(axis=0)
+    order = [c for c in np.argsort(-counts, kind='stable') if counts[c] > 0 and not dense[row, c]]
+    return order[:top_n]
+
+
+# Taken courses are removed before cutting to top_n, so a student who took
+# the cluster's favourites still gets top_n courses
+def test_taken_courses_are_skipped_before_top_n():
+    labels, matrix, courses, index = _cohort()
+    for row in range(len(labels)):
+        expected = _brute_force(labels, matrix, row, 3)
+        assert list(index.top_n_ids(labels[row], index.taken_mask(row), 3)) == expected
+        assert index.recommend_for_row(row, labels[row]) == [courses[c] for c in expected]
+
+
+def test_batch_matches_per_student():
+    labels, matrix, _, index = _cohort(seed=1)
+    rows = np.arange(len(labels))
+    batch = index.top_n_ids_batch(rows, labels, 4, chunk_size=37)
+    for row in rows:
+        expected = _brute_force(labels, matrix, row, 4)
+        assert list(batch[row][:len(expected)]) == expected
+        assert (batch[row][len(expected):] == -1).all()
+
+
+# A student who took all but one of their cluster's courses gets just that one
+def test_short_list_when_few_courses_are_left():
+    labels = np.zeros(2, dtype=np.int64)
+    matrix = sp.csr_matrix(np.array([[1, 1, 1, 0], [1, 1, 1, 1]], dtype=np.uint8))
+    index = CoursePopularityIndex.from_incidence(labels, matrix, list('ABCD'), 1)
+    assert index.recommend_for_row(0, 0, 3) == ['D']
+    assert index.recommend_for_row(1, 0, 3) == []
+    np.testing.assert_array_equal(index.top_n_ids_batch([0, 1, -1], [0, 0, 0], 3),
+                                  [[3, -1, -1], [-1, -1, -1], [0, 1, 2]])
+
+
+def test_lookup_rows():
+    np.testing.assert_array_equal(lookup_rows([30, 10, 20], [20, 40, 30, 10]), [2, -1, 0, 1])
@@ -0,0 +1,50 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from degreeofDispersionFinal import dispersion_rows, read_quantified
+from quantiicationfinal import count_options, quantified_rows, write_quantified
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# The single-pass counts equal a per-column count of the answers' first letters
+def test_counts_match_pandas():
+    titles, counts = count_options(os.path.join(HERE, 'response.csv'))
+    frame = pd.read_csv(os.path.join(HERE, 'response.csv'), dtype=str, keep_default_na=False)
+    assert titles == list(frame.columns[4:])
+    for title, counter in zip(titles, counts):
+        answers = frame[title].str.strip()
+        expected = answers[answers != ''].str[0].str.lower().value_counts().to_dict()
+        assert dict(counter) == expected
+
+
+# An empty cell is skipped in place: later answers keep their own question
+def test_empty_cells_keep_columns_aligned(tmp_path):
+    path = tmp_path / 'response.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'time', 'name', 'roll', 'Q one', 'Q two', 'Q three'])
+        writer.writerow(['1', 't', 'n', '1', 'a) yes', '', 'c) maybe'])
+        writer.writerow(['2', 't', 'n', '2', 'B) no', 'a) yes', ' c) maybe'])
+    titles, counts = count_options(str(path))
+    assert titles == ['Q one', 'Q two', 'Q three']
+    assert [dict(c) for c in counts] == [{'a': 1, 'b': 1}, {'a': 1}, {'c': 2}]
+
+
+# Cumulative y_k, listed from the last option back to 'a'; the last one is 100%
+def test_quantified_rows_and_dispersion_round_trip(tmp_path):
+    titles, counts = count_options(os.path.join(HERE, 'response.csv'))
+    rows = quantified_rows(titles, counts)
+    for question, title, option, y_k in rows:
+        if option == sorted(counts[int(question[1:]) - 1])[-1].upper():
+            assert y_k == '100.00'
+    path = tmp_path / 'quantified_results.csv'
+    write_quantified(rows, str(path))
+    assert list(read_quantified(str(path))) == rows
+    from_file = {q: float(s) for q, _, s in dispersion_rows(read_quantified(str(path)))}
+    for question, std in from_file.items():
+        values = [float(y) for q, _, _, y in rows if q == question]
+        assert np.isclose(std, np.std(values), atol=0.005)
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from service import RecommendationService
+
+
+async def _with_batcher(service, body):
+    service._queue = asyncio.Queue()
+    batcher = asyncio.create_task(service._batcher())
+    try:
+        return await asyncio.wait_for(body(), 10)
+    finally:
+        batcher.cancel()
+
+
+# A batch that fails while its results are filled in is reported to its
+# requests, and the batcher goes on serving the next ones
+@pytest.mark.parametrize('method', ['assign', 'recommend_for_cluster'])
+def test_batcher_survives_a_failing_model(model_dir, answers, method):
+    service = RecommendationService(model_dir, max_wait=0.001, watch_interval=0)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("model failed")
+
+    async def body():
+        setattr(service.model, method, fail)
+        with pytest.raises(RuntimeError, match="model failed"):
+            await service.recommend_new(answers)
+        delattr(service.model, method)
+        return await service.recommend_new(answers)
+
+    result = asyncio.run(_with_batcher(service, body))
+    assert result['courses'] == service.model.recommend_for_new_user(answers)
+    assert service.batches == 1
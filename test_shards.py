@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from loader import ROLL
+from shards import FALLBACK, ShardRouter, build_shards, read_manifest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in ('response.csv', 'marks.csv', 'courses.csv', 'dispersion.csv'):
+        shutil.copy(os.path.join(HERE, name), tmp_path)
+    return tmp_path
+
+
+def _responses(data_dir):
+    return pd.read_csv(data_dir / 'response.csv')
+
+
+# A partial rebuild that changes which cohorts are pooled also rebuilds the
+# pooled shard and drops the shard that no longer exists
+def test_partial_build_follows_pooling_changes(data_dir, tmp_path):
+    out = str(tmp_path / 'shards')
+    os.makedirs(out)
+    first = build_shards(str(data_dir), out, prefix_digits=6, min_students=6)
+    assert '221060' in first['shards'] and FALLBACK in first['shards']
+
+    response = _responses(data_dir)
+    shrunk = response[ROLL].astype(str).str.startswith('221060')
+    response.drop(response.index[shrunk][:3]).to_csv(data_dir / 'response.csv', index=False)
+    manifest = build_shards(str(data_dir), out, prefix_digits=6, min_students=6, only=['221030'])
+
+    assert '221060' not in manifest['shards']
+    assert '221060' in manifest['pooled']
+    assert manifest == read_manifest(out)
+    # The five remaining 221060 students joined the pooled shard
+    assert manifest['shards'][FALLBACK]['students'] == first['shards'][FALLBACK]['students'] + 5
+    moved = response[shrunk][ROLL].iloc[-1]
+    assert ShardRouter(out).recommend_for_student(moved) != ["Student ID not found."]
+
+
+# reload() forgets the roll-number lookup of cohort shards
+def test_reload_routes_moved_students(data_dir, tmp_path):
+    out = str(tmp_path / 'shards')
+    os.makedirs(out)
+    response = _responses(data_dir)
+    response['Cohort'] = ['A'] * 25 + ['B'] * (len(response) - 25)
+    response.to_csv(data_dir / 'response.csv', index=False)
+    build_shards(str(data_dir), out, cohort_column='Cohort', min_students=5)
+    router = ShardRouter(out)
+    student = response[ROLL].iloc[0]
+    assert router.shard_for_student(student) == 'A'
+
+    response.loc[0, 'Cohort'] = 'B'
+    response.to_csv(data_dir / 'response.csv', index=False)
+    build_shards(str(data_dir), out, cohort_column='Cohort', min_students=5)
+    router.reload()
+    assert router.shard_for_student(student) == 'B'
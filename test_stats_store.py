@@ -0,0 +1,56 @@
+import csv
+import os
+
+import pytest
+
+from quantiicationfinal import count_options, quantified_rows
+from stats_store import QuestionnaireStats
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESPONSES = os.path.join(HERE, 'response.csv')
+
+
+def _rows():
+    with open(RESPONSES, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        return next(reader), list(reader)
+
+
+# Batches added one after another give the same y_k as one pass over the file
+def test_incremental_batches_match_full_pass():
+    header, rows = _rows()
+    stats = QuestionnaireStats(header[4:])
+    assert stats.add_rows(rows[:10], header) == 10
+    first = stats.quantified_rows()
+    assert stats.add_rows(rows[10:], header) == len(rows) - 10
+    assert stats.quantified_rows() != first
+    assert stats.quantified_rows() == quantified_rows(*count_options(RESPONSES))
+    assert stats.quantified_rows() == QuestionnaireStats.from_csv(RESPONSES).quantified_rows()
+
+
+def test_resent_submissions_are_ignored():
+    header, rows = _rows()
+    stats = QuestionnaireStats.from_csv(RESPONSES)
+    before = stats.quantified_rows()
+    assert stats.add_rows(rows[:5], header) == 0
+    assert stats.quantified_rows() == before
+
+
+def test_row_without_id_rejects_the_batch():
+    header, rows = _rows()
+    stats = QuestionnaireStats(header[4:])
+    with pytest.raises(ValueError, match="Row 1 has no Submission ID"):
+        stats.add_rows([rows[0], [''] + rows[1][1:]], header)
+    assert not stats.seen_ids and not any(stats.option_counts)
+
+
+def test_submissions_and_round_trip(tmp_path):
+    header, rows = _rows()
+    stats = QuestionnaireStats(header[4:])
+    stats.add_submissions([dict(zip(header, row)) for row in rows])
+    assert stats.quantified_rows() == quantified_rows(*count_options(RESPONSES))
+    path = tmp_path / 'stats.json'
+    stats.save(str(path))
+    loaded = QuestionnaireStats.load(str(path))
+    assert loaded.dispersion() == stats.dispersion()
+    assert loaded.add_rows(rows[:1], header) == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from dea import is_efficient, solve_dea
+from stratification import dominance_pairs, stratify, stratify_clusters
+
+
+def _data(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    X, Y = rng.uniform(1, 10, (n, 2)), rng.uniform(1, 10, (n, 2))
+    # A few duplicate students: neither dominates the other
+    X[-3:], Y[-3:] = X[:3], Y[:3]
+    return X, Y
+
+
+# The definition: solve every remaining student against the remaining set,
+# peel the efficient ones, repeat
+def _naive_layers(X, Y, returns):
+    layers = np.zeros(len(X), dtype=np.int32)
+    remaining = np.arange(len(X))
+    layer = 0
+    while len(remaining):
+        layer += 1
+        result = solve_dea(X, Y, dmus=remaining, reference=remaining, returns=returns, solver='linprog')
+        efficient = remaining[is_efficient(result)]
+        layers[efficient] = layer
+        remaining = np.setdiff1d(remaining, efficient)
+    return layers
+
+
+@pytest.mark.parametrize('returns', ['crs', 'vrs'])
+@pytest.mark.parametrize('solver', ['highs', 'linprog'])
+def test_stratify_matches_naive_peeling(returns, solver):
+    if solver == 'highs':
+        pytest.importorskip('highspy')
+    X, Y = _data()
+    strata = stratify(X, Y, returns=returns, solver=solver)
+    np.testing.assert_array_equal(strata.layers, _naive_layers(X, Y, returns))
+    assert sum(s['efficient'] for s in strata.stats) == len(X)
+
+
+def test_dominance_pairs_match_brute_force():
+    X, Y = _data(n=25, seed=1)
+    expected = {(i, j) for i in range(25) for j in range(25)
+                if (X[i] <= X[j]).all() and (Y[i] >= Y[j]).all() and ((X[i] < X[j]).any() or (Y[i] > Y[j]).any())}
+    dominators, dominated = dominance_pairs(X, Y, chunk_size=4)
+    assert set(zip(dominators.tolist(), dominated.tolist())) == expected
+
+
+# A dominated student always lies on a later layer than its dominator
+def test_dominated_students_peel_later():
+    X, Y = _data(seed=2)
+    layers = stratify(X, Y).layers
+    dominators, dominated = dominance_pairs(X, Y)
+    assert (layers[dominators] < layers[dominated]).all()
+
+
+def test_clusters_are_stratified_separately():
+    X, Y = _data(seed=3)
+    labels = np.arange(len(X)) % 2
+    for cluster, (rows, strata) in stratify_clusters(X, Y, labels).items():
+        np.testing.assert_array_equal(strata.layers, stratify(X[rows], Y[rows]).layers)